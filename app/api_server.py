@@ -0,0 +1,418 @@
+"""
+Headless JSON API for the course assistant.
+
+Endpoints:
+
+- ``POST /chat``: ``{"message", "session_id"?, "pipeline"?, "stream"?}``
+  answers one turn. Without a session id a new session is started; the id
+  comes back in the response. With ``"stream": true`` the reply is sent as
+  newline-delimited JSON: ``{"chunk": ...}`` lines, then a final line with
+  the same fields as the non-streamed response.
+- ``GET|POST /search``: ``q`` (or ``query``) parsed by the local intent
+  classifier, or explicit ``entities``/``user_preferences``; returns the top
+  ``limit`` study options without calling the LLM.
+- ``GET /health`` and ``GET /metrics``.
+
+The catalog and its indexes are loaded once in the parent process, which
+then forks ``--workers`` processes sharing them copy-on-write and accepting
+on one listening socket. Each worker caps the chat turns and searches it
+runs at once and queues a bounded number more; beyond that, or after
+waiting ``API_QUEUE_TIMEOUT`` seconds, requests get 503 with Retry-After.
+A turn the LLM had no capacity for (see ``core.admission``) also gets 503,
+with the provider's Retry-After when known; a stream already under way
+ends with ``"busy": true`` instead.
+Metrics are per worker (``pid`` tells them apart). Conversation memory must
+be shared between workers, so run them with ``SESSION_BACKEND=sqlite``.
+
+    python app/api_server.py --port 8000 --workers 4
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import json
+import os
+import signal
+import socket
+import sys
+import time
+import uuid
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.admission import admission
+from core.course_filter import filter_courses
+from core.data_loader import CATALOG_MAX_MEMORY_MB, load_courses
+from core.intent_cache import intent_cache
+from core.intent_classifier import intent_classifier
+from core.intent_parser import coerce_intent
+from core.llm import clients, get_backend
+from core.orchestrator import run_turn_async, schedule_memory_update, speculation_stats
+from core.pipeline import DEFAULT_MODE, PIPELINE_MODES, latency_summary
+from core.result_cache import filter_cache
+from core.session_store import session_store
+
+# Load environment variables
+load_dotenv()
+
+API_HOST = os.getenv("API_HOST", "127.0.0.1")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", str(os.cpu_count() or 1)))
+
+# Per worker: requests running at once, and waiting for a slot before 503s
+API_MAX_CONCURRENT_TURNS = int(os.getenv("API_MAX_CONCURRENT_TURNS", "8"))
+API_MAX_CONCURRENT_SEARCHES = int(os.getenv("API_MAX_CONCURRENT_SEARCHES", "4"))
+API_MAX_QUEUE = int(os.getenv("API_MAX_QUEUE", "32"))
+API_QUEUE_TIMEOUT = float(os.getenv("API_QUEUE_TIMEOUT", "10"))
+
+SEARCH_DEFAULT_RESULTS = 10
+SEARCH_MAX_RESULTS = 50
+MAX_MESSAGE_CHARS = 2000
+MAX_BODY_BYTES = 64 * 1024
+
+# Seconds before a crashed worker is replaced, so a crash loop cannot spin
+RESPAWN_DELAY = 1.0
+
+ROUTES = ("/chat", "/search", "/health", "/metrics")
+
+
+class Busy(Exception):
+    """No slot became free for a request in time."""
+
+
+class ConcurrencyLimiter:
+    """
+    Admits at most ``limit`` requests at once and lets at most
+    ``max_waiting`` more wait up to ``timeout`` seconds for a slot.
+    """
+
+    def __init__(self, limit, max_waiting=API_MAX_QUEUE, timeout=API_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.max_waiting = max_waiting
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        self._semaphore = asyncio.Semaphore(limit)
+
+    @contextlib.asynccontextmanager
+    async def slot(self):
+        if self._semaphore.locked() and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Busy()
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise Busy()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+
+    def stats(self):
+        return {"limit": self.limit, "active": self.active, "waiting": self.waiting, "rejected": self.rejected}
+
+
+def _error(status, message, **headers):
+    return status(text=json.dumps({"error": message}), content_type="application/json", headers=headers)
+
+
+async def _json_body(request):
+    if not request.can_read_body:
+        return {}
+    try:
+        body = await request.json()
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        raise _error(web.HTTPBadRequest, "Request body must be JSON")
+    if not isinstance(body, dict):
+        raise _error(web.HTTPBadRequest, "Request body must be a JSON object")
+    return body
+
+
+@contextlib.asynccontextmanager
+async def _admitted(limiter):
+    try:
+        async with limiter.slot():
+            yield
+    except Busy:
+        raise _error(web.HTTPServiceUnavailable, "Server busy, retry shortly", **{"Retry-After": "1"})
+
+
+def course_payload(catalog, matched):
+    """The matched study options as JSON-ready cards, best first."""
+    scores = matched["score"].tolist() if "score" in matched else [None] * len(matched)
+    return [
+        {**catalog.cards.llm[row_id], "row_id": int(row_id), "course_id": int(course_id),
+         "score": None if score is None else float(score)}
+        for row_id, course_id, score in zip(matched["row_id"].tolist(), matched["id"].tolist(), scores)
+    ]
+
+
+def turn_payload(turn, catalog, session_id):
+    return {
+        "session_id": session_id,
+        "reply": turn["reply"],
+        "intent": turn["parsed"],
+        "courses": course_payload(catalog, turn["matched"]),
+        "pipeline": turn["mode"],
+        "usage": turn["usage"],
+        "timings": turn.get("timings", {}),
+        "errors": turn["errors"],
+        "busy": turn["busy"],
+        "retry_after": turn["retry_after"],
+    }
+
+
+def _ndjson(data):
+    return (json.dumps(data) + "\n").encode("utf-8")
+
+
+async def chat(request):
+    body = await _json_body(request)
+    message = str(body.get("message") or "").strip()
+    if not message:
+        raise _error(web.HTTPBadRequest, "message is required")
+    if len(message) > MAX_MESSAGE_CHARS:
+        raise _error(web.HTTPBadRequest, f"message is longer than {MAX_MESSAGE_CHARS} characters")
+    mode = body.get("pipeline") or DEFAULT_MODE
+    if mode not in PIPELINE_MODES:
+        raise _error(web.HTTPBadRequest, f"pipeline must be one of {', '.join(PIPELINE_MODES)}")
+    session_id = str(body.get("session_id") or uuid.uuid4().hex)
+    stream = bool(body.get("stream"))
+    catalog = request.app["catalog"]
+
+    async with _admitted(request.app["turn_limiter"]):
+        turn = await run_turn_async(message, catalog, mode=mode, stream=stream, session_id=session_id)
+        if turn["busy"]:
+            # Not answered, so not remembered either
+            retry_after = max(1, round(turn["retry_after"] or 1))
+            return web.json_response(
+                turn_payload(turn, catalog, session_id), status=503, headers={"Retry-After": str(retry_after)}
+            )
+        if not stream:
+            _remember(turn, message, session_id)
+            return web.json_response(turn_payload(turn, catalog, session_id))
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        chunks = turn["chunks"]
+        while True:
+            # Each chunk waits on the model, so pull it off the event loop
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            await response.write(_ndjson({"chunk": chunk}))
+        if not turn["busy"]:
+            _remember(turn, message, session_id)
+        await response.write(_ndjson({"done": True, **turn_payload(turn, catalog, session_id)}))
+        await response.write_eof()
+        return response
+
+
+def _remember(turn, message, session_id):
+    matched = turn["matched"]
+    schedule_memory_update(
+        turn["parsed"], turn["reply"], message, matched["id"].tolist() if not matched.empty else [],
+        session_id=session_id,
+    )
+
+
+async def search(request):
+    body = dict(request.query)
+    if request.method == "POST":
+        body.update(await _json_body(request))
+    query = str(body.get("q") or body.get("query") or "").strip()
+    try:
+        limit = min(max(int(body.get("limit") or SEARCH_DEFAULT_RESULTS), 1), SEARCH_MAX_RESULTS)
+    except (TypeError, ValueError):
+        raise _error(web.HTTPBadRequest, "limit must be an integer")
+    catalog = request.app["catalog"]
+
+    if isinstance(body.get("entities"), dict) or isinstance(body.get("user_preferences"), dict):
+        parsed, confidence = coerce_intent({"intent": "search", **body}), 1.0
+    elif query:
+        parsed, confidence = intent_classifier.parse(query, catalog)
+    else:
+        raise _error(web.HTTPBadRequest, "q, entities or user_preferences is required")
+
+    async with _admitted(request.app["search_limiter"]):
+        matched = await asyncio.to_thread(filter_courses, parsed, catalog, k=limit, user_query=query or None)
+    return web.json_response({
+        "intent": parsed,
+        "confidence": confidence,
+        "courses": course_payload(catalog, matched),
+    })
+
+
+async def health(request):
+    catalog = request.app["catalog"]
+    return web.json_response({
+        "status": "ok",
+        "pid": os.getpid(),
+        "worker": request.app["worker"],
+        "catalog_version": catalog.version,
+        "study_options": len(catalog),
+        "uptime_seconds": time.time() - request.app["started"],
+    })
+
+
+async def metrics(request):
+    app = request.app
+    return web.json_response({
+        "pid": os.getpid(),
+        "worker": app["worker"],
+        "http": app["http_stats"],
+        "turns": app["turn_limiter"].stats(),
+        "searches": app["search_limiter"].stats(),
+        "latency": latency_summary(),
+        "speculation": speculation_stats,
+        "intent_classifier": intent_classifier.stats(),
+        "intent_cache": intent_cache.stats(),
+        "filter_cache": filter_cache.stats(),
+        "sessions": session_store.stats(),
+        "llm_admission": admission.stats(),
+        "openai_connections": clients.stats(),
+        "llm_backend": get_backend().stats() if get_backend() is not clients else "openai",
+    })
+
+
+@web.middleware
+async def track_requests(request, handler):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        stats = request.app["http_stats"]
+        route = request.path if request.path in ROUTES else "other"
+        stats["requests"][route] = stats["requests"].get(route, 0) + 1
+        stats["seconds"][route] = stats["seconds"].get(route, 0.0) + time.perf_counter() - start
+        stats["status"][str(status)] = stats["status"].get(str(status), 0) + 1
+
+
+async def _create_limiters(app):
+    # Semaphores belong to the worker's own event loop
+    app["turn_limiter"] = ConcurrencyLimiter(API_MAX_CONCURRENT_TURNS)
+    app["search_limiter"] = ConcurrencyLimiter(API_MAX_CONCURRENT_SEARCHES)
+
+
+def create_app(catalog, worker=0):
+    app = web.Application(middlewares=[track_requests], client_max_size=MAX_BODY_BYTES)
+    app["catalog"] = catalog
+    app["worker"] = worker
+    app["started"] = time.time()
+    app["http_stats"] = {"requests": {}, "seconds": {}, "status": {}}
+    app.on_startup.append(_create_limiters)
+    app.router.add_post("/chat", chat)
+    app.router.add_get("/search", search)
+    app.router.add_post("/search", search)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", metrics)
+    return app
+
+
+def listen(host, port, backlog=1024):
+    """The listening socket every worker accepts on."""
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.setblocking(False)
+    return sock
+
+
+def run_worker(catalog, sock, worker=0):
+    web.run_app(create_app(catalog, worker), sock=sock, print=None, access_log=None)
+
+
+def _spawn(catalog, sock, worker):
+    pid = os.fork()
+    if pid == 0:
+        # Drop the parent's handlers; aiohttp installs graceful-shutdown ones
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        code = 0
+        try:
+            run_worker(catalog, sock, worker)
+        except Exception as e:
+            print(f"Error in API worker {worker}: {str(e)}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(catalog, sock, workers):
+    """Fork ``workers`` processes sharing ``catalog``; replace any that crash."""
+    # Objects allocated so far (the catalog and its indexes) are left out of
+    # garbage collection, so collections in the workers do not copy their pages
+    gc.freeze()
+    children = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            with contextlib.suppress(ProcessLookupError):
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for worker in range(workers):
+        children[_spawn(catalog, sock, worker)] = worker
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        worker = children.pop(pid, None)
+        if worker is not None and not stopping:
+            print(f"API worker {worker} (pid {pid}) exited with status {status}; restarting")
+            time.sleep(RESPAWN_DELAY)
+            if not stopping:
+                children[_spawn(catalog, sock, worker)] = worker
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the course assistant as a JSON API")
+    parser.add_argument("--data", default="data/clean_structured_example.json")
+    parser.add_argument("--host", default=API_HOST)
+    parser.add_argument("--port", type=int, default=API_PORT)
+    parser.add_argument("--workers", type=int, default=API_WORKERS,
+                        help="worker processes forked after the catalog is loaded (1: serve in-process)")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    catalog = load_courses(args.data, max_memory_mb=CATALOG_MAX_MEMORY_MB).build_indexes()
+    print(f"Loaded {len(catalog)} study options and indexes in {time.perf_counter() - start:.1f} s")
+    if args.workers > 1 and session_store.backend == "memory":
+        print("Warning: each worker keeps its own sessions; set SESSION_BACKEND=sqlite to share them")
+
+    sock = listen(args.host, args.port)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} worker(s)")
+    if args.workers > 1 and hasattr(os, "fork"):
+        serve(catalog, sock, args.workers)
+    else:
+        run_worker(catalog, sock)
+
+
+if __name__ == "__main__":
+    main()
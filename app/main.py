@@ -1,82 +1,74 @@
+import asyncio
 import os
 import sys
 import traceback
+import uuid
 from dotenv import load_dotenv
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.data_loader import load_courses
-from core.intent_parser import parse_intent
-from core.course_filter import filter_courses
-from core.response_generator import generate_response
-from core.memory import update_memory, get_conversation_history
+from core.catalog_manager import CatalogManager
+from core.intent_classifier import intent_classifier
+from core.pipeline import latency_summary
+from core.orchestrator import run_turn_async, schedule_memory_update, speculation_stats
 
 # Load environment variables
 load_dotenv()
 
-# Initialize OpenAI API key
-import openai
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-
 def main():
     # Load course data
     try:
-        df = load_courses()
+        manager = CatalogManager().start()
         print("🎓 Ask me anything about UK university courses!")
     except Exception as e:
         print(f"Error loading course data: {str(e)}")
         print("Please check that the courses.json file exists and is properly formatted.")
         return
 
+    # This run's conversation, kept apart from other sessions in the session store
+    session_id = uuid.uuid4().hex
+
     while True:
         try:
             user_input = input("\nYou: ")
             if user_input.lower() in ['quit', 'exit', 'bye']:
                 print("\nGoodbye! Have a great day!")
+                stats = intent_classifier.stats()
+                if stats["turns"]:
+                    print(f"(Intents parsed locally: {stats['local']}/{stats['turns']}, {stats['bypass_rate']:.0%})")
+                latency = latency_summary()
+                if latency:
+                    print(f"(Average time to first token {latency['avg_first_token_seconds']:.2f} s, "
+                          f"full reply {latency['avg_total_seconds']:.2f} s; speculative search hit "
+                          f"{speculation_stats['hits']}/{speculation_stats['turns']} turns, "
+                          f"saving {speculation_stats['saved_seconds'] * 1000:.0f} ms)")
                 break
 
-            # Get conversation history
-            history = get_conversation_history()
-            
-            # Parse user intent
-            try:
-                parsed = parse_intent(user_input, history)
-            except Exception as e:
-                print(f"\nError parsing intent: {str(e)}")
-                print("Continuing with default intent...")
-                parsed = {
-                    "intent": "search",
-                    "entities": {},
-                    "user_preferences": {},
-                    "comparison_details": {},
-                    "clarification_needed": None
-                }
-            
-            # Filter courses based on intent
-            try:
-                matched = filter_courses(parsed, df)
-            except Exception as e:
-                print(f"\nError filtering courses: {str(e)}")
-                print("Continuing with empty results...")
-                matched = df.iloc[0:0]  # Empty DataFrame
-            
-            # Generate response
-            try:
-                reply = generate_response(user_input, parsed, matched, history)
-            except Exception as e:
-                print(f"\nError generating response: {str(e)}")
-                reply = "I'm sorry, I encountered an error while processing your request. Please try again."
-            
-            # Update memory
-            try:
-                update_memory(parsed, reply, user_input, matched["id"].tolist() if not matched.empty else [])
-            except Exception as e:
-                print(f"\nError updating memory: {str(e)}")
-                # Continue without updating memory
+            # Pin the catalog for this turn; reloads swap in a new one between turns
+            catalog = manager.catalog
+
+            # Parse the intent, search the catalog and answer (two-call or single-call pipeline)
+            # Catalog work for the likely follow-up overlaps the intent parse
+            turn = asyncio.run(run_turn_async(user_input, catalog, stream=True, session_id=session_id))
+            for error in turn["errors"]:
+                print(f"\n{error}")
+            reported = len(turn["errors"])
+
+            # Print the response as it arrives
+            print("\nAI: ", end="", flush=True)
+            for chunk in turn["chunks"]:
+                print(chunk, end="", flush=True)
+            print("\n")
+            for error in turn["errors"][reported:]:
+                print(error)
+            parsed, matched, reply = turn["parsed"], turn["matched"], turn["reply"]
             
-            # Print response
-            print(f"\nAI: {reply}\n")
+            # Update memory in the background; the next turn waits for it
+            # A busy turn was never answered, so it is not remembered
+            if not turn["busy"]:
+                schedule_memory_update(parsed, reply, user_input, matched["id"].tolist() if not matched.empty else [],
+                                       session_id=session_id)
             
         except KeyboardInterrupt:
             print("\nGoodbye! Have a great day!")
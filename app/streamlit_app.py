@@ -1,17 +1,22 @@
+import asyncio
 import os
 import sys
 import traceback
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.data_loader import load_courses
-from core.intent_parser import parse_intent
-from core.course_filter import filter_courses
-from core.response_generator import generate_response
-from core.memory import update_memory, get_conversation_history
+from core.admission import admission
+from core.catalog_manager import CatalogManager
+from core.intent_classifier import intent_classifier
+from core.llm import clients, get_backend
+from core.pipeline import DEFAULT_MODE, PIPELINE_MODES
+from core.orchestrator import run_turn_async, schedule_memory_update
+from core.result_cache import filter_cache
+from core.session_store import session_store
 from utils.formatter import format_course_list
 
 # Load environment variables
@@ -29,6 +34,9 @@ st.set_page_config(
 )
 
 # Initialize session state
+# Each browser session has its own conversation memory in the session store
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
 if "messages" not in st.session_state:
     st.session_state["messages"] = []
 if "error" not in st.session_state:
@@ -48,6 +56,10 @@ with st.sidebar:
     else:
         st.warning("Please enter your OpenAI API key to continue.")
         st.stop()
+    st.session_state["pipeline_mode"] = st.selectbox(
+        "Pipeline", PIPELINE_MODES, index=PIPELINE_MODES.index(DEFAULT_MODE),
+        help="two-call: parse the intent, then answer. single-call: the model searches through a function call.",
+    )
 
     st.header("About")
     st.markdown("""
@@ -60,28 +72,57 @@ with st.sidebar:
     - Compare the fees between different universities
     """)
 
-# Load course data
-@st.cache_data
-def load_data():
+# Load course data once per server process; the manager hot-reloads it when the data file changes
+@st.cache_resource
+def get_catalog_manager():
     try:
-        return load_courses()
+        return CatalogManager().start()
     except Exception as e:
         st.error(f"Error loading course data: {str(e)}")
         st.error("Please check that the courses.json file exists and is properly formatted.")
         return None
 
-df = load_data()
+catalog_manager = get_catalog_manager()
+
+# Pin the catalog for this script run so a reload mid-turn cannot change it
+catalog = catalog_manager.catalog if catalog_manager is not None else None
 
 st.markdown("Ask me anything about UK university courses!")
 
 # Display course data info
-if df is not None:
+if catalog is not None:
     st.sidebar.header("Course Data")
-    st.sidebar.write(f"Loaded {len(df)} courses from {len(df['university'].unique())} universities")
+    st.sidebar.write(f"Loaded {len(catalog)} courses from {catalog.courses['university'].nunique()} universities")
     
     # Display a sample of courses
     if st.sidebar.checkbox("Show sample courses"):
-        st.sidebar.dataframe(df[["name", "university", "study_mode", "duration"]].head(5))
+        st.sidebar.dataframe(catalog.select(range(min(5, len(catalog))))[["name", "university", "study_mode", "duration"]])
+
+    cache_stats = filter_cache.stats()
+    st.sidebar.caption(
+        f"Search cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, {cache_stats['entries']} entries"
+    )
+    pool_stats = clients.stats()
+    st.sidebar.caption(
+        f"OpenAI connections: {pool_stats['reused_connections']}/{pool_stats['requests']} requests reused a connection"
+    )
+    if get_backend() is not clients:
+        st.sidebar.caption(f"LLM backend: {get_backend().stats()}")
+    llm_stats = admission.stats()
+    st.sidebar.caption(
+        f"LLM admission: {llm_stats['admitted']} calls, queue {llm_stats['queue_depth']} "
+        f"(max {llm_stats['max_queue_depth']}), average wait {llm_stats['avg_wait_seconds']:.2f} s, "
+        f"{llm_stats['rate_limited']} rate limited, {llm_stats['rejected'] + llm_stats['timed_out'] + llm_stats['busy']} busy"
+    )
+    store_stats = session_store.stats()
+    st.sidebar.caption(
+        f"Sessions: {store_stats['sessions']} active ({store_stats['bytes'] / 1024:.0f} KB, "
+        f"{store_stats['evictions']} evicted, {store_stats['backend']} store)"
+    )
+    intent_stats = intent_classifier.stats()
+    st.sidebar.caption(
+        f"Intents parsed locally: {intent_stats['local']}/{intent_stats['turns']} ({intent_stats['bypass_rate']:.0%})"
+    )
 else:
     st.sidebar.error("Course data is not available")
 
@@ -89,6 +130,9 @@ else:
 for message in st.session_state["messages"]:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
+        if message.get("courses"):
+            with st.expander("Matched courses"):
+                st.markdown(message["courses"])
 
 # Display error if any
 if st.session_state["error"]:
@@ -107,59 +151,48 @@ if prompt := st.chat_input("What would you like to know about university courses
     # Set processing state to True
     st.session_state["is_processing"] = True
     
-    # Display thinking spinner
+    # Display thinking spinner until the reply starts streaming
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
             # Check if data is loaded
-            if df is None:
+            if catalog is None:
                 st.error("Course data is not available. Please check the data file.")
                 st.session_state["messages"].append({"role": "assistant", "content": "I'm sorry, I can't help you right now because the course data is not available. Please try again later."})
                 st.markdown("I'm sorry, I can't help you right now because the course data is not available. Please try again later.")
                 st.session_state["is_processing"] = False
                 st.stop()
             
-            # Get conversation history
-            history = get_conversation_history()
-            
-            # Parse user intent
-            try:
-                parsed = parse_intent(prompt, history, api_key=st.session_state["openai_api_key"])
-            except Exception as e:
-                st.session_state["error"] = f"Error parsing intent: {str(e)}"
-                parsed = {
-                    "intent": "search",
-                    "entities": {},
-                    "user_preferences": {},
-                    "comparison_details": {},
-                    "clarification_needed": None
-                }
-            
-            # Filter courses based on intent
-            try:
-                matched = filter_courses(parsed, df)
-            except Exception as e:
-                st.session_state["error"] = f"Error filtering courses: {str(e)}"
-                matched = df.iloc[0:0]  # Empty DataFrame
-            
-            # Generate response
-            try:
-                reply = generate_response(prompt, parsed, matched, history, api_key=st.session_state["openai_api_key"])
-            except Exception as e:
-                st.session_state["error"] = f"Error generating response: {str(e)}"
-                reply = "I'm sorry, I encountered an error while processing your request. Please try again."
-            
-            # Update memory
-            try:
-                update_memory(parsed, reply, prompt, matched["id"].tolist() if not matched.empty else [])
-            except Exception as e:
-                st.session_state["error"] = f"Error updating memory: {str(e)}"
-                # Continue without updating memory
-            
-            # Add assistant response to chat history
-            st.session_state["messages"].append({"role": "assistant", "content": reply})
-            
-            # Display assistant response
-            st.markdown(reply)
+            # Parse the intent and search the catalog (two-call or single-call pipeline)
+            # Catalog work for the likely follow-up overlaps the intent parse
+            turn = asyncio.run(run_turn_async(prompt, catalog, api_key=st.session_state["openai_api_key"],
+                                              mode=st.session_state["pipeline_mode"], stream=True,
+                                              session_id=st.session_state["session_id"]))
+
+        # Display the assistant response as it arrives
+        st.write_stream(turn["chunks"])
+        if turn["errors"]:
+            st.session_state["error"] = "; ".join(turn["errors"])
+        parsed, matched, reply = turn["parsed"], turn["matched"], turn["reply"]
+        st.caption(
+            f"First token after {turn['timings']['first_token']:.1f} s, full reply in {turn['timings']['total']:.1f} s"
+            f" (speculative search saved {turn['timings']['saved'] * 1000:.0f} ms);"
+            f" {turn['usage']['context_courses']} courses sent in {turn['usage']['context_tokens']} context tokens"
+        )
+        # The precomputed markdown cards of the courses the answer was based on
+        courses = format_course_list(matched.to_dict("records"), catalog.cards) if not matched.empty else None
+        if courses:
+            with st.expander("Matched courses"):
+                st.markdown(courses)
+        
+        # Update memory with the complete reply in the background; the next turn waits for it
+        # A busy turn was never answered, so it is not remembered
+        if not turn["busy"]:
+            schedule_memory_update(parsed, reply, prompt, matched["id"].tolist() if not matched.empty else [],
+                                   api_key=st.session_state["openai_api_key"],
+                                   session_id=st.session_state["session_id"])
+        
+        # Add assistant response to chat history
+        st.session_state["messages"].append({"role": "assistant", "content": reply, "courses": courses})
     
     # Set processing state to False
     st.session_state["is_processing"] = False 
\ No newline at end of file
@@ -1,17 +1,17 @@
 INTENT_SYSTEM_PROMPT = """
-You are an intelligent university course assistant. You must extract structured details from the user's query.
-
-Output format:
-{
-  "intent": "...",
-  "entities": { ... },
-  "user_preferences": { ... },
-  "comparison_details": { ... },
-  "clarification_needed": null
-}
+You are an intelligent university course assistant. You must extract structured details from the user's query
+and record them by calling the record_intent function.
 
 Supported intents:
 "search", "requirements", "fees", "comparison", "duration", "location", "career", "help", "greeting", "farewell", "university_info", "details"
+
+Entities used to search courses (omit any the user did not mention):
+"subject", "university", "campus", "location" (town or city), "study_mode" ("FULL_TIME", "PART_TIME" or "SANDWICH"),
+"duration" (e.g. "3 years"), "start_date" (e.g. "September 2025"), "entry_year" (e.g. "Foundation", "Year 2")
+
+User preferences used to search courses (numbers only):
+"ucas_points", "ucas_margin" (how far from their points they will consider), "min_tariff", "max_tariff",
+"min_fee", "max_fee" (GBP per year), "max_duration" (years)
 """
 
 RESPONSE_SYSTEM_PROMPT = """
@@ -26,4 +26,71 @@ Your response must:
 When discussing entry requirements, always mention the specific UCAS points or other requirements listed in the course data.
 
 Don't mention JSON or that you're AI.
-""" 
\ No newline at end of file
+""" 
+INTENTS = [
+    "search", "requirements", "fees", "comparison", "duration", "location", "career", "help", "greeting",
+    "farewell", "university_info", "details",
+]
+
+_TEXT_OR_LIST = {"anyOf": [{"type": "string"}, {"type": "array", "items": {"type": "string"}}]}
+
+# JSON schema of a parsed intent, shared by the record_intent and search_courses functions
+INTENT_PARAMETERS = {
+    "type": "object",
+    "properties": {
+        "intent": {"type": "string", "enum": INTENTS},
+        "entities": {
+            "type": "object",
+            "properties": {
+                "subject": _TEXT_OR_LIST,
+                "university": _TEXT_OR_LIST,
+                "campus": _TEXT_OR_LIST,
+                "location": _TEXT_OR_LIST,
+                "study_mode": {"type": "string", "enum": ["FULL_TIME", "PART_TIME", "SANDWICH"]},
+                "duration": {"type": "string", "description": "e.g. \"3 years\""},
+                "start_date": {"type": "string", "description": "e.g. \"September 2025\""},
+                "entry_year": {"type": "string", "description": "e.g. \"Foundation\", \"Year 2\""},
+            },
+        },
+        "user_preferences": {
+            "type": "object",
+            "properties": {
+                "ucas_points": {"type": "number"},
+                "ucas_margin": {"type": "number", "description": "How far from their points they will consider"},
+                "min_tariff": {"type": "number"},
+                "max_tariff": {"type": "number"},
+                "min_fee": {"type": "number", "description": "GBP per year"},
+                "max_fee": {"type": "number", "description": "GBP per year"},
+                "max_duration": {"type": "number", "description": "Years"},
+            },
+        },
+        "comparison_details": {"type": "object"},
+        "clarification_needed": {"type": ["string", "null"]},
+    },
+    "required": ["intent", "entities", "user_preferences"],
+}
+
+INTENT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "record_intent",
+        "description": "Record the structured intent of the user's latest message.",
+        "parameters": INTENT_PARAMETERS,
+    },
+}
+
+SEARCH_COURSES_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "search_courses",
+        "description": "Search the UK course catalog with the user's intent and return the best matching courses.",
+        "parameters": INTENT_PARAMETERS,
+    },
+}
+
+# System prompt of the single-call pipeline: the model searches through a function call, then answers
+SINGLE_CALL_SYSTEM_PROMPT = RESPONSE_SYSTEM_PROMPT + """
+Whenever the user asks about courses, call search_courses with the details of their latest message
+(combined with earlier turns when they refer back to them) and answer using only the courses it returns.
+Answer greetings, farewells and requests for help directly.
+"""
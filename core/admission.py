@@ -0,0 +1,334 @@
+"""
+Admission control for LLM calls.
+
+Every chat completion waits for admission before it is sent:
+
+- Two token buckets refill continuously: requests per minute (``LLM_RPM``)
+  and tokens per minute (``LLM_TPM``). A call takes one request and its
+  estimated tokens (prompt plus expected completion). The estimate is
+  corrected from the reported usage once the call finishes.
+- Calls wait in a bounded priority queue: interactive turns go ahead of
+  background work such as history summaries. A call that is not admitted
+  before its deadline, or that finds the queue full, fails with ``LLMBusy``.
+- Rate-limit (429) and transient server errors are retried with jittered
+  exponential backoff. A ``Retry-After`` header from the provider is honoured
+  and pauses admission for every caller, not just the one that got it.
+
+Callers report ``LLMBusy`` to the user as an explicit "busy" answer rather
+than falling back to a guessed intent. Set ``LLM_RPM``/``LLM_TPM`` to 0 to
+disable a bucket.
+"""
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from types import SimpleNamespace
+
+LLM_RPM = int(os.getenv("LLM_RPM", "500"))
+LLM_TPM = int(os.getenv("LLM_TPM", "40000"))
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "16"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "64"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+
+# Seconds a call may wait for admission (and retries) before it is busy
+DEADLINES = {
+    PRIORITY_INTERACTIVE: float(os.getenv("LLM_INTERACTIVE_DEADLINE", "20")),
+    PRIORITY_BACKGROUND: float(os.getenv("LLM_BACKGROUND_DEADLINE", "120")),
+}
+
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 20.0
+RETRY_AFTER_MAX_SECONDS = 60.0
+
+# Completion tokens assumed for a call that sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+
+# Tokens of chat-format overhead per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+RETRY_ERRORS = {"APIConnectionError", "APITimeoutError"}
+
+
+class LLMBusy(Exception):
+    """The LLM call was not admitted in time, or kept being rate limited."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Refills ``per_minute`` units over a minute, up to ``per_minute``. The
+    level may go negative when a call turns out to cost more than estimated.
+    """
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until ``amount`` units are available (0: now)."""
+        if not self.capacity:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # a call larger than the bucket waits for a full one
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        if self.capacity:
+            self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta):
+        """Charge ``delta`` more units (negative: refund) once the real cost is known."""
+        if self.capacity:
+            self.level = min(self.capacity, self.level - delta)
+
+
+def estimate_tokens(request):
+    """Prompt tokens of a chat-completion request plus the completion it may produce."""
+    from core.history import count_tokens
+
+    tokens = 0
+    for message in request.get("messages") or []:
+        tokens += count_tokens(str(message.get("content") or "")) + MESSAGE_OVERHEAD_TOKENS
+    if request.get("tools"):
+        tokens += count_tokens(str(request["tools"]))
+    return tokens + (request.get("max_tokens") or DEFAULT_COMPLETION_TOKENS)
+
+
+def _usage_tokens(response):
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        return None
+    return (usage.prompt_tokens or 0) + (usage.completion_tokens or 0)
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait, from the error's response headers."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return min(float(headers["retry-after-ms"]) / 1000, RETRY_AFTER_MAX_SECONDS)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        return min(max(seconds, 0.0), RETRY_AFTER_MAX_SECONDS)
+    except (TypeError, ValueError):
+        return None
+
+
+def _retryable(error):
+    return getattr(error, "status_code", None) in RETRY_STATUSES or type(error).__name__ in RETRY_ERRORS
+
+
+class HeldStream:
+    """
+    A streamed response that holds its admission slot until the last chunk.
+    The slot is also released by ``close()`` or garbage collection, so a
+    stream that is abandoned, or never iterated at all, cannot leak it.
+    """
+
+    def __init__(self, stream, release):
+        self._response = stream
+        self._release = release
+        self._actual = None
+        try:
+            self._stream = iter(stream)
+        except BaseException:
+            self.close()
+            raise
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._release is None:
+            raise StopIteration
+        try:
+            chunk = next(self._stream)
+        except BaseException:
+            self.close()
+            raise
+        if getattr(chunk, "usage", None) is not None:
+            # The usage of a streamed call arrives with its last chunk
+            self._actual = _usage_tokens(chunk)
+        return chunk
+
+    def close(self):
+        release, self._release = self._release, None
+        if release is None:
+            return
+        try:
+            if hasattr(self._response, "close"):
+                self._response.close()
+        finally:
+            release(self._actual)
+
+    def __del__(self):
+        self.close()
+
+
+class AdmissionController:
+    """
+    Token buckets, a bounded priority queue and retries around LLM calls.
+
+    Args:
+        rpm (int): Requests per minute (0: unlimited)
+        tpm (int): Tokens per minute (0: unlimited)
+        max_concurrent (int): Calls in flight at once
+        queue_size (int): Calls allowed to wait for admission
+        max_retries (int): Retries of a rate-limited or failed call
+        deadlines (dict): Seconds each priority may wait in total
+    """
+
+    def __init__(self, rpm=LLM_RPM, tpm=LLM_TPM, max_concurrent=LLM_MAX_CONCURRENT, queue_size=LLM_QUEUE_SIZE,
+                 max_retries=LLM_MAX_RETRIES, deadlines=None):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.deadlines = {**DEADLINES, **(deadlines or {})}
+        self.active = 0
+        self.paused_until = 0.0
+        self.counts = {"admitted": 0, "rejected": 0, "timed_out": 0, "retries": 0, "rate_limited": 0, "busy": 0}
+        self.max_queue_depth = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._queue = []
+        self._sequence = itertools.count()
+        self._cond = threading.Condition()
+
+    def _wait_time(self, cost, now):
+        if self.active >= self.max_concurrent:
+            return None  # until a call finishes
+        return max(self.paused_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(cost, now), 0.0)
+
+    def admit(self, cost, priority, deadline):
+        """Block until the call may go ahead; raises ``LLMBusy`` if it cannot by ``deadline``."""
+        with self._cond:
+            if len(self._queue) >= self.queue_size:
+                self.counts["rejected"] += 1
+                raise LLMBusy("LLM request queue is full", retry_after=1.0)
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._queue, ticket)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            start = time.monotonic()
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._wait_time(cost, now) if self._queue[0] == ticket else None
+                    if wait == 0.0:
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0 or (wait is not None and wait > remaining):
+                        self.counts["timed_out"] += 1
+                        raise LLMBusy("Timed out waiting for LLM capacity", retry_after=wait)
+                    self._cond.wait(remaining if wait is None else wait)
+                heapq.heappop(self._queue)
+                self.requests.take(1)
+                self.tokens.take(cost)
+                self.active += 1
+                self.counts["admitted"] += 1
+                waited = time.monotonic() - start
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            finally:
+                if ticket in self._queue:
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                # The next caller in line may be able to go now
+                self._cond.notify_all()
+
+    def release(self, cost, actual=None):
+        with self._cond:
+            self.active -= 1
+            if actual is not None:
+                self.tokens.adjust(actual - cost)
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold back every caller for ``seconds`` (the provider's Retry-After)."""
+        with self._cond:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def call(self, create, request, priority=PRIORITY_INTERACTIVE):
+        """``create(**request)`` once admitted, retrying rate limits and transient errors."""
+        cost = estimate_tokens(request)
+        deadline = time.monotonic() + self.deadlines[priority]
+        attempt = 0
+        while True:
+            self.admit(cost, priority, deadline)
+            try:
+                response = create(**request)
+            except Exception as e:
+                self.release(cost)
+                if not _retryable(e):
+                    raise
+                attempt += 1
+                delay = retry_after(e)
+                if getattr(e, "status_code", None) == 429:
+                    self.counts["rate_limited"] += 1
+                    if delay is not None:
+                        self.pause(delay)
+                if delay is None:
+                    # Full jitter keeps retrying callers from stampeding together
+                    delay = random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+                if attempt > self.max_retries or time.monotonic() + delay > deadline:
+                    with self._cond:
+                        self.counts["busy"] += 1
+                    raise LLMBusy(f"LLM unavailable after {attempt} attempt(s): {str(e)}", retry_after=delay) from e
+                with self._cond:
+                    self.counts["retries"] += 1
+                time.sleep(delay)
+                continue
+            if request.get("stream"):
+                return HeldStream(response, lambda actual: self.release(cost, actual))
+            self.release(cost, _usage_tokens(response))
+            return response
+
+    def stats(self):
+        with self._cond:
+            admitted = self.counts["admitted"]
+            now = time.monotonic()
+            return {
+                **self.counts,
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self.max_queue_depth,
+                "active": self.active,
+                "avg_wait_seconds": self.wait_seconds / admitted if admitted else 0.0,
+                "max_wait_seconds": self.max_wait_seconds,
+                "paused_seconds": max(self.paused_until - now, 0.0),
+                "requests_available": self.requests.level if self.requests.capacity else None,
+                "tokens_available": self.tokens.level if self.tokens.capacity else None,
+            }
+
+    def client(self, inner, priority=PRIORITY_INTERACTIVE):
+        """``inner`` (an OpenAI-compatible client) with its completions admitted at ``priority``."""
+        def create(**request):
+            return self.call(inner.chat.completions.create, request, priority)
+
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+admission = AdmissionController()
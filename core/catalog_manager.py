@@ -0,0 +1,131 @@
+import os
+import threading
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from core import snapshot
+from core.data_loader import CATALOG_MAX_MEMORY_MB, load_courses
+
+# Seconds to wait for writes to settle before rebuilding the catalog
+RELOAD_DEBOUNCE = 1.0
+
+
+class _DataFileHandler(FileSystemEventHandler):
+    def __init__(self, manager):
+        self.manager = manager
+
+    def on_any_event(self, event):
+        if event.is_directory:
+            return
+        paths = {os.path.abspath(event.src_path)}
+        if getattr(event, "dest_path", None):
+            paths.add(os.path.abspath(event.dest_path))
+        if paths & self.manager.watched_paths:
+            self.manager.schedule_reload()
+
+
+class CatalogManager:
+    """
+    Owns the live course catalog and hot-reloads it when the data changes.
+
+    The data file (and its compiled snapshot) are watched with watchdog. When
+    either changes, a new catalog and its indexes are built on a background
+    thread and then swapped in with a single reference assignment. Callers
+    should read ``manager.catalog`` once at the start of a turn and use that
+    object throughout: a reload never mutates a catalog that has been handed
+    out, so in-flight turns finish against the version they started with.
+
+    Args:
+        filepath (str): JSON data file to load and watch
+        loader (callable): Builds a catalog from a path, defaults to load_courses
+        debounce (float): Seconds of quiet before a change triggers a rebuild
+        max_memory_mb (float): Loader buffer ceiling, from ``CATALOG_MAX_MEMORY_MB`` by default
+    """
+
+    def __init__(self, filepath="data/clean_structured_example.json", loader=load_courses,
+                 debounce=RELOAD_DEBOUNCE, max_memory_mb=CATALOG_MAX_MEMORY_MB):
+        self.filepath = os.path.abspath(filepath)
+        self.watched_paths = {self.filepath, os.path.abspath(snapshot.snapshot_path(filepath))}
+        self.loader = loader
+        self.debounce = debounce
+        self.max_memory_mb = max_memory_mb
+        self._catalog = None
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._timer = None
+        self._observer = None
+        self.reload_count = 0
+        self.last_error = None
+
+    @property
+    def catalog(self):
+        return self._catalog
+
+    @property
+    def version(self):
+        catalog = self._catalog
+        return catalog.version if catalog is not None else None
+
+    def subscribe(self, callback):
+        """Call ``callback(catalog)`` after every swap, e.g. to drop caches."""
+        self._listeners.append(callback)
+
+    def start(self, watch=True):
+        """Load the initial catalog synchronously and start watching."""
+        if self._catalog is None:
+            self._swap(self._build())
+        if watch and self._observer is None:
+            self._observer = Observer()
+            self._observer.schedule(_DataFileHandler(self), os.path.dirname(self.filepath), recursive=False)
+            self._observer.daemon = True
+            self._observer.start()
+        return self
+
+    def stop(self):
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+        if self._observer:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+
+    def schedule_reload(self):
+        # Restart the timer on every event so a burst of writes reloads once
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+            self._timer = threading.Timer(self.debounce, self.reload)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def reload(self):
+        """Rebuild the catalog and swap it in; keeps the old one on failure."""
+        with self._reload_lock:
+            try:
+                catalog = self._build()
+            except Exception as e:
+                self.last_error = e
+                print(f"Error reloading course catalog: {str(e)}")
+                return False
+            if catalog.version is not None and catalog.version == self.version:
+                return False
+            self._swap(catalog)
+            self.reload_count += 1
+            return True
+
+    def _build(self):
+        options = {"max_memory_mb": self.max_memory_mb} if self.max_memory_mb else {}
+        return self.loader(self.filepath, **options).build_indexes()
+
+    def _swap(self, catalog):
+        self._catalog = catalog
+        self.last_error = None
+        for callback in list(self._listeners):
+            try:
+                callback(catalog)
+            except Exception as e:
+                print(f"Error in catalog reload listener: {str(e)}")
@@ -0,0 +1,95 @@
+"""
+Compact, token-budgeted encoding of the course context sent to the LLM.
+
+Courses are written as one pipe-separated row each under a single header,
+instead of indented JSON objects that repeat every key. Values that recur
+across rows (universities, fee schedules) are written once in a legend and
+referred to by a short code, and a long value repeated from an earlier row
+(the same course in another study mode) is written as ``=#n``. Requirement
+entries with no value are dropped. Rows are added in ranking order until the next
+one would exceed the token budget, so the model sees as many options as the
+budget pays for.
+"""
+import json
+import os
+
+from core.history import count_tokens
+
+COURSE_CONTEXT_TOKENS = int(os.getenv("COURSE_CONTEXT_TOKENS", "1200"))
+
+# Ranked candidates offered to the encoder; the budget decides how many are sent
+CONTEXT_MAX_COURSES = int(os.getenv("CONTEXT_MAX_COURSES", "10"))
+
+COLUMNS = ("name", "university", "study_mode", "duration", "fee", "campus", "entry_requirements", "url")
+
+# Columns whose repeated values are replaced by legend codes
+LEGEND_COLUMNS = {"university": "U", "fee": "F"}
+
+# Long columns whose value is written as "=#n" when row n already has it
+REPEAT_COLUMNS = ("entry_requirements", "url")
+
+
+def _cell(value):
+    if isinstance(value, (list, tuple)):
+        # "Scottish Higher: " and the like say nothing
+        value = "; ".join(str(v) for v in value if not str(v).rstrip().endswith(":"))
+    if value is None or str(value) in ("", "nan", "None"):
+        return "-"
+    return " ".join(str(value).replace("|", "/").split())
+
+
+def compact_json(value):
+    """JSON without whitespace or empty fields."""
+    if isinstance(value, dict):
+        value = {k: v for k, v in value.items() if v not in (None, "", [], {})}
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+
+
+def _render(rows, legends):
+    lines = []
+    for column, prefix in LEGEND_COLUMNS.items():
+        if legends[column]:
+            entries = ", ".join(f"{prefix}{code}={value}" for value, code in legends[column].items())
+            lines.append(f"{column}: {entries}")
+    if rows:
+        lines.append("=#n: same as course n")
+    lines.append("#|" + "|".join(COLUMNS))
+    lines.extend(rows)
+    return "\n".join(lines)
+
+
+def encode_courses(summaries, budget=COURSE_CONTEXT_TOKENS):
+    """
+    Encode ranked course summaries into at most ``budget`` tokens.
+
+    Returns:
+        tuple: ``(text, tokens, count)``; ``count`` leading summaries were included
+    """
+    legends = {column: {} for column in LEGEND_COLUMNS}
+    seen = {column: {} for column in REPEAT_COLUMNS}
+    rows = []
+    text = _render(rows, legends)
+    tokens = count_tokens(text)
+    for summary in summaries:
+        new_legends = {column: dict(codes) for column, codes in legends.items()}
+        cells = [str(len(rows) + 1)]
+        for column in COLUMNS:
+            value = _cell(summary.get(column))
+            if column in LEGEND_COLUMNS and value != "-":
+                codes = new_legends[column]
+                codes.setdefault(value, len(codes) + 1)
+                value = f"{LEGEND_COLUMNS[column]}{codes[value]}"
+            elif column in REPEAT_COLUMNS and value in seen[column]:
+                value = f"=#{seen[column][value]}"
+            cells.append(value)
+        candidate = _render(rows + ["|".join(cells)], new_legends)
+        candidate_tokens = count_tokens(candidate)
+        if candidate_tokens > budget:
+            break
+        rows.append("|".join(cells))
+        legends, text, tokens = new_legends, candidate, candidate_tokens
+        for column in REPEAT_COLUMNS:
+            seen[column].setdefault(_cell(summary.get(column)), len(rows))
+    if not rows:
+        return "(no matching courses)", count_tokens("(no matching courses)"), 0
+    return text, tokens, len(rows)
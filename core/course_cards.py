@@ -0,0 +1,102 @@
+"""
+Per-option course cards, precomputed once per catalog and fee region.
+
+Each study option gets two cards: the compact summary sent to the LLM and
+the markdown shown to users. They are built in one pass over the catalog
+tables at load time and stored in arrays indexed by option row id, so a turn
+looks its results up instead of re-joining fees and re-formatting entry
+requirements row by row. The web app shows the markdown cards of the courses
+behind each answer.
+"""
+import numpy as np
+
+from core.data_loader import _objects
+from utils.formatter import course_markdown, fee_text, requirement_text
+
+# Fee text in the LLM card when the region has no fee for an option
+LLM_FEE_MISSING = "£N/A per year"
+
+
+def region_fees(fees, region, option_count):
+    """
+    The fee of every option in ``region``: the last priced row per option,
+    as at load time for the England fee.
+
+    Returns:
+        tuple: ``(prices, periods)``; NaN / None where the option has no fee there
+    """
+    prices = np.full(option_count, np.nan)
+    periods = np.full(option_count, None, dtype=object)
+    price = fees["price"].to_numpy()
+    mask = (fees["region"] == region).to_numpy() & ~np.isnan(price)
+    keys = fees["option_key"].to_numpy()[mask][::-1]
+    # np.unique keeps the first occurrence, which is the last row once reversed
+    keys, first = np.unique(keys, return_index=True)
+    prices[keys] = price[mask][::-1][first]
+    periods[keys] = _objects(fees["period"])[mask][::-1][first]
+    return prices, periods
+
+
+class CourseCards:
+    """
+    LLM and markdown cards of every study option for one fee region.
+
+    Args:
+        llm (np.ndarray): Summary dicts, indexed by option row id
+        markdown (np.ndarray): Markdown strings, indexed by option row id
+        region (str): Fee region the cards quote
+    """
+
+    def __init__(self, llm, markdown, region):
+        self.llm = llm
+        self.markdown = markdown
+        self.region = region
+
+    @classmethod
+    def build(cls, catalog, region):
+        options = catalog.options
+        count = len(options)
+        course_keys = options["course_key"].to_numpy()
+        names = catalog.courses["name"].to_numpy()[course_keys]
+        universities = _objects(catalog.courses["university"])[course_keys]
+        study_modes = _objects(options["study_mode"])
+        durations = _objects(options["duration"])
+        campuses = _objects(options["campus"])
+        urls = options["external_url"].to_numpy()
+        prices, periods = region_fees(catalog.fees, region, count)
+
+        reqs = catalog.entry_requirements
+        texts = [
+            requirement_text(req_type, min_entry)
+            for req_type, min_entry in zip(_objects(reqs["type"]), _objects(reqs["min_entry"]))
+        ]
+        bounds = np.searchsorted(reqs["option_key"].to_numpy(), np.arange(count + 1))
+
+        llm = np.empty(count, dtype=object)
+        markdown = np.empty(count, dtype=object)
+        for row in range(count):
+            entry_reqs = texts[bounds[row]:bounds[row + 1]]
+            llm[row] = {
+                "name": names[row],
+                "university": universities[row],
+                "study_mode": study_modes[row],
+                "duration": durations[row],
+                "fee": fee_text(prices[row], periods[row], LLM_FEE_MISSING),
+                "campus": campuses[row],
+                "url": urls[row],
+                "entry_requirements": entry_reqs,
+            }
+            markdown[row] = course_markdown(
+                names[row], universities[row], study_modes[row], durations[row], campuses[row],
+                fee_text(prices[row], periods[row]), entry_reqs, urls[row],
+            )
+        return cls(llm, markdown, region)
+
+    def llm_cards(self, row_ids):
+        return [self.llm[row] for row in row_ids]
+
+    def markdown_cards(self, row_ids):
+        return [self.markdown[row] for row in row_ids]
+
+    def __len__(self):
+        return len(self.llm)
@@ -1,24 +1,209 @@
-def filter_courses(parsed, df):
-    ents = parsed["entities"]
-    prefs = parsed["user_preferences"]
-    result = df.copy()
-
-    if ents.get("subject"):
-        result = result[result["name"].str.contains(ents["subject"], case=False)]
-    if ents.get("university"):
-        result = result[result["university"].str.contains(ents["university"], case=False)]
-    if ents.get("study_mode"):
-        result = result[result["study_mode"] == ents["study_mode"]]
-
-    if prefs.get("ucas_points"):
-        def valid(reqs):
-            for r in reqs:
-                if r["type"] == "UCAS Tariff":
-                    try:
-                        return int(r["min_entry"]) <= prefs["ucas_points"]
-                    except:
-                        return False
-            return False
-        result = result[result["entry_requirements"].apply(valid)]
-
-    return result.head(3) 
\ No newline at end of file
+import calendar
+import re
+
+import numpy as np
+
+from core.data_loader import parse_duration_months
+from core.query_planner import BitmapPredicate, QueryPlan, RangePredicate, RowSetPredicate
+from core.ranking import TOP_K, option_ordinals, score_rows, top_k
+from core.result_cache import cache_key, filter_cache
+from core.search_index import intersect
+
+MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+
+# Courses taken from the embedding index when a subject has no text match
+SEMANTIC_CANDIDATES = 50
+
+# Minimum cosine similarity for a semantic subject match
+SEMANTIC_MIN_SCORE = 0.25
+
+
+def as_number(value):
+    """Read a number from intent output such as 120, "120" or "120 points"."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return value
+    match = re.search(r"-?\d+(?:\.\d+)?", str(value).replace(",", ""))
+    return float(match.group(0)) if match else None
+
+
+def as_list(value):
+    """Entities may be a single string or a list of them (e.g. comparisons)."""
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [str(v) for v in values if v not in (None, "")]
+
+
+def normalize_study_mode(value):
+    """Map "full time", "Part-Time", ... onto the catalog's FULL_TIME/PART_TIME codes."""
+    return re.sub(r"[^A-Z]+", "_", str(value).upper()).strip("_")
+
+
+def parse_month(value):
+    """Month number (1-12) of "September", "Sept 2025", "09/2025" or "22/09/2025"."""
+    text = str(value).lower()
+    for word in re.findall(r"[a-z]{3,}", text):
+        for name, month in MONTHS.items():
+            if name.startswith(word):  # "sep", "sept", "september"
+                return month
+    match = re.search(r"(?:\d{1,2}/)?(\d{1,2})/\d{4}", text)
+    if match and 1 <= int(match.group(1)) <= 12:
+        return int(match.group(1))
+    return None
+
+
+def as_months(value):
+    """Duration in months from "3 years"/"18 months", or a bare number of years."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(round(value * 12))
+    months = parse_duration_months(value)
+    if months < 0:
+        years = as_number(value)
+        return None if years is None else int(round(years * 12))
+    return months
+
+
+def tariff_bounds(prefs):
+    """
+    Resolve the UCAS preferences to ``(low, high, include_missing)``, or None.
+
+    - ``ucas_points``: the user's score; keeps courses requiring at most that
+    - ``ucas_margin``: with ``ucas_points``, keeps courses within that many
+      points of the score either way
+    - ``min_tariff`` / ``max_tariff``: explicit bounds on the requirement
+    - ``include_unknown_tariff``: also keep courses with no UCAS requirement
+    """
+    points = as_number(prefs.get("ucas_points"))
+    margin = as_number(prefs.get("ucas_margin"))
+    low = as_number(prefs.get("min_tariff"))
+    high = as_number(prefs.get("max_tariff"))
+    include_missing = bool(prefs.get("include_unknown_tariff"))
+
+    if points is not None and margin is not None:
+        return points - margin, points + margin, include_missing
+    if points is not None:
+        high = points if high is None else min(high, points)
+    if low is None and high is None:
+        return None
+    return low, high, include_missing
+
+
+def _text_rows(catalog, key, index, value):
+    rows = index.search(value)
+    if len(rows):
+        return rows
+    # No substring match: retry with typos and abbreviations resolved
+    resolver = getattr(catalog.resolver, key)
+    if key == "subject":
+        parts = [index.search(token) for token in resolver.correct(value).split()]
+        return intersect(parts) if parts else rows
+    return index.rows_for_values(resolver.resolve(value))
+
+
+def _text_predicate(catalog, key, index, value):
+    parts = [_text_rows(catalog, key, index, v) for v in as_list(value)]
+    rows = np.unique(np.concatenate(parts)) if len(parts) > 1 else parts[0]
+    return RowSetPredicate(key, rows)
+
+
+def _semantic_predicate(name, catalog, value):
+    hits = catalog.embedding_index.search(as_list(value), k=SEMANTIC_CANDIDATES, min_score=SEMANTIC_MIN_SCORE)
+    course_keys = sorted({course_key for matches in hits for course_key, _ in matches})
+    return RowSetPredicate(f"{name} (semantic)", catalog.rows_for_courses(course_keys))
+
+
+def _bitmap_predicate(name, bitmap_indexes, match):
+    # OR together every value of every listed attribute that matches
+    bitmap = None
+    for index in bitmap_indexes:
+        values = index.bitmap(index.codes_where(match))
+        bitmap = values if bitmap is None else bitmap | values
+    return BitmapPredicate(name, bitmap, bitmap_indexes[0].n_rows)
+
+
+def build_predicates(parsed, catalog):
+    """Translate parsed intent entities and preferences into query predicates."""
+    ents = parsed.get("entities") or {}
+    prefs = parsed.get("user_preferences") or {}
+    predicates = []
+
+    for key, index in (
+        ("subject", catalog.name_index),
+        ("university", catalog.university_index),
+        ("campus", catalog.campus_index),
+    ):
+        if as_list(ents.get(key)):
+            predicate = _text_predicate(catalog, key, index, ents[key])
+            if key == "subject" and not predicate.estimate() and catalog.embedding_index is not None:
+                # No course name contains the subject; fall back to meaning
+                predicate = _semantic_predicate(key, catalog, ents[key])
+            predicates.append(predicate)
+
+    locations = [v.lower() for v in as_list(ents.get("location")) + as_list(ents.get("region"))]
+    if locations:
+        predicates.append(_bitmap_predicate(
+            "location",
+            [catalog.campus_bitmap, catalog.city_bitmap],
+            lambda value: any(loc in value.lower() for loc in locations),
+        ))
+
+    modes = {normalize_study_mode(v) for v in as_list(ents.get("study_mode"))}
+    if modes:
+        predicates.append(_bitmap_predicate("study_mode", [catalog.study_mode_bitmap], lambda v: v in modes))
+
+    months = {parse_month(v) for v in as_list(ents.get("start_date"))} - {None}
+    if months:
+        names = {calendar.month_name[m] for m in months}
+        predicates.append(_bitmap_predicate("start_month", [catalog.start_month_bitmap], lambda v: v in names))
+
+    entry_years = [v.lower() for v in as_list(ents.get("entry_year"))]
+    if entry_years:
+        predicates.append(_bitmap_predicate(
+            "entry_year",
+            [catalog.entry_year_bitmap],
+            lambda value: any(year in value.lower() for year in entry_years),
+        ))
+
+    tariff = tariff_bounds(prefs)
+    if tariff is not None:
+        low, high, include_missing = tariff
+        predicates.append(RangePredicate("ucas_tariff", catalog.tariff_index, low, high, include_missing))
+
+    min_fee, max_fee = as_number(prefs.get("min_fee")), as_number(prefs.get("max_fee"))
+    if min_fee is not None or max_fee is not None:
+        predicates.append(RangePredicate("fee", catalog.fee_index, min_fee, max_fee))
+
+    duration = as_months(ents["duration"]) if ents.get("duration") else None
+    max_duration = as_months(prefs["max_duration"]) if prefs.get("max_duration") else None
+    if duration is not None:
+        predicates.append(RangePredicate("duration", catalog.duration_index, duration, duration))
+    elif max_duration is not None:
+        predicates.append(RangePredicate("duration", catalog.duration_index, None, max_duration))
+
+    return predicates
+
+
+def plan_query(parsed, catalog):
+    return QueryPlan(build_predicates(parsed, catalog), len(catalog))
+
+
+def filter_courses(parsed, catalog, k=TOP_K, user_query=None, cache=filter_cache):
+    """
+    Return the ``k`` most relevant study options matching the parsed intent.
+
+    Candidates come from the query planner and are ranked by BM25 relevance
+    to ``user_query`` and the entities; the result has a ``score`` column.
+    Candidate row ids are memoized in ``cache`` (pass None to bypass it).
+    """
+    if cache is None:
+        rows = plan_query(parsed, catalog).execute()
+    else:
+        rows = cache.get_or_compute(
+            catalog.version, cache_key(parsed), lambda: plan_query(parsed, catalog).execute()
+        )
+    points = as_number((parsed.get("user_preferences") or {}).get("ucas_points"))
+    scores = score_rows(parsed, catalog, rows, user_query, ucas_points=points)
+    ranked = top_k(rows, scores, k, tiebreak=option_ordinals(catalog, rows))
+    result = catalog.select([row for row, _ in ranked])
+    result["score"] = [score for _, score in ranked]
+    return result
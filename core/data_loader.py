@@ -1,24 +1,761 @@
-import pandas as pd
+import io
 import json
+import os
+import re
+import calendar
+import sys
+from datetime import date
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
 
-def load_courses(filepath="data/clean_structured_example.json"):
-    with open(filepath) as f:
-        data = json.load(f)
+from core import embeddings, snapshot
+from core.ranking import NAME_WEIGHT, BM25Index
+from core.intent_classifier import Gazetteer
+from core.resolver import CatalogResolver
+from core.search_index import BitmapIndex, RangeIndex, TextFieldIndex
 
-    flat = []
-    for course in data:
-        for opt in course["study_options"]:
-            flat.append({
-                "id": course["id"],
-                "name": course["name"],
-                "university": course["university"],
-                "overview": course["overview"][:300],
-                "study_mode": opt["study_mode"],
-                "duration": opt["duration"],
-                "start_date": opt["start_date"],
-                "entry_requirements": opt["entry_requirements"],
-                "fees": opt["fees"],
-                "campus": opt["campus"]["name"],
-                "external_url": opt["external_url"]
+# Marker for integer columns whose source value is missing or unparseable
+MISSING = -1
+
+# Number of overview characters kept per course
+OVERVIEW_CHARS = 300
+
+# Region whose fee is materialized onto every study option
+DEFAULT_FEE_REGION = "England"
+
+# Region whose fees the course cards quote by default
+CARD_FEE_REGION = os.getenv("FEE_REGION", DEFAULT_FEE_REGION)
+
+# Length of the source content hash used as the catalog version id
+VERSION_CHARS = 16
+
+# Rows preallocated each time a column buffer fills up
+DEFAULT_CHUNK_SIZE = 4096
+
+# Characters read per refill by the streaming JSON parser
+READ_SIZE = 1 << 16
+
+# Ceiling on the column buffers while loading JSON (unset or 0: no limit)
+CATALOG_MAX_MEMORY_MB = float(os.getenv("CATALOG_MAX_MEMORY_MB", "0")) or None
+
+# Characters that matter while scanning for the end of a JSON value
+_STRING_SPECIAL = re.compile(r'["\\]')
+_NESTED_SPECIAL = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r'["\[\]{},\s]')
+
+DURATION_UNITS = {"year": 12, "month": 1, "week": 12 / 52, "day": 12 / 365}
+
+
+class Catalog:
+    """
+    Normalized, columnar view of the course dataset.
+
+    Four tables joined by integer keys:
+      - courses: one row per course (``course_key`` is the positional index)
+      - options: one row per study option, ``course_key`` points into courses
+      - fees: one row per (option, region), ``option_key`` points into options
+      - entry_requirements: one row per (option, qualification)
+      - entry_years: one row per (option, year of entry)
+
+    Repeated strings are stored as pandas categoricals and the numeric fields
+    used for filtering (UCAS minimum, England fee, duration, start date) are
+    parsed once at load time. Option row ids are the positional index of
+    ``options`` and are what filters and indexes pass around.
+    """
+
+    TABLES = ("courses", "options", "fees", "entry_requirements", "entry_years")
+
+    # Lazily built search structures, warmed up front by build_indexes()
+    INDEXES = (
+        "name_index", "university_index", "campus_index", "tariff_index", "fee_index",
+        "duration_index", "study_mode_bitmap", "campus_bitmap", "city_bitmap",
+        "start_month_bitmap", "entry_year_bitmap", "course_bm25", "campus_bm25",
+        "embedding_index", "resolver", "gazetteer", "cards",
+    )
+
+    def __init__(self, courses, options, fees, entry_requirements, entry_years, version=None):
+        self.courses = courses
+        self.options = options
+        self.fees = fees
+        self.entry_requirements = entry_requirements
+        self.entry_years = entry_years
+        # Identifies the source data, so caches keyed on results can invalidate
+        self.version = version
+        # JSON file the catalog was loaded from, used to find sidecar indexes
+        self.source_path = None
+
+    def tables(self):
+        return {name: getattr(self, name) for name in self.TABLES}
+
+    def _course_field_index(self, codes, values):
+        # Course-level codes broadcast onto the study options of each course
+        return TextFieldIndex(np.asarray(codes)[self.options["course_key"].to_numpy()], values)
+
+    @cached_property
+    def name_index(self):
+        codes, values = pd.factorize(self.courses["name"])
+        return self._course_field_index(codes, values)
+
+    @cached_property
+    def university_index(self):
+        university = self.courses["university"]
+        return self._course_field_index(university.cat.codes.to_numpy(), university.cat.categories)
+
+    @cached_property
+    def campus_index(self):
+        campus = self.options["campus"]
+        return TextFieldIndex(campus.cat.codes.to_numpy(), campus.cat.categories)
+
+    @cached_property
+    def tariff_index(self):
+        """Study options sorted by minimum UCAS tariff; unknown tariffs kept apart."""
+        return RangeIndex(self.options["ucas_min"].to_numpy(), missing=MISSING)
+
+    @cached_property
+    def fee_index(self):
+        return RangeIndex(self.options["fee_england"].to_numpy())
+
+    @cached_property
+    def duration_index(self):
+        return RangeIndex(self.options["duration_months"].to_numpy(), missing=MISSING)
+
+    def _option_bitmap(self, series):
+        return BitmapIndex.from_codes(series.cat.codes.to_numpy(), series.cat.categories)
+
+    @cached_property
+    def study_mode_bitmap(self):
+        return self._option_bitmap(self.options["study_mode"])
+
+    @cached_property
+    def campus_bitmap(self):
+        return self._option_bitmap(self.options["campus"])
+
+    @cached_property
+    def city_bitmap(self):
+        city = self.courses["city"]
+        codes = city.cat.codes.to_numpy()[self.options["course_key"].to_numpy()]
+        return BitmapIndex.from_codes(codes, city.cat.categories)
+
+    @cached_property
+    def start_month_bitmap(self):
+        ordinals = self.options["start_ordinal"].to_numpy().astype(np.int64)
+        days = (ordinals - date(1970, 1, 1).toordinal()).astype("datetime64[D]")
+        months = days.astype("datetime64[M]").astype(np.int64) % 12
+        codes = np.where(ordinals == MISSING, -1, months)
+        return BitmapIndex.from_codes(codes, list(calendar.month_name)[1:])
+
+    @cached_property
+    def entry_year_bitmap(self):
+        entry_year = self.entry_years["entry_year"]
+        return BitmapIndex(
+            self.entry_years["option_key"].to_numpy(),
+            entry_year.cat.codes.to_numpy(),
+            entry_year.cat.categories,
+            len(self.options),
+        )
+
+    @cached_property
+    def course_bm25(self):
+        """BM25 over each course's name (weighted) and overview."""
+        return BM25Index([
+            " ".join([name] * NAME_WEIGHT + [overview])
+            for name, overview in zip(self.courses["name"].tolist(), self.courses["overview"].tolist())
+        ])
+
+    @cached_property
+    def campus_bm25(self):
+        return BM25Index(list(self.options["campus"].cat.categories))
+
+    @cached_property
+    def embedding_index(self):
+        """Precomputed course embeddings for this data file, or None if absent or stale."""
+        if not self.source_path:
+            return None
+        path = embeddings.embeddings_path(self.source_path)
+        if not os.path.exists(path):
+            return None
+        index = embeddings.EmbeddingIndex.load(path)
+        if index.catalog_version != self.version or len(index.matrix) != len(self.courses):
+            print(f"Ignoring stale embeddings {path}; rebuild with python -m core.embeddings")
+            return None
+        return index
+
+    @cached_property
+    def resolver(self):
+        """Typo-tolerant lookups over the university, campus and subject vocabularies."""
+        return CatalogResolver(
+            self.university_index.values,
+            self.campus_index.values,
+            self.name_index.values,
+        )
+
+    @cached_property
+    def gazetteer(self):
+        """Catalog vocabulary phrases recognised by the local intent classifier."""
+        return Gazetteer(
+            self.university_index.values,
+            self.campus_index.values,
+            self.city_bitmap.values,
+            self.name_index.values,
+        )
+
+    @cached_property
+    def cards(self):
+        """LLM and markdown cards of every study option, quoting ``CARD_FEE_REGION`` fees."""
+        from core.course_cards import CourseCards  # imports this module's column helpers
+
+        return CourseCards.build(self, CARD_FEE_REGION)
+
+    def rows_for_courses(self, course_keys):
+        """Sorted option row ids of the given courses."""
+        keys = self.options["course_key"].to_numpy()
+        course_keys = np.asarray(course_keys, dtype=np.int64)
+        starts = np.searchsorted(keys, course_keys, side="left")
+        ends = np.searchsorted(keys, course_keys, side="right")
+        if not len(course_keys):
+            return np.empty(0, dtype=np.int64)
+        return np.sort(np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)]))
+
+    def build_indexes(self):
+        """Build every search index now instead of on first use."""
+        for name in self.INDEXES:
+            getattr(self, name)
+        return self
+
+    def __len__(self):
+        return len(self.options)
+
+    def _rows_for(self, table, row_id):
+        keys = table["option_key"].to_numpy()
+        start = np.searchsorted(keys, row_id, side="left")
+        end = np.searchsorted(keys, row_id, side="right")
+        return table.iloc[start:end]
+
+    def fees_for(self, row_id):
+        """Return the fee rows of one study option."""
+        return self._rows_for(self.fees, row_id)
+
+    def requirements_for(self, row_id):
+        """Return the entry requirement rows of one study option."""
+        return self._rows_for(self.entry_requirements, row_id)
+
+    def select(self, row_ids):
+        """
+        Materialize a flat DataFrame for the given option row ids.
+
+        Only the selected rows are joined back to their course and have their
+        entry requirements expanded, so this stays cheap for result sets.
+
+        Args:
+            row_ids (iterable): Positional option row ids
+
+        Returns:
+            pd.DataFrame: One row per selected study option
+        """
+        row_ids = np.asarray(list(row_ids), dtype=np.int64)
+        opts = self.options.iloc[row_ids]
+        courses = self.courses.iloc[opts["course_key"].to_numpy()]
+
+        result = pd.DataFrame({
+            "row_id": row_ids,
+            "id": courses["id"].to_numpy(),
+            "name": courses["name"].to_numpy(),
+            "university": _objects(courses["university"]),
+            "overview": courses["overview"].to_numpy(),
+            "study_mode": _objects(opts["study_mode"]),
+            "duration": _objects(opts["duration"]),
+            "duration_months": opts["duration_months"].to_numpy(),
+            "start_date": _objects(opts["start_date"]),
+            "start_ordinal": opts["start_ordinal"].to_numpy(),
+            "campus": _objects(opts["campus"]),
+            "external_url": opts["external_url"].to_numpy(),
+            "ucas_min": opts["ucas_min"].to_numpy(),
+            "fee_england": opts["fee_england"].to_numpy(),
+            "fee_england_period": _objects(opts["fee_england_period"]),
+        })
+        result["entry_requirements"] = [
+            [
+                {"type": req_type, "min_entry": min_entry}
+                for req_type, min_entry in zip(
+                    _objects(reqs["type"]), _objects(reqs["min_entry"])
+                )
+            ]
+            for reqs in (self.requirements_for(row_id) for row_id in row_ids)
+        ]
+        return result
+
+
+def _objects(series):
+    # Categorical -> plain Python objects, with None for missing values
+    values = np.array(series.astype(object), dtype=object)
+    values[pd.isna(values)] = None
+    return values
+
+
+def parse_int(value):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return MISSING
+
+
+def parse_duration_months(value):
+    """Convert durations such as "3 Years" or "18 Months" to months."""
+    if not value:
+        return MISSING
+    match = re.match(r"\s*(\d+(?:\.\d+)?)\s*([a-zA-Z]+)", str(value))
+    if not match:
+        return MISSING
+    unit = match.group(2).lower().rstrip("s")
+    if unit not in DURATION_UNITS:
+        return MISSING
+    return int(round(float(match.group(1)) * DURATION_UNITS[unit]))
+
+
+def parse_start_ordinal(value):
+    """Convert "DD/MM/YYYY" or "MM/YYYY" start dates to a proleptic ordinal."""
+    if not value:
+        return MISSING
+    parts = str(value).strip().split("/")
+    try:
+        if len(parts) == 3:
+            day, month, year = (int(p) for p in parts)
+        elif len(parts) == 2:
+            day, (month, year) = 1, (int(p) for p in parts)
+        else:
+            return MISSING
+        return date(year, month, day).toordinal()
+    except ValueError:
+        return MISSING
+
+
+def parse_city(location):
+    """Use the last line of a course's location address as its town/city."""
+    address = (location or {}).get("address") or ""
+    lines = [line.strip() for line in address.splitlines() if line.strip()]
+    return lines[-1] if lines else None
+
+
+class _NumericColumn:
+    """Fixed-width column buffer that grows one preallocated chunk at a time."""
+
+    def __init__(self, dtype, chunk_size):
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.current = np.empty(chunk_size, dtype=self.dtype)
+        self.pos = 0
+
+    def append(self, value):
+        if self.pos == self.chunk_size:
+            self.chunks.append(self.current)
+            self.current = np.empty(self.chunk_size, dtype=self.dtype)
+            self.pos = 0
+        self.current[self.pos] = value
+        self.pos += 1
+
+    @property
+    def nbytes(self):
+        return (len(self.chunks) + 1) * self.chunk_size * self.dtype.itemsize
+
+    def finish(self):
+        return np.concatenate(self.chunks + [self.current[:self.pos]])
+
+
+class _CategoricalColumn:
+    """Interns strings as they arrive and buffers only their integer codes."""
+
+    def __init__(self, chunk_size):
+        self.codes = _NumericColumn(np.int32, chunk_size)
+        self.lookup = {}
+        self.categories = []
+        self.string_bytes = 0
+
+    def append(self, value):
+        if value is None:
+            self.codes.append(-1)
+            return
+        code = self.lookup.get(value)
+        if code is None:
+            code = self.lookup[value] = len(self.categories)
+            self.categories.append(value)
+            self.string_bytes += sys.getsizeof(value)
+        self.codes.append(code)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.string_bytes
+
+    def finish(self):
+        return pd.Categorical.from_codes(self.codes.finish(), categories=self.categories)
+
+
+class _TextColumn:
+    """Free-text values, kept as a list of Python strings."""
+
+    def __init__(self):
+        self.values = []
+        self.string_bytes = 0
+
+    def append(self, value):
+        self.values.append(value)
+        self.string_bytes += sys.getsizeof(value)
+
+    @property
+    def nbytes(self):
+        return self.string_bytes + 8 * len(self.values)
+
+    def finish(self):
+        return self.values
+
+
+# Column layout of every catalog table: name -> numpy dtype, "category" or "text"
+CATALOG_SCHEMA = {
+    "courses": {
+        "id": np.int64,
+        "slug": "text",
+        "name": "text",
+        "university": "category",
+        "overview": "text",
+        "external_url": "text",
+        "academic_year": np.int16,
+        "city": "category",
+        "country": "category",
+    },
+    "options": {
+        "course_key": np.int32,
+        "study_mode": "category",
+        "duration": "category",
+        "duration_months": np.int16,
+        "start_date": "category",
+        "start_ordinal": np.int32,
+        "campus": "category",
+        "external_url": "text",
+        "ucas_min": np.int32,
+        "fee_england": np.float64,
+        "fee_england_period": "category",
+    },
+    "fees": {
+        "option_key": np.int32,
+        "region": "category",
+        "price": np.float64,
+        "currency": "category",
+        "period": "category",
+        "state": "category",
+    },
+    "entry_requirements": {
+        "option_key": np.int32,
+        "type": "category",
+        "min_entry": "category",
+        "max_entry": "category",
+        "acceptable": np.bool_,
+    },
+    "entry_years": {
+        "option_key": np.int32,
+        "entry_year": "category",
+    },
+}
+
+
+class CatalogBuilder:
+    """
+    Appends courses one at a time into per-column buffers and assembles the
+    Catalog tables at the end, so only the columnar form is kept in memory.
+
+    Args:
+        chunk_size (int): Rows preallocated each time a numeric buffer fills up
+        max_memory_mb (float): Abort with MemoryError once the buffers exceed this
+    """
+
+    def __init__(self, chunk_size=DEFAULT_CHUNK_SIZE, max_memory_mb=None):
+        self.max_memory_mb = max_memory_mb
+        self.max_memory_bytes = max_memory_mb * 1024 * 1024 if max_memory_mb else None
+        self.columns = {}
+        for table, schema in CATALOG_SCHEMA.items():
+            self.columns[table] = {}
+            for name, kind in schema.items():
+                if kind == "category":
+                    column = _CategoricalColumn(chunk_size)
+                elif kind == "text":
+                    column = _TextColumn()
+                else:
+                    column = _NumericColumn(kind, chunk_size)
+                self.columns[table][name] = column
+        self.course_count = 0
+        self.option_count = 0
+
+    @property
+    def nbytes(self):
+        return sum(c.nbytes for table in self.columns.values() for c in table.values())
+
+    def _append(self, table, row):
+        columns = self.columns[table]
+        for name, value in row.items():
+            columns[name].append(value)
+
+    def add_course(self, course):
+        course_key = self.course_count
+        location = course.get("location") or {}
+        self._append("courses", {
+            "id": parse_int(course.get("id")),
+            "slug": course.get("slug"),
+            "name": course.get("name") or "",
+            "university": course.get("university"),
+            "overview": (course.get("overview") or "")[:OVERVIEW_CHARS],
+            "external_url": course.get("external_url"),
+            "academic_year": parse_int(course.get("academic_year")),
+            "city": parse_city(location),
+            "country": location.get("country"),
+        })
+        self.course_count += 1
+
+        for opt in course.get("study_options") or []:
+            option_key = self.option_count
+            fee_price, fee_period = np.nan, None
+            for fee in opt.get("fees") or []:
+                self._append("fees", {
+                    "option_key": option_key,
+                    "region": fee.get("region"),
+                    "price": np.nan if fee.get("price") is None else float(fee["price"]),
+                    "currency": fee.get("currency"),
+                    "period": fee.get("period"),
+                    "state": fee.get("state"),
+                })
+                if fee.get("region") == DEFAULT_FEE_REGION and fee.get("price") is not None:
+                    fee_price, fee_period = float(fee["price"]), fee.get("period")
+
+            ucas_min = MISSING
+            for req in opt.get("entry_requirements") or []:
+                self._append("entry_requirements", {
+                    "option_key": option_key,
+                    "type": req.get("type"),
+                    "min_entry": req.get("min_entry"),
+                    "max_entry": req.get("max_entry"),
+                    "acceptable": bool(req.get("acceptable")),
+                })
+                if req.get("type") == "UCAS Tariff" and ucas_min == MISSING:
+                    ucas_min = parse_int(req.get("min_entry"))
+
+            for entry_year in opt.get("entry_years") or []:
+                self._append("entry_years", {"option_key": option_key, "entry_year": entry_year})
+
+            self._append("options", {
+                "course_key": course_key,
+                "study_mode": opt.get("study_mode"),
+                "duration": opt.get("duration"),
+                "duration_months": parse_duration_months(opt.get("duration")),
+                "start_date": opt.get("start_date"),
+                "start_ordinal": parse_start_ordinal(opt.get("start_date")),
+                "campus": (opt.get("campus") or {}).get("name"),
+                "external_url": opt.get("external_url"),
+                "ucas_min": ucas_min,
+                "fee_england": fee_price,
+                "fee_england_period": fee_period,
             })
-    return pd.DataFrame(flat) 
\ No newline at end of file
+            self.option_count += 1
+
+        if self.max_memory_bytes and self.nbytes > self.max_memory_bytes:
+            raise MemoryError(
+                f"Catalog buffers exceeded {self.max_memory_mb} MB "
+                f"after {self.course_count} courses"
+            )
+
+    def finish(self):
+        tables = {
+            table: pd.DataFrame({name: column.finish() for name, column in columns.items()})
+            for table, columns in self.columns.items()
+        }
+        return Catalog(**tables)
+
+
+def build_catalog(data):
+    """
+    Build a Catalog from the structured course list.
+
+    Args:
+        data (iterable): Courses in the ``structured_dataset.json`` layout
+
+    Returns:
+        Catalog: Normalized course catalog
+    """
+    builder = CatalogBuilder()
+    for course in data:
+        builder.add_course(course)
+    return builder.finish()
+
+
+def iter_json_array(f, read_size=READ_SIZE):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Only the current element and one read buffer are held in memory. An
+    element that does not fit in the buffer is scanned for its end, resuming
+    where the previous read stopped, and decoded once it is complete.
+
+    Args:
+        f: Text file object positioned at the start of the array
+        read_size (int): Characters read from the file per refill
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def refill(size=read_size):
+        nonlocal buffer, pos, eof
+        chunk = f.read(size)
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def skip_whitespace():
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buffer) or eof:
+                return
+            refill()
+
+    def read_element():
+        # Read on until the element at ``pos`` is complete in the buffer
+        depth, in_string, i = 0, False, pos
+        while True:
+            if in_string:
+                match = _STRING_SPECIAL.search(buffer, i)
+            else:
+                match = (_NESTED_SPECIAL if depth else _SCALAR_END).search(buffer, i)
+            if match is None:
+                if eof:
+                    if depth or in_string:
+                        raise ValueError("Unexpected end of JSON array")
+                    return
+                offset = max(i, len(buffer)) - pos
+                # Reads grow with the element, so a large one is copied O(log n) times
+                refill(max(read_size, len(buffer) - pos))
+                i = pos + offset
+                continue
+            char, i = match.group(), match.end()
+            if in_string:
+                if char == "\\":
+                    i += 1  # skip the escaped character
+                elif not depth:
+                    return
+                else:
+                    in_string = False
+            elif char == '"':
+                in_string = True
+            elif char in "[{":
+                depth += 1
+            elif char in "]}" and depth:
+                depth -= 1
+                if not depth:
+                    return
+            else:
+                return  # a number or literal ended by ",", "]" or whitespace
+
+    skip_whitespace()
+    if pos >= len(buffer) or buffer[pos] != "[":
+        raise ValueError("Expected a top-level JSON array")
+    pos += 1
+    count = 0
+    while True:
+        skip_whitespace()
+        if pos >= len(buffer):
+            raise ValueError("Unexpected end of JSON array")
+        if buffer[pos] == "]":
+            return
+        if count:
+            if buffer[pos] != ",":
+                raise ValueError(f"Expected ',' or ']' in JSON array, got {buffer[pos]!r}")
+            pos += 1
+            skip_whitespace()
+            if pos >= len(buffer):
+                raise ValueError("Unexpected end of JSON array")
+        if buffer[pos] in ",]":
+            raise ValueError("Empty element in JSON array")
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            # A number or literal may continue in the next chunk ("-45" + ".5")
+            complete = eof or end < len(buffer) and (buffer[pos] in '"[{' or buffer[end] in " \t\r\n,]")
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            read_element()
+            item, end = decoder.raw_decode(buffer, pos)
+        pos = end
+        count += 1
+        yield item
+
+
+def stream_courses(filepath, chunk_size=DEFAULT_CHUNK_SIZE, max_memory_mb=None, progress=None,
+                   progress_every=1000):
+    """
+    Build a Catalog by parsing the JSON file one course at a time.
+
+    Courses are appended straight into the column buffers, so the full JSON
+    document and the intermediate list of courses are never held in memory.
+
+    Args:
+        filepath (str): Structured dataset JSON file
+        chunk_size (int): Rows preallocated per numeric buffer growth
+        max_memory_mb (float): Abort with MemoryError above this buffer size
+        progress (callable): Called as ``progress(courses, bytes_read, total_bytes)``
+        progress_every (int): Courses between progress reports
+
+    Returns:
+        Catalog: Normalized course catalog
+    """
+    builder = CatalogBuilder(chunk_size=chunk_size, max_memory_mb=max_memory_mb)
+    total_bytes = os.path.getsize(filepath)
+    with open(filepath, "rb") as raw:
+        f = io.TextIOWrapper(raw, encoding="utf-8")
+        for course in iter_json_array(f):
+            builder.add_course(course)
+            if progress and builder.course_count % progress_every == 0:
+                progress(builder.course_count, raw.tell(), total_bytes)
+        if progress:
+            progress(builder.course_count, total_bytes, total_bytes)
+    return builder.finish()
+
+
+def compile_snapshot(filepath, out_path=None, **stream_options):
+    """
+    Build the catalog from a JSON data file and write its binary snapshot.
+
+    Returns:
+        dict: The snapshot header
+    """
+    catalog = stream_courses(filepath, **stream_options)
+    out_path = out_path or snapshot.snapshot_path(filepath)
+    return snapshot.write_snapshot(catalog.tables(), out_path, source_path=filepath)
+
+
+def load_courses(filepath="data/clean_structured_example.json", use_snapshot=True, **stream_options):
+    """
+    Load the course catalog.
+
+    The compiled snapshot next to ``filepath`` is memory-mapped when it exists
+    and matches the JSON file; otherwise the JSON is parsed incrementally with
+    ``stream_courses`` (which accepts ``max_memory_mb`` and ``progress``).
+    """
+    snapshot_file = snapshot.snapshot_path(filepath)
+    if use_snapshot and snapshot.is_fresh(snapshot_file, filepath):
+        try:
+            tables, header = snapshot.read_snapshot(snapshot_file)
+            catalog = Catalog(**tables, version=header["source"]["sha256"][:VERSION_CHARS])
+            catalog.source_path = filepath
+            return catalog
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable snapshot {snapshot_file}: {e}")
+
+    catalog = stream_courses(filepath, **stream_options)
+    catalog.version = snapshot.file_digest(filepath)[:VERSION_CHARS]
+    catalog.source_path = filepath
+    return catalog
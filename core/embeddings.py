@@ -0,0 +1,240 @@
+"""
+Semantic course search over a precomputed embedding matrix.
+
+An offline step encodes every course's name and overview into a float32
+matrix (optionally quantized to int8 with one scale per row) and saves it as
+``.npy`` next to the data file, with a small JSON sidecar describing the
+encoder and the catalog version it was built from:
+
+    python -m core.embeddings data/clean_structured_example.json --encoder hashing --int8
+
+At query time the matrix is memory-mapped, queries are encoded in one batch
+and scored with NumPy dot products.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+
+EMBEDDINGS_SUFFIX = ".embeddings.npy"
+
+# Rows scored per step, bounding the float32 copy made of an int8 matrix
+SCORE_CHUNK_ROWS = 8192
+
+ENCODE_BATCH_SIZE = 256
+
+
+class HashingEncoder:
+    """
+    Offline TF-IDF encoder: character n-gram counts hashed into a fixed
+    number of dimensions and weighted by IDF fitted on the course texts.
+    Needs no model download and still relates words sharing stems
+    ("robots" / "Robotics").
+    """
+
+    name = "hashing"
+
+    def __init__(self, dim=1024, ngram_range=(3, 5), idf=None):
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.dim = dim
+        self.ngram_range = tuple(ngram_range)
+        self.idf = None if idf is None else np.asarray(idf, dtype=np.float32)
+        self.vectorizer = HashingVectorizer(
+            analyzer="char_wb",
+            ngram_range=self.ngram_range,
+            n_features=dim,
+            alternate_sign=False,
+            norm=None,
+        )
+
+    def params(self):
+        params = {"dim": self.dim, "ngram_range": list(self.ngram_range)}
+        if self.idf is not None:
+            params["idf"] = [round(float(w), 4) for w in self.idf]
+        return params
+
+    def fit(self, texts):
+        """Learn IDF weights of the hashed features from the corpus."""
+        counts = self.vectorizer.transform(texts)
+        df = np.bincount(counts.indices, minlength=self.dim)
+        self.idf = (np.log((1 + len(texts)) / (1 + df)) + 1).astype(np.float32)
+        return self
+
+    def encode(self, texts, batch_size=ENCODE_BATCH_SIZE):
+        vectors = self.vectorizer.transform(texts).astype(np.float32)
+        vectors.data = np.log1p(vectors.data)  # sublinear tf
+        vectors = vectors.toarray()
+        if self.idf is not None:
+            vectors *= self.idf
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class SentenceTransformerEncoder:
+    """Dense sentence embeddings from a sentence-transformers model."""
+
+    name = "sentence-transformers"
+
+    def __init__(self, model_name="all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+
+    def params(self):
+        return {"model_name": self.model_name}
+
+    def encode(self, texts, batch_size=ENCODE_BATCH_SIZE):
+        vectors = self.model.encode(
+            list(texts), batch_size=batch_size, normalize_embeddings=True, show_progress_bar=False
+        )
+        return np.asarray(vectors, dtype=np.float32)
+
+
+ENCODERS = {
+    HashingEncoder.name: HashingEncoder,
+    SentenceTransformerEncoder.name: SentenceTransformerEncoder,
+}
+
+
+def get_encoder(name="hashing", **params):
+    if name not in ENCODERS:
+        raise ValueError(f"Unknown encoder {name!r}; choose from {', '.join(ENCODERS)}")
+    return ENCODERS[name](**params)
+
+
+def embeddings_path(source_path):
+    return os.path.splitext(source_path)[0] + EMBEDDINGS_SUFFIX
+
+
+def _meta_path(path):
+    return path + ".json"
+
+
+def course_texts(catalog):
+    return [
+        f"{name}. {overview}"
+        for name, overview in zip(catalog.courses["name"].tolist(), catalog.courses["overview"].tolist())
+    ]
+
+
+def quantize(matrix):
+    """Symmetric int8 quantization with one float32 scale per row."""
+    scales = np.abs(matrix).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    return np.round(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+
+def build_embedding_index(catalog, out_path, encoder=None, int8=False, batch_size=ENCODE_BATCH_SIZE):
+    """
+    Encode every course and save the matrix (and int8 scales) as ``.npy``.
+
+    Returns:
+        dict: The metadata written next to the matrix
+    """
+    encoder = encoder or get_encoder()
+    texts = course_texts(catalog)
+    if hasattr(encoder, "fit"):
+        encoder.fit(texts)
+    matrix = np.zeros((len(texts), encoder.dim), dtype=np.float32)
+    for start in range(0, len(texts), batch_size):
+        matrix[start:start + batch_size] = encoder.encode(texts[start:start + batch_size], batch_size)
+
+    meta = {
+        "encoder": encoder.name,
+        "params": encoder.params(),
+        "catalog_version": catalog.version,
+        "rows": len(texts),
+        "dim": encoder.dim,
+        "dtype": "int8" if int8 else "float32",
+    }
+    if int8:
+        matrix, scales = quantize(matrix)
+        np.save(out_path + ".scales.npy", scales)
+    np.save(out_path, matrix)
+    with open(_meta_path(out_path), "w") as f:
+        json.dump(meta, f, indent=2)
+    return meta
+
+
+class EmbeddingIndex:
+    """
+    Memory-mapped course embedding matrix plus the encoder that built it.
+
+    Args:
+        matrix (np.ndarray): (courses, dim) float32 or int8 matrix
+        encoder: Object with ``encode(texts)`` returning L2-normalized rows
+        scales (np.ndarray): Per-row scales when ``matrix`` is int8
+    """
+
+    def __init__(self, matrix, encoder, scales=None, catalog_version=None):
+        self.matrix = matrix
+        self.encoder = encoder
+        self.scales = scales
+        self.catalog_version = catalog_version
+
+    @classmethod
+    def load(cls, path, encoder=None):
+        with open(_meta_path(path)) as f:
+            meta = json.load(f)
+        matrix = np.load(path, mmap_mode="r")
+        scales = np.load(path + ".scales.npy") if meta["dtype"] == "int8" else None
+        encoder = encoder or get_encoder(meta["encoder"], **meta["params"])
+        return cls(matrix, encoder, scales, meta.get("catalog_version"))
+
+    def similarities(self, queries):
+        """Cosine similarity of every course to each query: (queries, courses)."""
+        vectors = self.encoder.encode(list(queries))
+        result = np.empty((len(vectors), len(self.matrix)), dtype=np.float32)
+        for start in range(0, len(self.matrix), SCORE_CHUNK_ROWS):
+            chunk = np.asarray(self.matrix[start:start + SCORE_CHUNK_ROWS], dtype=np.float32)
+            scores = vectors @ chunk.T
+            if self.scales is not None:
+                scores *= self.scales[start:start + SCORE_CHUNK_ROWS]
+            result[:, start:start + SCORE_CHUNK_ROWS] = scores
+        return result
+
+    def search(self, queries, k=10, min_score=0.0):
+        """
+        Top ``k`` courses for each query.
+
+        Returns:
+            list: Per query, a list of ``(course_key, score)`` pairs, best first
+        """
+        results = []
+        for scores in self.similarities(queries):
+            k_eff = min(k, len(scores))
+            if not k_eff:
+                results.append([])
+                continue
+            top = np.argpartition(-scores, k_eff - 1)[:k_eff]
+            top = top[np.argsort(-scores[top], kind="stable")]
+            results.append([(int(i), float(scores[i])) for i in top if scores[i] > min_score])
+        return results
+
+
+def main(argv=None):
+    from core.data_loader import load_courses
+
+    parser = argparse.ArgumentParser(description="Precompute course embeddings for semantic search")
+    parser.add_argument("data", nargs="?", default="data/clean_structured_example.json")
+    parser.add_argument("--encoder", choices=sorted(ENCODERS), default="hashing")
+    parser.add_argument("--model", help="sentence-transformers model name")
+    parser.add_argument("--int8", action="store_true", help="store the matrix quantized to int8")
+    args = parser.parse_args(argv)
+    if args.model and args.encoder != SentenceTransformerEncoder.name:
+        parser.error(f"--model only applies to --encoder {SentenceTransformerEncoder.name}")
+
+    params = {"model_name": args.model} if args.model else {}
+    catalog = load_courses(args.data)
+    out_path = embeddings_path(args.data)
+    meta = build_embedding_index(catalog, out_path, get_encoder(args.encoder, **params), int8=args.int8)
+    print(f"Wrote {out_path}: {meta['rows']} x {meta['dim']} {meta['dtype']} ({meta['encoder']})")
+
+
+if __name__ == "__main__":
+    main()
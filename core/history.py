@@ -0,0 +1,169 @@
+"""
+Token-budgeted conversation history.
+
+Instead of replaying every turn, each LLM call gets:
+
+- the structured facts of the session (subject, UCAS points, shortlisted
+  course ids) as a compact JSON line,
+- a running prose summary of the turns that have been folded away, and
+- the most recent turns verbatim, newest first, as far as its token budget
+  allows.
+
+Old turns are folded into the summary by a background LLM call once more
+than ``HISTORY_KEEP_TURNS`` turns are held, so the stored history stays
+bounded too. The intent and response calls have separate budgets.
+"""
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from core.admission import PRIORITY_BACKGROUND
+from core.llm import CHAT_MODEL, get_client
+
+INTENT_HISTORY_TOKENS = int(os.getenv("INTENT_HISTORY_TOKENS", "800"))
+RESPONSE_HISTORY_TOKENS = int(os.getenv("RESPONSE_HISTORY_TOKENS", "2000"))
+
+# Turns kept verbatim; older ones are folded into the summary
+HISTORY_KEEP_TURNS = int(os.getenv("HISTORY_KEEP_TURNS", "6"))
+
+# Turns folded per summarization call, so the summary is not rewritten every turn
+FOLD_BATCH_TURNS = 2
+
+SUMMARY_MAX_TOKENS = 250
+
+# Shortlisted course ids kept in the compact state
+STATE_MAX_COURSES = 10
+
+# Tokens of chat-format overhead per message
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a student and a UK university course advisor.
+Keep what the student wants (subjects, places, grades, budget, study mode), courses discussed and open questions.
+Write at most 120 words of plain prose. Reply with the summary only."""
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def count_tokens(text):
+    """Tokens in ``text``: exact with tiktoken installed, else about 4 characters each."""
+    global _encoding
+    text = text or ""
+    if _encoding is None:
+        with _encoding_lock:
+            if _encoding is None:
+                try:
+                    import tiktoken
+
+                    _encoding = tiktoken.encoding_for_model(CHAT_MODEL)
+                except Exception:
+                    _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+class History(list):
+    """
+    The verbatim turns of a conversation (``{"user", "ai"}`` dicts) plus the
+    summary of folded turns and the compact session state.
+    """
+
+    def __init__(self, turns=(), summary="", state=None):
+        super().__init__(turns)
+        self.summary = summary or ""
+        self.state = state or {}
+
+
+def compact_state(memory):
+    """The session facts worth keeping exactly, without empty values."""
+    state = {
+        "subject": memory.get("last_subject"),
+        "ucas_points": memory.get("last_ucas"),
+        "shortlisted_course_ids": list(memory.get("last_courses") or [])[:STATE_MAX_COURSES],
+    }
+    return {key: value for key, value in state.items() if value not in (None, "", [])}
+
+
+def history_messages(history, budget):
+    """
+    Chat messages replaying ``history`` within ``budget`` tokens.
+
+    Returns:
+        list: A system message with the state and summary (if any), then the
+        most recent turns that fit, oldest first
+    """
+    messages = []
+    used = 0
+    context = []
+    state = getattr(history, "state", None)
+    summary = getattr(history, "summary", "")
+    if state:
+        context.append(f"Known facts: {json.dumps(state, separators=(',', ':'))}")
+    if summary:
+        context.append(f"Earlier in this conversation: {summary}")
+    if context:
+        content = "\n".join(context)
+        messages.append({"role": "system", "content": content})
+        used += count_tokens(content) + MESSAGE_OVERHEAD_TOKENS
+
+    recent = []
+    for turn in reversed(list(history)[-HISTORY_KEEP_TURNS:]):
+        cost = count_tokens(turn["user"]) + count_tokens(turn["ai"]) + 2 * MESSAGE_OVERHEAD_TOKENS
+        if used + cost > budget:
+            break
+        used += cost
+        recent.append(turn)
+    for turn in reversed(recent):
+        messages.append({"role": "user", "content": turn["user"]})
+        messages.append({"role": "assistant", "content": turn["ai"]})
+    return messages
+
+
+def summarize(summary, turns, api_key=None):
+    """The running summary extended with ``turns``."""
+    transcript = "\n".join(f"Student: {t['user']}\nAdvisor: {t['ai']}" for t in turns)
+    response = get_client(api_key, priority=PRIORITY_BACKGROUND).chat.completions.create(
+        model=CHAT_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_PROMPT},
+            {"role": "user", "content": f"Current summary: {summary or '(none)'}\n\nNew turns:\n{transcript}"},
+        ],
+        max_tokens=SUMMARY_MAX_TOKENS,
+    )
+    return (response.choices[0].message.content or summary).strip()
+
+
+# One worker, so folds apply in order and never overlap
+_summary_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="summary")
+
+
+def fold_old_turns(memory, api_key=None):
+    """Fold the turns beyond the verbatim window into the summary (blocking)."""
+    turns = memory["turns"]
+    fold = len(turns) - HISTORY_KEEP_TURNS
+    if fold < FOLD_BATCH_TURNS:
+        return False
+    try:
+        summary = summarize(memory.get("summary", ""), turns[:fold], api_key)
+    except Exception as e:
+        print(f"Error summarizing history: {str(e)}")
+        return False
+    # New turns are only ever appended, so the first ``fold`` are still the ones summarized
+    memory["summary"] = summary
+    del turns[:fold]
+    return True
+
+
+def schedule_fold(memory, api_key=None, fold=None):
+    """
+    Refresh the summary in the background when enough old turns have built up.
+    ``fold`` runs instead of folding ``memory`` in place, e.g. to write the
+    result back to a session store.
+    """
+    if len(memory["turns"]) - HISTORY_KEEP_TURNS >= FOLD_BATCH_TURNS:
+        if fold is None:
+            return _summary_worker.submit(fold_old_turns, memory, api_key)
+        return _summary_worker.submit(fold)
+    return None
@@ -0,0 +1,181 @@
+"""
+Two-tier cache of LLM intent parses.
+
+A parse is keyed on the normalized message plus a digest of the recent
+conversation, so "what about part-time?" after a nursing search never reuses
+the parse made after a law search. Lookups go to an in-process LRU first and
+then to a SQLite file shared by every worker process and kept across
+restarts. Both tiers expire entries after a TTL; the SQLite tier is also
+trimmed to a maximum number of rows, least recently used first.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from config.gpt_prompt_templates import INTENT_SYSTEM_PROMPT, INTENT_TOOL
+from core.intent_classifier import normalize_query
+from core.llm import CHAT_MODEL
+
+INTENT_CACHE_PATH = os.getenv("INTENT_CACHE_PATH", "data/intent_cache.sqlite3")
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 3600
+MEMORY_MAX_ENTRIES = 1024
+DISK_MAX_ENTRIES = 50_000
+
+# Past turns that can change how a message is parsed
+HISTORY_TURNS = 3
+
+# Changing the prompt, the intent tool schema or the model invalidates every cached parse
+PROMPT_DIGEST = hashlib.sha256(
+    (INTENT_SYSTEM_PROMPT + json.dumps(INTENT_TOOL, sort_keys=True)).encode("utf-8")
+).hexdigest()[:12]
+
+
+def history_digest(history, turns=HISTORY_TURNS):
+    recent = [
+        [normalize_query(turn.get("user")), normalize_query(turn.get("ai"))]
+        for turn in list(history or [])[-turns:]
+    ]
+    # Session facts (e.g. the subject) and the summary also change how a follow-up is read
+    state = getattr(history, "state", None)
+    summary = getattr(history, "summary", "")
+    if not recent and not state and not summary:
+        return "-"
+    return hashlib.sha256(json.dumps([recent, state, summary], sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(user_query, history=None, model=CHAT_MODEL):
+    return f"{model}:{PROMPT_DIGEST}:{history_digest(history)}:{normalize_query(user_query)}"
+
+
+class IntentCache:
+    """
+    In-memory LRU in front of an optional SQLite table of parses.
+
+    Args:
+        path (str): SQLite file, or None for a memory-only cache
+        ttl (float): Seconds a parse stays valid
+        memory_entries (int): Entries kept in the in-process LRU
+        disk_entries (int): Rows kept in the SQLite table
+    """
+
+    def __init__(self, path=INTENT_CACHE_PATH, ttl=DEFAULT_TTL_SECONDS,
+                 memory_entries=MEMORY_MAX_ENTRIES, disk_entries=DISK_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+
+    def _connection(self):
+        # A connection must not cross a fork; pre-forked workers open their own
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS intent_cache ("
+                "key TEXT PRIMARY KEY, parsed TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS intent_cache_accessed ON intent_cache (accessed)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _remember(self, key, parsed, created):
+        self._memory[key] = (parsed, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """Cached parse for ``key``, or None. Callers get their own copy."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return json.loads(entry[0])
+            self._memory.pop(key, None)
+
+            row = None
+            if self.path:
+                try:
+                    conn = self._connection()
+                    row = conn.execute(
+                        "SELECT parsed, created FROM intent_cache WHERE key = ? AND created >= ?",
+                        (key, now - self.ttl),
+                    ).fetchone()
+                    if row is not None:
+                        conn.execute("UPDATE intent_cache SET accessed = ? WHERE key = ?", (now, key))
+                        conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Intent cache read failed: {str(e)}")
+            if row is None:
+                self.misses += 1
+                return None
+            self._remember(key, row[0], row[1])
+            self.disk_hits += 1
+            return json.loads(row[0])
+
+    def put(self, key, parsed):
+        now = time.time()
+        value = json.dumps(parsed)
+        with self._lock:
+            self._remember(key, value, now)
+            if not self.path:
+                return
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO intent_cache (key, parsed, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, value, now, now),
+                )
+                self._evict(conn, now)
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Intent cache write failed: {str(e)}")
+
+    def _evict(self, conn, now):
+        conn.execute("DELETE FROM intent_cache WHERE created < ?", (now - self.ttl,))
+        (rows,) = conn.execute("SELECT COUNT(*) FROM intent_cache").fetchone()
+        if rows > self.disk_entries:
+            conn.execute(
+                "DELETE FROM intent_cache WHERE key IN "
+                "(SELECT key FROM intent_cache ORDER BY accessed LIMIT ?)",
+                (rows - self.disk_entries,),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self.path:
+                conn = self._connection()
+                conn.execute("DELETE FROM intent_cache")
+                conn.commit()
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+        }
+
+
+intent_cache = IntentCache()
@@ -0,0 +1,411 @@
+"""
+In-process intent classification for turns that do not need the LLM.
+
+Greetings, farewells, help requests and plain searches such as "show me
+nursing courses at Leeds" are recognised with rules plus gazetteer lookups
+against the catalog's own vocabularies (universities, campuses, towns and
+course subjects). Each parse gets a confidence from how much of the message
+was explained; only turns below the threshold go to GPT-4.
+
+An optional scikit-learn model trained on logged LLM parses can refine the
+intent label:
+
+    python -m core.intent_classifier data/intent_log.jsonl --out data/intent_model.joblib
+"""
+import argparse
+import calendar
+import json
+import os
+import re
+import threading
+
+from core.resolver import ABBREVIATIONS, GENERIC_NAME_WORDS, INSTITUTION_WORDS, UNIVERSITY_ALIASES, normalize
+
+DEFAULT_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+
+# LLM parses are appended here as training data for the model, when set
+INTENT_LOG_PATH = os.getenv("INTENT_LOG_PATH")
+INTENT_MODEL_PATH = os.getenv("INTENT_MODEL_PATH", "data/intent_model.joblib")
+
+# Longest gazetteer phrase tried, in tokens
+MAX_PHRASE_TOKENS = 5
+
+# Messages that are entirely small talk
+SMALL_TALK = {
+    "greeting": re.compile(r"^(hi|hello|hey|hiya|howdy|good (morning|afternoon|evening))( there)?$"),
+    "farewell": re.compile(
+        r"^((thanks|thank you|cheers|ok|okay)( (a lot|so much|very much))?( and)? )?"
+        r"(bye|goodbye|bye bye|see you|see ya|cya|that s all|thats all)( for now| then)?$"
+    ),
+    "help": re.compile(r"^(help|help me|what can you do|how does this work|what do you do|how can you help)$"),
+}
+
+# Question intents, checked in order; "search" is the default
+INTENT_KEYWORDS = (
+    ("comparison", re.compile(r"\b(compare|comparison|versus|vs|difference between)\b")),
+    ("fees", re.compile(r"\b(fees?|cost|costs|tuition|price|how much)\b")),
+    ("duration", re.compile(r"\b(how long|duration|how many years)\b")),
+    ("career", re.compile(r"\b(careers?|jobs?|employability|prospects)\b")),
+    ("location", re.compile(r"\b(where is|where are|where s|located)\b")),
+    ("requirements", re.compile(r"\b(entry requirements?|requirements?|grades?|ucas|tariff|qualify|get in)\b")),
+)
+
+# Intents the local parse can fully answer; the rest need the LLM's reading
+LOCAL_INTENTS = {"search", "fees", "duration", "location", "requirements"}
+
+# Words that refer back to earlier turns; the LLM resolves them from history
+FOLLOW_UP = re.compile(r"\b(it|its|that|this|those|these|them|they|same|instead|what about|how about|and the)\b")
+
+# Words that carry no search information
+FILLER = {
+    "a", "about", "all", "am", "an", "and", "any", "anything", "are", "at", "available", "be", "can",
+    "course", "courses", "could", "degree", "degrees", "do", "does", "find", "for", "get", "give", "have",
+    "hi", "hello", "i", "im", "in", "interested", "is", "list", "looking", "me", "my", "near", "of",
+    "offer", "offered", "offers", "on", "options", "or", "please", "programme", "programmes", "search",
+    "show", "some", "study", "studying", "tell", "the", "there", "to", "uni", "universities",
+    "university", "want", "what", "which", "with", "would", "like", "you", "around", "based", "by",
+    "fee", "fees", "cost", "costs", "tuition", "how", "much", "long", "where", "requirements",
+    "requirement", "entry", "grades", "ucas", "it", "take", "need", "located",
+}
+
+# Qualification suffixes stripped from course names to get their subject
+QUALIFICATION = re.compile(
+    r"\s+\b(bsc|ba|beng|meng|msci|mmath|mpharm|llb|fda|fdsc|hnd|hnc|dipHE|certhe|bed|bmus|ma|msc)\b.*$",
+    re.IGNORECASE,
+)
+
+NEAR_WORDS = {"in", "near", "around"}
+
+# Longest run of unknown words taken as a subject ("computer science")
+MAX_FREE_SUBJECT_TOKENS = 2
+
+MONTH_PATTERN = "|".join(name.lower() for name in calendar.month_name if name)
+
+
+def normalize_query(text):
+    text = str(text or "").lower().replace("'", "").replace("’", "")
+    text = re.sub(r"(?<=\d),(?=\d{3})", "", text)
+    return " ".join(re.findall(r"£|[a-z0-9]+", text))
+
+
+def subject_titles(name):
+    """Subjects named by a course title: "Criminology with Forensic Psychology BSc (Hons)"."""
+    title = QUALIFICATION.sub("", re.sub(r"\(.*?\)", " ", name or ""))
+    title = normalize(title.replace("&", " and "))
+    parts = [p.strip() for p in re.split(r"\b(?:and|with)\b", title)]
+    return {p for p in [title] + parts if p}
+
+
+class Gazetteer:
+    """
+    Normalized phrases of the catalog vocabularies mapped to entity values.
+
+    Args:
+        universities (list): University names
+        campuses (list): Campus names
+        cities (list): Town/city names of the campuses
+        course_names (list): Course titles
+    """
+
+    def __init__(self, universities, campuses, cities, course_names):
+        self.phrases = {}
+        self.subject_heads = set()
+        universities = [u for u in universities if u]
+        present = set(universities)
+        for university in universities:
+            self._add(normalize(university), "university", university)
+            short = " ".join(w for w in normalize(university).split() if w not in INSTITUTION_WORDS)
+            if len(short.split()) > 1:  # "liverpool hope"; single words are handled below
+                self._add(short, "university", university)
+        for alias, university in UNIVERSITY_ALIASES.items():
+            if university in present:
+                self._add(normalize(alias), "university", university)
+
+        # Distinctive single words ("leicester", "lancashire") name the universities containing them
+        owners = {}
+        for university in universities:
+            for word in normalize(university).split():
+                owners.setdefault(word, set()).add(university)
+        for word, names in owners.items():
+            if word not in GENERIC_NAME_WORDS and word not in FILLER and len(word) > 3:
+                self._add(word, "university", names.pop() if len(names) == 1 else word.title())
+
+        for campus in campuses:
+            if campus and normalize(campus) not in {"main site", "main campus"}:
+                self._add(normalize(campus), "campus", campus)
+        for city in cities:
+            for phrase in {normalize(city), normalize(city).split()[-1] if city else ""} - {""}:
+                self._add(phrase, "location", phrase.title())
+        for name in course_names:
+            for phrase in subject_titles(name):
+                if len(phrase.split()) <= MAX_PHRASE_TOKENS:
+                    self._add(phrase, "subject", phrase)
+                self.subject_heads.add(phrase.split()[-1])
+
+    def _add(self, phrase, kind, value):
+        if phrase:
+            self.phrases.setdefault(phrase, {}).setdefault(kind, value)
+
+    def match(self, tokens):
+        """
+        Greedy longest-first matches over ``tokens``. A short run of unmatched
+        words ending like a course subject ("computer science", "criminal law")
+        is taken as a subject too.
+
+        Returns:
+            tuple: ``(entities, explained)``; entities maps a kind to its values,
+            explained is the set of token positions covered by a match
+        """
+        entities = {}
+        explained = set()
+        expanded = [ABBREVIATIONS.get(t, t) for t in tokens]  # "maths" -> "mathematics"
+        i = 0
+        while i < len(tokens):
+            for size in range(min(MAX_PHRASE_TOKENS, len(tokens) - i), 0, -1):
+                kinds = (self.phrases.get(" ".join(tokens[i:i + size]))
+                         or self.phrases.get(" ".join(expanded[i:i + size])))
+                if kinds:
+                    kind = self._pick(kinds, tokens[i - 1] if i else None)
+                    values = entities.setdefault(kind, [])
+                    if kinds[kind] not in values:
+                        values.append(kinds[kind])
+                    explained.update(range(i, i + size))
+                    i += size
+                    break
+            else:
+                i += 1
+
+        run = []
+        for i, token in enumerate(tokens + ["|"]):
+            if i not in explained and token != "|" and token not in FILLER:
+                run.append(i)
+                continue
+            if run and len(run) <= MAX_FREE_SUBJECT_TOKENS and expanded[run[-1]] in self.subject_heads:
+                subject = " ".join(expanded[j] for j in run)
+                values = entities.setdefault("subject", [])
+                if subject not in values:
+                    values.append(subject)
+                explained.update(run)
+            run = []
+        return entities, explained
+
+    @staticmethod
+    def _pick(kinds, previous):
+        # "in Leicester" is a place, "at Leicester" the university
+        order = ("location", "campus", "university", "subject") if previous in NEAR_WORDS else (
+            "university", "campus", "subject", "location")
+        return next(kind for kind in order if kind in kinds)
+
+
+def extract_preferences(text):
+    """
+    Pull numeric preferences and modes out of a normalized message.
+
+    Returns:
+        tuple: ``(entities, preferences, rest)`` where ``rest`` is the text
+        left over, with " | " marking each removed span
+    """
+    entities = {}
+    prefs = {}
+
+    def take(pattern, handle):
+        nonlocal text
+
+        def replace(match):
+            handle(match)
+            return " | "
+
+        text = re.sub(pattern, replace, text)
+
+    take(r"\b(?:ucas (?:score |points |tariff )?(?:of )?)?(\d{2,3}) (?:ucas )?(?:tariff )?(?:points|pts)\b",
+         lambda m: prefs.__setitem__("ucas_points", int(m.group(1))))
+    take(r"\bucas (?:score|points|tariff) (?:of |is )?(\d{2,3})\b",
+         lambda m: prefs.__setitem__("ucas_points", int(m.group(1))))
+    if "£" in text or re.search(r"\b(fees?|cost|costs|tuition|price)\b", text):
+        take(r"\b(?:under|below|less than|max|maximum|up to|at most|cheaper than) (?:£ )?(\d+)(k?)\b",
+             lambda m: prefs.__setitem__("max_fee", int(m.group(1)) * (1000 if m.group(2) else 1)))
+        take(r"\b(?:over|above|more than|at least|min|minimum) (?:£ )?(\d+)(k?)\b",
+             lambda m: prefs.__setitem__("min_fee", int(m.group(1)) * (1000 if m.group(2) else 1)))
+    take(r"\b(?:under|at most|max|maximum|no more than|up to|less than) (\d) years?\b",
+         lambda m: prefs.__setitem__("max_duration", int(m.group(1))))
+    take(r"\b(\d) (?:year|yr)s?(?: long)?\b", lambda m: entities.__setitem__("duration", f"{m.group(1)} years"))
+    take(r"\bpart time\b", lambda m: entities.setdefault("study_mode", []).append("PART_TIME"))
+    take(r"\bfull time\b", lambda m: entities.setdefault("study_mode", []).append("FULL_TIME"))
+    take(r"\b(?:sandwich|placement year)\b", lambda m: entities.setdefault("study_mode", []).append("SANDWICH"))
+    take(rf"\b(?:starting |start |starts |from )?(?:in )?({MONTH_PATTERN})(?: (\d{{4}}))?\b",
+         lambda m: entities.__setitem__("start_date", " ".join(g.title() for g in m.groups() if g)))
+    return entities, prefs, text
+
+
+class IntentModel:
+    """TF-IDF + logistic regression intent labeller trained on logged parses."""
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+    @classmethod
+    def train(cls, records):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.pipeline import make_pipeline
+
+        texts = [normalize_query(r["query"]) for r in records]
+        labels = [r["intent"] for r in records]
+        pipeline = make_pipeline(
+            TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True),
+            LogisticRegression(max_iter=1000),
+        )
+        pipeline.fit(texts, labels)
+        return cls(pipeline)
+
+    @classmethod
+    def load(cls, path):
+        import joblib
+
+        return cls(joblib.load(path))
+
+    def save(self, path):
+        import joblib
+
+        joblib.dump(self.pipeline, path)
+
+    def predict(self, text):
+        """Most likely intent of a message and its probability."""
+        probabilities = self.pipeline.predict_proba([normalize_query(text)])[0]
+        best = probabilities.argmax()
+        return str(self.pipeline.classes_[best]), float(probabilities[best])
+
+
+def load_model(path=INTENT_MODEL_PATH):
+    """The trained intent model at ``path``, or None if there is none."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        return IntentModel.load(path)
+    except Exception as e:
+        print(f"Could not load intent model {path}: {str(e)}")
+        return None
+
+
+def log_turn(user_query, parsed, path=INTENT_LOG_PATH):
+    """Append an LLM parse to the training log, when logging is enabled."""
+    if not path or not parsed.get("intent"):
+        return
+    try:
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"query": user_query, "intent": parsed["intent"]}) + "\n")
+    except OSError as e:
+        print(f"Could not log intent to {path}: {str(e)}")
+
+
+def empty_intent(intent="search"):
+    return {
+        "intent": intent,
+        "entities": {},
+        "user_preferences": {},
+        "comparison_details": {},
+        "clarification_needed": None,
+    }
+
+
+class IntentClassifier:
+    """
+    Rule and gazetteer intent parser that answers confident turns locally.
+
+    Args:
+        threshold (float): Minimum confidence for a local parse to be used
+        model (IntentModel): Optional learned intent labeller
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, model=None):
+        self.threshold = threshold
+        self.model = model
+        self.local = 0
+        self.llm = 0
+        self._lock = threading.Lock()
+
+    def parse(self, user_query, catalog, history=None):
+        """
+        Parse a message locally.
+
+        Returns:
+            tuple: ``(parsed, confidence)`` in the LLM's output format
+        """
+        text = normalize_query(user_query)
+        for intent, pattern in SMALL_TALK.items():
+            if pattern.match(text):
+                return empty_intent(intent), 0.99
+
+        entities, prefs, rest = extract_preferences(text)
+        intent = next((name for name, pattern in INTENT_KEYWORDS if pattern.search(text)), None)
+        intent_factor = 1.0
+        if self.model is not None:
+            predicted, probability = self.model.predict(user_query)
+            if intent is None:
+                intent, intent_factor = predicted, probability
+            elif predicted != intent:
+                intent_factor = 1 - probability
+
+        tokens = rest.split()
+        found, explained = catalog.gazetteer.match(tokens)
+        for kind, values in found.items():
+            entities[kind] = values[0] if len(values) == 1 else values
+        if isinstance(entities.get("study_mode"), list) and len(entities["study_mode"]) == 1:
+            entities["study_mode"] = entities["study_mode"][0]
+
+        # Share of the content words that were explained; filler words say nothing either way
+        words = [i for i, t in enumerate(tokens) if t != "|" and t not in FILLER]
+        unexplained = [i for i in words if i not in explained]
+        coverage = 1 - len(unexplained) / len(words) if words else 1.0
+
+        intent = intent or "search"
+        parsed = empty_intent(intent)
+        parsed["entities"] = entities
+        parsed["user_preferences"] = prefs
+
+        if intent not in LOCAL_INTENTS or not (entities or prefs):
+            confidence = 0.5
+        else:
+            confidence = 0.95 * coverage * intent_factor
+        if history and FOLLOW_UP.search(text):
+            confidence = min(confidence, 0.5)
+        return parsed, confidence
+
+    def classify(self, user_query, catalog, history=None):
+        """The local parse if it clears the threshold, else None (use the LLM)."""
+        parsed, confidence = self.parse(user_query, catalog, history)
+        with self._lock:
+            if confidence >= self.threshold:
+                self.local += 1
+                return parsed
+            self.llm += 1
+            return None
+
+    def stats(self):
+        turns = self.local + self.llm
+        return {
+            "turns": turns,
+            "local": self.local,
+            "llm": self.llm,
+            "bypass_rate": self.local / turns if turns else 0.0,
+            "threshold": self.threshold,
+        }
+
+
+intent_classifier = IntentClassifier(model=load_model())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the local intent model on logged LLM parses")
+    parser.add_argument("log", nargs="?", default="data/intent_log.jsonl")
+    parser.add_argument("--out", default=INTENT_MODEL_PATH)
+    args = parser.parse_args(argv)
+
+    with open(args.log, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    IntentModel.train(records).save(args.out)
+    print(f"Trained on {len(records)} turns ({len({r['intent'] for r in records})} intents) -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
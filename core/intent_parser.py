@@ -1,73 +1,90 @@
-import openai
 import json
-import re
-from config.gpt_prompt_templates import INTENT_SYSTEM_PROMPT
+from config.gpt_prompt_templates import INTENT_SYSTEM_PROMPT, INTENT_TOOL
+from core.admission import LLMBusy
+from core.intent_cache import cache_key, intent_cache
+from core.history import INTENT_HISTORY_TOKENS, history_messages
+from core.intent_classifier import empty_intent, intent_classifier, log_turn
+from core.llm import CHAT_MODEL, get_client, record_usage
+
+def coerce_intent(data):
+    """Fill in the parts of a parsed intent the model left out."""
+    parsed = empty_intent(data.get("intent") or "search")
+    for key in ("entities", "user_preferences", "comparison_details"):
+        if isinstance(data.get(key), dict):
+            parsed[key] = data[key]
+    parsed["clarification_needed"] = data.get("clarification_needed")
+    return parsed
+
+def intent_from_message(message):
+    """Typed intent from a record_intent call (or a bare JSON reply), else None."""
+    for call in message.tool_calls or []:
+        if call.function.name == INTENT_TOOL["function"]["name"]:
+            return coerce_intent(json.loads(call.function.arguments))
+    if message.content:
+        data = json.loads(message.content)
+        if isinstance(data, dict):
+            return coerce_intent(data)
+    return None
+
+def parse_intent(user_query, history=[], api_key=None, catalog=None, classifier=intent_classifier,
+                 cache=intent_cache, usage=None):
+    # Answer confident turns (greetings, plain searches) locally without calling the LLM
+    if catalog is not None and classifier is not None:
+        parsed = classifier.classify(user_query, catalog, history)
+        if parsed is not None:
+            return parsed
+
+    # Reuse the parse of the same message in the same recent context
+    key = cache_key(user_query, history, model=CHAT_MODEL)
+    if cache is not None:
+        parsed = cache.get(key)
+        if parsed is not None:
+            return parsed
 
-def parse_intent(user_query, history=[], api_key=None):
     # Create messages array with system prompt
     messages = [{"role": "system", "content": INTENT_SYSTEM_PROMPT}]
-    
-    # Add complete conversation history to messages
-    for turn in history:  # Use complete history
-        messages.append({"role": "user", "content": turn["user"]})
-        messages.append({"role": "assistant", "content": turn["ai"]})
-    
+
+    # Add the session state, summary and the recent turns that fit the intent budget
+    messages += history_messages(history, INTENT_HISTORY_TOKENS)
+
     # Add current query
     messages.append({"role": "user", "content": user_query})
 
     try:
-        client = openai.OpenAI(api_key=api_key)
+        client = get_client(api_key)
+        # Force a record_intent call so the intent comes back as schema-shaped JSON arguments
         response = client.chat.completions.create(
-            model="gpt-4",
-            messages=messages
+            model=CHAT_MODEL,
+            messages=messages,
+            tools=[INTENT_TOOL],
+            tool_choice={"type": "function", "function": {"name": INTENT_TOOL["function"]["name"]}},
         )
-        
+        record_usage(usage, response)
+
         # Check if response is empty
-        if not response.choices or not response.choices[0].message.content:
+        if not response.choices:
             # Return a default intent if response is empty
-            return {
-                "intent": "search",
-                "entities": {},
-                "user_preferences": {},
-                "comparison_details": {},
-                "clarification_needed": None
-            }
-        
-        content = response.choices[0].message.content
-        
-        # Try to extract JSON from the response if it's not pure JSON
-        json_match = re.search(r'\{.*\}', content, re.DOTALL)
-        if json_match:
-            try:
-                return json.loads(json_match.group(0))
-            except json.JSONDecodeError:
-                # If JSON parsing fails, return a default intent
-                print(f"Failed to parse JSON from: {json_match.group(0)}")
-                return {
-                    "intent": "search",
-                    "entities": {},
-                    "user_preferences": {},
-                    "comparison_details": {},
-                    "clarification_needed": None
-                }
-        else:
-            # If no JSON found in the response, return a default intent
-            print(f"No JSON found in response: {content}")
-            return {
-                "intent": "search",
-                "entities": {},
-                "user_preferences": {},
-                "comparison_details": {},
-                "clarification_needed": None
-            }
-            
+            return empty_intent()
+
+        try:
+            parsed = intent_from_message(response.choices[0].message)
+        except (json.JSONDecodeError, AttributeError) as e:
+            # If the arguments are not valid JSON, return a default intent
+            print(f"Failed to parse intent arguments: {str(e)}")
+            return empty_intent()
+        if parsed is None:
+            print(f"No intent in response: {response.choices[0].message}")
+            return empty_intent()
+
+        log_turn(user_query, parsed)
+        if cache is not None:
+            cache.put(key, parsed)
+        return parsed
+
+    except LLMBusy:
+        # Overloaded: the caller reports it instead of guessing a search
+        raise
     except Exception as e:
         # Log the error and return a default intent
         print(f"Error in parse_intent: {str(e)}")
-        return {
-            "intent": "search",
-            "entities": {},
-            "user_preferences": {},
-            "comparison_details": {},
-            "clarification_needed": None
-        } 
\ No newline at end of file
+        return empty_intent()
@@ -0,0 +1,159 @@
+"""
+Shared settings, clients and bookkeeping for chat-completion calls.
+
+One OpenAI client is created per API key and reused for every request, so turns share keep-alive HTTPS connections
+instead of paying for client construction and a TLS handshake per call.
+Pool limits and timeouts come from the environment. The clients handed out
+come from the active backend (see ``core.llm_backends``): these OpenAI
+pools, a recorder writing cassettes, or an offline replay of a cassette.
+Every call on them first passes admission control (``core.admission``).
+"""
+import os
+import threading
+
+from core.admission import PRIORITY_INTERACTIVE, admission
+
+CHAT_MODEL = "gpt-4"
+
+POOL_MAX_CONNECTIONS = int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "20"))
+POOL_MAX_KEEPALIVE = int(os.getenv("OPENAI_POOL_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "60"))
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT_SECONDS = float(os.getenv("OPENAI_READ_TIMEOUT", "60"))
+
+
+def new_usage():
+    """Counters of the LLM requests made for one turn."""
+    # context_* count the course context packed into prompts (see core.context_encoder)
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "context_tokens": 0, "context_courses": 0}
+
+
+def record_usage(usage, response):
+    """Add one chat-completion response to ``usage`` (if given)."""
+    if usage is None:
+        return
+    usage["calls"] += 1
+    tokens = getattr(response, "usage", None)
+    if tokens is not None:
+        usage["prompt_tokens"] += tokens.prompt_tokens or 0
+        usage["completion_tokens"] += tokens.completion_tokens or 0
+
+
+class ClientRegistry:
+    """
+    Pooled OpenAI clients, one per API key: the ``openai`` LLM backend.
+
+    Connection reuse is measured with httpcore's trace hook: every request
+    is counted, and so is every new TCP connection the pool had to open.
+
+    Args:
+        max_connections (int): Connections per client
+        max_keepalive (int): Idle connections kept open per client
+        keepalive_expiry (float): Seconds an idle connection is kept
+        connect_timeout (float): Seconds to establish a connection
+        read_timeout (float): Seconds to wait for response data
+    """
+
+    def __init__(self, max_connections=POOL_MAX_CONNECTIONS, max_keepalive=POOL_MAX_KEEPALIVE,
+                 keepalive_expiry=KEEPALIVE_EXPIRY_SECONDS, connect_timeout=CONNECT_TIMEOUT_SECONDS,
+                 read_timeout=READ_TIMEOUT_SECONDS):
+        self.max_connections = max_connections
+        self.max_keepalive = max_keepalive
+        self.keepalive_expiry = keepalive_expiry
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.requests = 0
+        self.new_connections = 0
+        self._clients = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def _limits(self):
+        import httpx
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+        timeout = httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+        return limits, timeout
+
+    def _count(self, event_name):
+        if event_name == "connection.connect_tcp.started":
+            with self._lock:
+                self.new_connections += 1
+
+    def _on_request(self, request):
+        with self._lock:
+            self.requests += 1
+        request.extensions["trace"] = lambda event_name, info: self._count(event_name)
+
+    def _check_fork(self):
+        # Connections cannot be shared with a forked child; start its pools afresh
+        if self._pid != os.getpid():
+            self._clients = {}
+            self._pid = os.getpid()
+
+    def client(self, api_key=None):
+        """The pooled synchronous client for ``api_key`` (None: OPENAI_API_KEY)."""
+        with self._lock:
+            self._check_fork()
+            client = self._clients.get(api_key)
+            if client is None:
+                import httpx
+                import openai
+
+                limits, timeout = self._limits()
+                http_client = httpx.Client(
+                    limits=limits, timeout=timeout, event_hooks={"request": [self._on_request]}
+                )
+                # Retries are left to admission control, which also honours Retry-After
+                client = openai.OpenAI(api_key=api_key, http_client=http_client, max_retries=0)
+                self._clients[api_key] = client
+            return client
+
+    def stats(self):
+        reused = max(self.requests - self.new_connections, 0)
+        return {
+            "clients": len(self._clients),
+            "requests": self.requests,
+            "new_connections": self.new_connections,
+            "reused_connections": reused,
+            "reuse_rate": reused / self.requests if self.requests else 0.0,
+        }
+
+    def close(self):
+        """Close the pooled clients."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients = {}
+
+
+clients = ClientRegistry()
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    """The active LLM backend, from ``LLM_BACKEND`` unless ``set_backend`` chose one."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                from core.llm_backends import make_backend
+
+                _backend = make_backend(openai_backend=clients)
+    return _backend
+
+
+def set_backend(backend):
+    global _backend
+    _backend = backend
+
+
+def get_client(api_key=None, priority=PRIORITY_INTERACTIVE):
+    """A client of the active backend whose calls wait for admission at ``priority``."""
+    return admission.client(get_backend().client(api_key), priority)
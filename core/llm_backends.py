@@ -0,0 +1,282 @@
+"""
+Pluggable chat-completion backends.
+
+Every LLM call goes through ``core.llm.get_client``, which asks the active
+backend for an OpenAI-compatible client (``client.chat.completions.create``).
+Three backends are available, chosen with ``LLM_BACKEND``:
+
+- ``openai``: the pooled OpenAI clients (``core.llm.clients``).
+- ``record``: calls OpenAI and appends each request/response pair to the
+  cassette at ``LLM_CASSETTE`` (JSON lines).
+- ``replay``: serves responses from the cassette without any network. It
+  waits ``LLM_REPLAY_LATENCY`` seconds before the first token and then
+  streams the completion at ``LLM_REPLAY_TOKENS_PER_SECOND``, so turns are
+  timed as if the model were answering. Requests missing from the cassette
+  get a stub reply, or raise ``CassetteMiss`` with ``LLM_REPLAY_STRICT=1``.
+
+Record a session once, then profile it offline:
+
+    LLM_BACKEND=record python -m core.pipeline queries.txt
+    python -m core.pipeline queries.txt --backend replay
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from types import SimpleNamespace
+
+LLM_BACKENDS = ("openai", "record", "replay")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_CASSETTE = os.getenv("LLM_CASSETTE", "data/llm_cassette.jsonl")
+
+REPLAY_LATENCY_SECONDS = float(os.getenv("LLM_REPLAY_LATENCY", "0.5"))
+REPLAY_TOKENS_PER_SECOND = float(os.getenv("LLM_REPLAY_TOKENS_PER_SECOND", "40"))
+REPLAY_STRICT = os.getenv("LLM_REPLAY_STRICT", "0") == "1"
+
+# Words per chunk when a non-streamed recording is replayed as a stream
+REPLAY_CHUNK_WORDS = 3
+
+STUB_REPLY = "This is a stub reply: the request is not in the cassette."
+
+
+class CassetteMiss(KeyError):
+    """A replayed request has no recorded response."""
+
+
+def request_key(request):
+    """
+    Digest of everything in a request that shapes the response. Streaming is
+    left out, so either form of a request can replay the other's recording.
+    """
+    request = {k: v for k, v in request.items() if k not in ("stream", "stream_options")}
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:24]
+
+
+def _plain(value):
+    # SDK response objects (pydantic models) -> JSON-compatible data
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    if isinstance(value, dict):
+        return {k: _plain(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if hasattr(value, "__dict__"):
+        return {k: _plain(v) for k, v in vars(value).items()}
+    return value
+
+
+class Record(dict):
+    """Recorded response data with the attribute access of SDK objects; absent fields are None."""
+
+    def __getattr__(self, name):
+        try:
+            return _wrap(self[name])
+        except KeyError:
+            return None
+
+
+def _wrap(value):
+    if isinstance(value, dict):
+        return Record(value)
+    if isinstance(value, list):
+        return [_wrap(v) for v in value]
+    return value
+
+
+class _Client:
+    """The ``client.chat.completions.create`` surface around a callable."""
+
+    def __init__(self, create):
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=create))
+
+
+class RecordingBackend:
+    """
+    Forwards to another backend and appends every exchange to a cassette.
+
+    Args:
+        inner: Backend that makes the real calls (the OpenAI client registry)
+        path (str): Cassette file, one JSON object per line
+    """
+
+    def __init__(self, inner, path=LLM_CASSETTE):
+        self.inner = inner
+        self.path = path
+        self.recorded = 0
+        self._lock = threading.Lock()
+
+    def _write(self, request, entry):
+        entry = {"key": request_key(request), "request": request, **entry}
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, default=str) + "\n")
+            self.recorded += 1
+
+    def _stream(self, request, stream):
+        chunks = []
+        for chunk in stream:
+            chunks.append(_plain(chunk))
+            yield chunk
+        # Only a fully consumed stream is a complete recording
+        self._write(request, {"chunks": chunks})
+
+    def client(self, api_key=None):
+        inner = self.inner.client(api_key)
+
+        def create(**request):
+            response = inner.chat.completions.create(**request)
+            if request.get("stream"):
+                return self._stream(request, response)
+            self._write(request, {"response": _plain(response)})
+            return response
+
+        return _Client(create)
+
+    def stats(self):
+        return {"backend": "record", "cassette": self.path, "recorded": self.recorded}
+
+
+class ReplayBackend:
+    """
+    Serves recorded responses with simulated model timing.
+
+    A request recorded more than once is answered with its recordings in
+    order, repeating the last one when they run out.
+
+    Args:
+        path (str): Cassette file written by ``RecordingBackend``
+        latency (float): Seconds before the first token
+        tokens_per_second (float): Simulated generation speed (0: instant)
+        strict (bool): Raise ``CassetteMiss`` instead of stubbing unknown requests
+    """
+
+    def __init__(self, path=LLM_CASSETTE, latency=REPLAY_LATENCY_SECONDS,
+                 tokens_per_second=REPLAY_TOKENS_PER_SECOND, strict=REPLAY_STRICT):
+        self.path = path
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.strict = strict
+        self.hits = 0
+        self.misses = 0
+        self._entries = None
+        self._served = {}
+        self._lock = threading.Lock()
+
+    def _load(self):
+        entries = {}
+        if os.path.exists(self.path):
+            with open(self.path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        entries.setdefault(entry["key"], []).append(entry)
+        return entries
+
+    def _lookup(self, request):
+        key = request_key(request)
+        with self._lock:
+            if self._entries is None:
+                self._entries = self._load()
+            recordings = self._entries.get(key)
+            if not recordings:
+                self.misses += 1
+                if self.strict:
+                    raise CassetteMiss(f"No recorded response for request {key} in {self.path}")
+                return None
+            served = self._served.get(key, 0)
+            self._served[key] = served + 1
+            self.hits += 1
+            return recordings[min(served, len(recordings) - 1)]
+
+    def _generation_seconds(self, tokens):
+        return tokens / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def _stub(self, request):
+        tool_choice = request.get("tool_choice")
+        message = {"role": "assistant", "content": STUB_REPLY, "tool_calls": None}
+        if isinstance(tool_choice, dict):
+            # A forced function call gets empty arguments, which parse as a plain search
+            name = tool_choice["function"]["name"]
+            message = {"role": "assistant", "content": None, "tool_calls": [
+                {"id": "stub", "type": "function", "function": {"name": name, "arguments": "{}"}}
+            ]}
+        return {
+            "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0},
+        }
+
+    def _chunks_from_response(self, response):
+        # Replays a non-streamed recording as a stream of small text chunks
+        choices = response.get("choices") or []
+        content = (choices[0]["message"].get("content") or "") if choices else ""
+        words = content.split(" ")
+        for i in range(0, len(words), REPLAY_CHUNK_WORDS):
+            text = " ".join(words[i:i + REPLAY_CHUNK_WORDS])
+            if i + REPLAY_CHUNK_WORDS < len(words):
+                text += " "
+            yield {"choices": [{"index": 0, "delta": {"content": text}}], "usage": None}
+        yield {"choices": [], "usage": response.get("usage")}
+
+    def _stream(self, chunks):
+        from core.history import count_tokens
+
+        time.sleep(self.latency)
+        for chunk in chunks:
+            choices = chunk.get("choices") or []
+            if choices and (choices[0].get("delta") or {}).get("content"):
+                time.sleep(self._generation_seconds(count_tokens(choices[0]["delta"]["content"])))
+            yield _wrap(chunk)
+
+    def client(self, api_key=None):
+        def create(**request):
+            entry = self._lookup(request) or {"response": self._stub(request)}
+            if request.get("stream"):
+                chunks = entry.get("chunks") or self._chunks_from_response(entry["response"])
+                return self._stream(chunks)
+            response = entry.get("response")
+            if response is None:
+                # Recorded as a stream: reassemble the message from the deltas
+                text = "".join(
+                    (c["choices"][0].get("delta") or {}).get("content") or ""
+                    for c in entry["chunks"] if c.get("choices")
+                )
+                usage = next((c["usage"] for c in reversed(entry["chunks"]) if c.get("usage")), None)
+                response = {
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": text, "tool_calls": None}}],
+                    "usage": usage,
+                }
+            completion_tokens = (response.get("usage") or {}).get("completion_tokens") or 0
+            time.sleep(self.latency + self._generation_seconds(completion_tokens))
+            return _wrap(response)
+
+        return _Client(create)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": "replay",
+            "cassette": self.path,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def make_backend(name=LLM_BACKEND, openai_backend=None, **options):
+    """
+    The backend called ``name``. ``openai_backend`` is the client registry
+    real calls go through; ``options`` go to the record/replay constructors.
+    """
+    if name not in LLM_BACKENDS:
+        raise ValueError(f"Unknown LLM backend {name!r}; choose from {', '.join(LLM_BACKENDS)}")
+    if openai_backend is None:
+        from core.llm import clients as openai_backend
+    if name == "record":
+        return RecordingBackend(openai_backend, **options)
+    if name == "replay":
+        return ReplayBackend(**options)
+    return openai_backend
@@ -1,20 +1,47 @@
-session_memory = {
-    "turns": [],  # History of {"user": "...", "ai": "..."}
-    "last_intent": None,
-    "last_subject": None,
-    "last_ucas": None,
-    "last_courses": []
-}
-
-def update_memory(parsed, response, user_query, matched_ids):
-    session_memory["turns"].append({
-        "user": user_query,
-        "ai": response
-    })
-    session_memory["last_intent"] = parsed.get("intent")
-    session_memory["last_subject"] = parsed["entities"].get("subject")
-    session_memory["last_ucas"] = parsed["user_preferences"].get("ucas_points")
-    session_memory["last_courses"] = matched_ids
-
-def get_conversation_history():
-    return session_memory["turns"] 
\ No newline at end of file
+from core.history import History, compact_state, fold_old_turns, schedule_fold
+from core.session_store import session_store
+
+# Session used by callers that do not name one
+DEFAULT_SESSION = "default"
+
+def get_session(session_id=DEFAULT_SESSION, store=session_store):
+    """A copy of the session's memory."""
+    return store.get(session_id)
+
+def update_memory(parsed, response, user_query, matched_ids, session_id=DEFAULT_SESSION, store=session_store):
+    def change(memory):
+        memory["turns"].append({
+            "user": user_query,
+            "ai": response
+        })
+        memory["last_intent"] = parsed.get("intent")
+        memory["last_subject"] = parsed["entities"].get("subject")
+        memory["last_ucas"] = parsed["user_preferences"].get("ucas_points")
+        memory["last_courses"] = list(matched_ids)
+    return store.update(session_id, change)
+
+def history_from(memory):
+    return History(memory["turns"], memory["summary"], compact_state(memory))
+
+def get_conversation_history(session_id=DEFAULT_SESSION, store=session_store):
+    return history_from(store.get(session_id))
+
+def fold_session(session_id, api_key=None, store=session_store):
+    """Fold the session's old turns into its summary and write the result back."""
+    memory = store.get(session_id)
+    before = list(memory["turns"])
+    if not fold_old_turns(memory, api_key):
+        return False
+    folded = before[:len(before) - len(memory["turns"])]
+
+    def change(current):
+        # Turns may have been dropped meanwhile; only apply a summary of what is still there
+        if current["turns"][:len(folded)] == folded:
+            current["summary"] = memory["summary"]
+            del current["turns"][:len(folded)]
+    store.update(session_id, change)
+    return True
+
+def schedule_session_fold(memory, session_id, api_key=None, store=session_store):
+    """Fold the session's old turns in the background once enough have built up."""
+    return schedule_fold(memory, api_key, fold=lambda: fold_session(session_id, api_key, store))
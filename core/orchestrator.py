@@ -0,0 +1,149 @@
+"""
+Asyncio turn orchestration that overlaps catalog work with the LLM call.
+
+While ``parse_intent`` waits on the network, the orchestrator guesses that
+the user is still talking about the last subject and UCAS score in session
+memory and filters the catalog for that guess. When the parsed entities turn
+out to match the guess, the speculative results are used as they are.
+Course summaries need no speculation: they are precomputed per study option
+(``Catalog.cards``). Memory updates (and folding old turns into the history summary) run
+on background workers; the next turn of a session waits for that session's
+updates before it reads the history. Each session's memory lives in the
+session store (``core.session_store``).
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from core.admission import LLMBusy
+from core.context_encoder import CONTEXT_MAX_COURSES
+from core.course_filter import filter_courses
+from core.intent_cache import intent_cache
+from core.intent_parser import parse_intent
+from core.memory import DEFAULT_SESSION, get_session, history_from, schedule_session_fold, update_memory
+from core.pipeline import DEFAULT_MODE, finish_turn, mark_busy, new_result, run_turn, search_and_answer
+from core.result_cache import cache_key
+from core.session_store import session_store
+
+# One worker keeps memory updates in turn order
+_memory_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory")
+_pending_updates = {}  # session id -> futures of its unfinished updates
+_pending_lock = threading.Lock()
+
+speculation_stats = {"turns": 0, "hits": 0, "misses": 0, "saved_seconds": 0.0}
+
+
+def speculative_intent(memory):
+    """The search the next turn most likely repeats, from session memory."""
+    entities = {"subject": memory.get("last_subject")}
+    prefs = {"ucas_points": memory.get("last_ucas")}
+    entities = {k: v for k, v in entities.items() if v not in (None, "", [])}
+    prefs = {k: v for k, v in prefs.items() if v is not None}
+    if not entities and not prefs:
+        return None
+    return {"intent": "search", "entities": entities, "user_preferences": prefs}
+
+
+def prefetch(guess, catalog, user_query):
+    """Filter for the guessed intent."""
+    start = time.perf_counter()
+    matched = filter_courses(guess, catalog, k=CONTEXT_MAX_COURSES, user_query=user_query)
+    return {"key": cache_key(guess), "matched": matched, "filter_seconds": time.perf_counter() - start}
+
+
+def _use_prefetch(parsed, speculation):
+    """The speculative results if they match the parsed intent, and the time they save."""
+    if speculation["key"] == cache_key(parsed):
+        return speculation, speculation["filter_seconds"], True
+    return None, 0.0, False
+
+
+def _update_memory(parsed, reply, user_query, matched_ids, api_key, session_id, store):
+    memory = update_memory(parsed, reply, user_query, matched_ids, session_id, store)
+    schedule_session_fold(memory, session_id, api_key, store)
+
+
+def schedule_memory_update(parsed, reply, user_query, matched_ids, api_key=None, session_id=DEFAULT_SESSION,
+                           store=session_store):
+    """Update the session's memory on the background worker; returns its future."""
+    future = _memory_worker.submit(
+        _update_memory, parsed, reply, user_query, matched_ids, api_key, session_id, store
+    )
+    with _pending_lock:
+        _pending_updates.setdefault(session_id, []).append(future)
+    # Finished updates drop out, so sessions that never return leave nothing behind
+    future.add_done_callback(lambda f: _forget_update(session_id, f))
+    return future
+
+
+def _forget_update(session_id, future):
+    with _pending_lock:
+        pending = _pending_updates.get(session_id)
+        if pending and future in pending:
+            pending.remove(future)
+            if not pending:
+                del _pending_updates[session_id]
+
+
+async def wait_for_memory_updates(session_id=DEFAULT_SESSION):
+    with _pending_lock:
+        pending = list(_pending_updates.get(session_id, []))
+    for future in pending:
+        try:
+            await asyncio.wrap_future(future)
+        except Exception as e:
+            print(f"Error updating memory: {str(e)}")
+
+
+async def run_turn_async(user_query, catalog, history=None, api_key=None, mode=DEFAULT_MODE, cache=intent_cache,
+                         stream=False, session_id=DEFAULT_SESSION, store=session_store):
+    """
+    ``run_turn`` with speculative prefiltering overlapping the intent parse.
+    ``history`` defaults to the session's history once its pending updates are in.
+
+    The result has the same keys as ``run_turn``; ``timings["saved"]`` holds
+    the seconds of catalog work the speculation took off the critical path.
+    Speculation applies to the two-call mode; single-call turns run as-is.
+    """
+    await wait_for_memory_updates(session_id)
+    memory = await asyncio.to_thread(get_session, session_id, store)
+    if history is None:
+        history = history_from(memory)
+    if mode != "two-call":
+        result = await asyncio.to_thread(run_turn, user_query, catalog, history, api_key, mode, cache, stream)
+        result.setdefault("timings", {})["saved"] = 0.0
+        return result
+
+    start = time.perf_counter()
+    result = new_result(catalog, mode)
+    guess = speculative_intent(memory)
+    speculation = None
+    if guess:
+        speculation = asyncio.ensure_future(asyncio.to_thread(prefetch, guess, catalog, user_query))
+
+    try:
+        result["parsed"] = await asyncio.to_thread(
+            parse_intent, user_query, history, api_key=api_key, catalog=catalog, cache=cache, usage=result["usage"]
+        )
+    except LLMBusy as e:
+        mark_busy(result, e)
+    except Exception as e:
+        result["errors"].append(f"Error parsing intent: {str(e)}")
+
+    prefetched, saved, hit = None, 0.0, False
+    if speculation is not None:
+        try:
+            speculative = await speculation
+            prefetched, saved, hit = _use_prefetch(result["parsed"], speculative)
+            speculation_stats["hits" if hit else "misses"] += 1
+        except Exception as e:
+            result["errors"].append(f"Error in speculative search: {str(e)}")
+
+    if not result["busy"]:
+        await asyncio.to_thread(search_and_answer, user_query, catalog, history, api_key, result, stream, prefetched)
+    result["timings"] = {"saved": saved}
+    finish_turn(result, start, stream)
+    speculation_stats["turns"] += 1
+    speculation_stats["saved_seconds"] += saved
+    return result
@@ -0,0 +1,328 @@
+"""
+One conversational turn: parse the message, search the catalog, answer.
+
+Two modes are available so they can be benchmarked against each other:
+
+- ``two-call``: ``parse_intent`` and ``generate_response`` each make a GPT-4
+  request and each resend the history.
+- ``single-call``: one conversation in which the model asks for the course
+  search through a ``search_courses`` function call, our code answers it
+  locally with ``filter_courses`` and the model finishes the reply. Turns the
+  local intent classifier is confident about skip the function call and take
+  a single request.
+
+With ``stream=True`` the reply is produced as an iterator of text chunks so
+front ends can show it as it arrives; time to first token and total time
+are recorded per turn. Up to ``CONTEXT_MAX_COURSES`` ranked courses are
+retrieved and as many as fit ``COURSE_CONTEXT_TOKENS`` are sent to the model
+(see ``core.context_encoder``); ``matched`` holds the ones it saw. Greetings,
+farewells and help requests skip the search and get no course context.
+
+The mode comes from ``PIPELINE_MODE`` (or ``run.py --pipeline``). Compare
+them on a list of messages, one per line, with:
+
+    python -m core.pipeline queries.txt
+
+Add ``--backend record`` to save the LLM exchanges to a cassette and
+``--backend replay`` to rerun them offline with simulated model latency
+(see ``core.llm_backends``).
+"""
+import argparse
+import json
+import os
+import time
+
+import pandas as pd
+
+from config.gpt_prompt_templates import SEARCH_COURSES_TOOL, SINGLE_CALL_SYSTEM_PROMPT
+from core.admission import LLMBusy
+from core.context_encoder import CONTEXT_MAX_COURSES
+from core.course_filter import filter_courses
+from core.history import RESPONSE_HISTORY_TOKENS, history_messages
+from core.intent_cache import intent_cache
+from core.intent_classifier import empty_intent, intent_classifier
+from core.intent_parser import coerce_intent, parse_intent
+from core.llm import CHAT_MODEL, get_backend, get_client, new_usage, record_usage, set_backend
+from core.llm_backends import (
+    LLM_BACKEND, LLM_BACKENDS, LLM_CASSETTE, REPLAY_LATENCY_SECONDS, REPLAY_TOKENS_PER_SECOND, make_backend
+)
+from core.response_generator import course_context, generate_response, stream_completion, stream_response
+
+PIPELINE_MODES = ("two-call", "single-call")
+DEFAULT_MODE = os.getenv("PIPELINE_MODE", "two-call")
+
+ERROR_REPLY = "I'm sorry, I encountered an error while processing your request. Please try again."
+BUSY_REPLY = "I'm getting a lot of questions right now. Please try again in a moment."
+
+# Intents answered without searching the catalog or sending course context
+SMALL_TALK_INTENTS = {"greeting", "farewell", "help"}
+
+# Running totals of answered turns, for reporting
+latency_stats = {"turns": 0, "first_token_seconds": 0.0, "total_seconds": 0.0}
+
+
+def latency_summary():
+    turns = latency_stats["turns"]
+    if not turns:
+        return None
+    return {
+        "turns": turns,
+        "avg_first_token_seconds": latency_stats["first_token_seconds"] / turns,
+        "avg_total_seconds": latency_stats["total_seconds"] / turns,
+    }
+
+
+def mark_busy(result, error):
+    """Record that the LLM had no capacity for this turn; the reply says so."""
+    result["busy"] = True
+    result["retry_after"] = error.retry_after
+    result["reply"] = BUSY_REPLY
+    result["errors"].append(f"LLM busy: {str(error)}")
+
+
+def search_and_answer(user_query, catalog, history, api_key, result, stream, prefetched=None):
+    # ``prefetched`` may hold the matched courses from speculative work
+    prefetched = prefetched or {}
+    small_talk = result["parsed"].get("intent") in SMALL_TALK_INTENTS
+    if small_talk:
+        pass  # nothing to search for; the prompt gets no course section
+    elif prefetched.get("matched") is not None:
+        result["matched"] = prefetched["matched"]
+    else:
+        try:
+            result["matched"] = filter_courses(
+                result["parsed"], catalog, k=CONTEXT_MAX_COURSES, user_query=user_query
+            )
+        except Exception as e:
+            result["errors"].append(f"Error filtering courses: {str(e)}")
+
+    answer = stream_response if stream else generate_response
+    try:
+        reply = answer(
+            user_query, result["parsed"], None if small_talk else result["matched"], history, api_key=api_key,
+            usage=result["usage"], cards=catalog.cards,
+        )
+        if stream:
+            result["chunks"] = reply
+        else:
+            result["reply"] = reply
+    except LLMBusy as e:
+        mark_busy(result, e)
+    except Exception as e:
+        result["errors"].append(f"Error generating response: {str(e)}")
+    # Only the courses that fitted the context budget were shown to the model
+    result["matched"] = result["matched"].head(result["usage"]["context_courses"])
+
+
+def _two_call(user_query, catalog, history, api_key, result, cache, stream):
+    try:
+        result["parsed"] = parse_intent(
+            user_query, history, api_key=api_key, catalog=catalog, cache=cache, usage=result["usage"]
+        )
+    except LLMBusy as e:
+        # Answering a guessed intent would hide the overload from the user
+        return mark_busy(result, e)
+    except Exception as e:
+        result["errors"].append(f"Error parsing intent: {str(e)}")
+    search_and_answer(user_query, catalog, history, api_key, result, stream)
+
+
+def _single_call(user_query, catalog, history, api_key, result, stream):
+    parsed = intent_classifier.classify(user_query, catalog, history)
+    if parsed is not None:
+        # The search is already known; one request with the results in the prompt
+        result["parsed"] = parsed
+        return search_and_answer(user_query, catalog, history, api_key, result, stream)
+
+    messages = [{"role": "system", "content": SINGLE_CALL_SYSTEM_PROMPT}]
+    messages += history_messages(history, RESPONSE_HISTORY_TOKENS)
+    messages.append({"role": "user", "content": user_query})
+
+    try:
+        client = get_client(api_key)
+        response = client.chat.completions.create(
+            model=CHAT_MODEL, messages=messages, tools=[SEARCH_COURSES_TOOL], tool_choice="auto"
+        )
+        record_usage(result["usage"], response)
+        message = response.choices[0].message
+        if not message.tool_calls:
+            # Small talk: the model answered without searching
+            result["reply"] = message.content or ERROR_REPLY
+            return
+
+        messages.append({
+            "role": "assistant",
+            "content": message.content,
+            "tool_calls": [
+                {"id": call.id, "type": "function",
+                 "function": {"name": call.function.name, "arguments": call.function.arguments}}
+                for call in message.tool_calls
+            ],
+        })
+        frames = []
+        for call in message.tool_calls:
+            # A comparison may search several times; each call gets its own results
+            parsed = coerce_intent(json.loads(call.function.arguments))
+            matched = filter_courses(parsed, catalog, k=CONTEXT_MAX_COURSES, user_query=user_query)
+            courses, count = course_context(matched, usage=result["usage"], cards=catalog.cards)
+            frames.append(matched.head(count))
+            result["parsed"] = parsed
+            messages.append({"role": "tool", "tool_call_id": call.id, "content": courses})
+        result["matched"] = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+
+        if stream:
+            result["chunks"] = stream_completion(client, messages, result["usage"])
+            return
+        response = client.chat.completions.create(model=CHAT_MODEL, messages=messages)
+        record_usage(result["usage"], response)
+        result["reply"] = response.choices[0].message.content or ERROR_REPLY
+    except LLMBusy as e:
+        mark_busy(result, e)
+    except Exception as e:
+        result["errors"].append(f"Error in single-call pipeline: {str(e)}")
+
+
+def _record_latency(result, start, first_token):
+    total = time.perf_counter() - start
+    result["seconds"] = total
+    result.setdefault("timings", {}).update(first_token=first_token if first_token is not None else total, total=total)
+    latency_stats["turns"] += 1
+    latency_stats["first_token_seconds"] += result["timings"]["first_token"]
+    latency_stats["total_seconds"] += total
+
+
+def _stream_reply(chunks, result, start):
+    parts = []
+    first_token = None
+    fallback = ERROR_REPLY
+    try:
+        for chunk in chunks:
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            parts.append(chunk)
+            yield chunk
+    except LLMBusy as e:
+        # Streamed calls are admitted when the first chunk is requested
+        mark_busy(result, e)
+        fallback = BUSY_REPLY
+    except Exception as e:
+        result["errors"].append(f"Error streaming response: {str(e)}")
+    if not parts:
+        first_token = time.perf_counter() - start
+        parts.append(fallback)
+        yield fallback
+    # The reply is only final once the stream is exhausted
+    result["reply"] = "".join(parts)
+    _record_latency(result, start, first_token)
+
+
+def new_result(catalog, mode):
+    return {
+        "parsed": empty_intent(),
+        "matched": catalog.select([]),
+        "reply": ERROR_REPLY,
+        "errors": [],
+        "usage": new_usage(),
+        "mode": mode,
+        "chunks": None,
+        "busy": False,
+        "retry_after": None,
+    }
+
+
+def finish_turn(result, start, stream):
+    """Record the turn's latency now, or once its reply stream is exhausted."""
+    if stream:
+        result["chunks"] = _stream_reply(result["chunks"] or iter([result["reply"]]), result, start)
+    else:
+        _record_latency(result, start, None)
+    return result
+
+
+def run_turn(user_query, catalog, history, api_key=None, mode=DEFAULT_MODE, cache=intent_cache, stream=False):
+    """
+    Answer one message against a pinned catalog. ``cache`` is the intent
+    parse cache used by the two-call mode (None disables it).
+
+    With ``stream=True`` the reply is not generated yet: iterate
+    ``result["chunks"]`` to receive it piece by piece. ``reply``, ``seconds``
+    and ``timings`` are filled in once the iterator is exhausted.
+
+    Returns:
+        dict: ``parsed``, ``matched`` (DataFrame), ``reply``, ``errors`` (list
+        of messages for stages that failed and fell back), ``busy`` (the LLM
+        had no capacity; ``reply`` says so and ``retry_after`` may suggest
+        when to try again), ``usage`` (LLM
+        requests and tokens, including the course context), ``mode``, ``seconds`` and ``timings`` (seconds
+        to the first token and in total)
+    """
+    if mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode {mode!r}; choose from {', '.join(PIPELINE_MODES)}")
+    start = time.perf_counter()
+    result = new_result(catalog, mode)
+    if mode == "single-call":
+        _single_call(user_query, catalog, history, api_key, result, stream)
+    else:
+        _two_call(user_query, catalog, history, api_key, result, cache, stream)
+    return finish_turn(result, start, stream)
+
+
+def benchmark(queries, catalog, api_key=None, modes=PIPELINE_MODES):
+    """
+    Run each query as a fresh conversation in every mode; per-mode totals.
+    The intent cache is bypassed, since cached parses would flatter two-call.
+    """
+    report = {}
+    for mode in modes:
+        totals = {"turns": 0, "seconds": 0.0, **new_usage()}
+        for query in queries:
+            result = run_turn(query, catalog, [], api_key=api_key, mode=mode, cache=None)
+            totals["turns"] += 1
+            totals["seconds"] += result["seconds"]
+            for key, value in result["usage"].items():
+                totals[key] += value
+        report[mode] = totals
+    return report
+
+
+def main(argv=None):
+    from core.data_loader import load_courses
+
+    parser = argparse.ArgumentParser(description="Benchmark the turn pipeline modes")
+    parser.add_argument("queries", help="text file with one user message per line")
+    parser.add_argument("--data", default="data/clean_structured_example.json")
+    parser.add_argument("--mode", choices=PIPELINE_MODES, action="append", help="mode(s) to run (default: all)")
+    parser.add_argument("--backend", choices=LLM_BACKENDS, default=LLM_BACKEND,
+                        help="LLM backend; record writes the cassette, replay runs offline from it")
+    parser.add_argument("--cassette", default=LLM_CASSETTE)
+    parser.add_argument("--latency", type=float, default=REPLAY_LATENCY_SECONDS,
+                        help="replay: seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=REPLAY_TOKENS_PER_SECOND,
+                        help="replay: simulated generation speed (0: instant)")
+    args = parser.parse_args(argv)
+
+    options = {}
+    if args.backend != "openai":
+        options["path"] = args.cassette
+    if args.backend == "replay":
+        options.update(latency=args.latency, tokens_per_second=args.tokens_per_second)
+    set_backend(make_backend(args.backend, **options))
+
+    with open(args.queries, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    catalog = load_courses(args.data)
+    report = benchmark(queries, catalog, os.getenv("OPENAI_API_KEY"), args.mode or PIPELINE_MODES)
+    for mode, totals in report.items():
+        turns = totals["turns"] or 1
+        print(
+            f"{mode:12s} {totals['seconds'] / turns:6.2f} s/turn  {totals['calls'] / turns:4.2f} requests/turn  "
+            f"{totals['prompt_tokens'] / turns:7.0f} prompt + {totals['completion_tokens'] / turns:5.0f} "
+            f"completion tokens/turn  {totals['context_courses'] / turns:4.1f} courses in "
+            f"{totals['context_tokens'] / turns:5.0f} context tokens/turn"
+        )
+    if args.backend != "openai":
+        print(get_backend().stats())
+
+
+if __name__ == "__main__":
+    main()
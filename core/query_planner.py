@@ -0,0 +1,147 @@
+"""
+Multi-criteria query planning over the catalog indexes.
+
+Each search criterion becomes a Predicate that can estimate how many rows it
+keeps, produce its sorted row ids, or test a set of candidate rows. The plan
+ANDs all bitmap predicates into one bitmap, orders the predicates by estimated
+selectivity, materializes only the most selective one and then probes the
+survivors against the rest, so no intermediate DataFrame is ever built. A
+range predicate materializes its rows in value order (an index slice); only
+the survivors are put back in row order at the end.
+"""
+from functools import reduce
+
+import numpy as np
+
+from core.search_index import bitmap_rows, bitmap_test, popcount, sort_rows
+
+
+class Predicate:
+    # Whether ``candidates`` come in row order
+    ordered_candidates = True
+
+    def __init__(self, name):
+        self.name = name
+
+    def estimate(self):
+        """Number of rows the predicate keeps (exact for all current kinds)."""
+        raise NotImplementedError
+
+    def rows(self):
+        """Sorted row ids that satisfy the predicate."""
+        raise NotImplementedError
+
+    def candidates(self):
+        """Row ids that satisfy the predicate, in row order unless ``ordered_candidates`` is False."""
+        return self.rows()
+
+    def test(self, rows):
+        """Boolean mask telling which of ``rows`` satisfy the predicate."""
+        raise NotImplementedError
+
+
+class BitmapPredicate(Predicate):
+    def __init__(self, name, bitmap, n_rows):
+        super().__init__(name)
+        self.bitmap = bitmap
+        self.n_rows = n_rows
+        self._count = None
+
+    def estimate(self):
+        if self._count is None:
+            self._count = popcount(self.bitmap)
+        return self._count
+
+    def rows(self):
+        return bitmap_rows(self.bitmap, self.n_rows)
+
+    def test(self, rows):
+        return bitmap_test(self.bitmap, rows)
+
+
+class RowSetPredicate(Predicate):
+    """Predicate whose sorted row ids were already produced, e.g. by a trigram lookup."""
+
+    def __init__(self, name, rows):
+        super().__init__(name)
+        self._rows = np.asarray(rows, dtype=np.int64)
+
+    def estimate(self):
+        return len(self._rows)
+
+    def rows(self):
+        return self._rows
+
+    def test(self, rows):
+        if not len(self._rows):
+            return np.zeros(len(rows), dtype=bool)
+        pos = np.minimum(np.searchsorted(self._rows, rows), len(self._rows) - 1)
+        return self._rows[pos] == rows
+
+
+class RangePredicate(Predicate):
+    ordered_candidates = False
+
+    def __init__(self, name, index, low=None, high=None, include_missing=False):
+        super().__init__(name)
+        self.index = index
+        self.low = low
+        self.high = high
+        self.include_missing = include_missing
+
+    def estimate(self):
+        count = self.index.count_between(self.low, self.high)
+        if self.include_missing:
+            count += len(self.index.missing_rows)
+        return count
+
+    def rows(self):
+        return self.index.between(self.low, self.high, include_missing=self.include_missing)
+
+    def candidates(self):
+        return self.index.range_rows(self.low, self.high, include_missing=self.include_missing)
+
+    def test(self, rows):
+        return self.index.test(rows, self.low, self.high, include_missing=self.include_missing)
+
+
+class QueryPlan:
+    """
+    Orders and runs the predicates of one query.
+
+    Args:
+        predicates (list): Predicates that must all hold
+        n_rows (int): Number of rows in the searched table
+    """
+
+    def __init__(self, predicates, n_rows):
+        self.n_rows = n_rows
+        bitmaps = [p for p in predicates if isinstance(p, BitmapPredicate)]
+        others = [p for p in predicates if not isinstance(p, BitmapPredicate)]
+        if len(bitmaps) > 1:
+            # Word-wise AND of the packed bitmaps is cheaper than any row probe
+            combined = reduce(np.bitwise_and, (p.bitmap for p in bitmaps))
+            bitmaps = [BitmapPredicate(" & ".join(p.name for p in bitmaps), combined, n_rows)]
+        self.steps = sorted(bitmaps + others, key=lambda p: p.estimate())
+        self.trace = []
+
+    def execute(self):
+        """Return the sorted row ids matching every predicate."""
+        self.trace = []
+        if not self.steps:
+            return np.arange(self.n_rows)
+        first = self.steps[0]
+        rows = first.candidates()
+        self.trace.append((first.name, first.estimate(), len(rows)))
+        for predicate in self.steps[1:]:
+            if not len(rows):
+                break
+            rows = rows[predicate.test(rows)]
+            self.trace.append((predicate.name, predicate.estimate(), len(rows)))
+        if not first.ordered_candidates:
+            rows = sort_rows(rows, self.n_rows)
+        return rows
+
+    def explain(self):
+        """Describe the executed steps: predicate, estimated rows, rows left."""
+        return [f"{name}: est={estimate} -> {remaining}" for name, estimate, remaining in self.trace]
@@ -0,0 +1,211 @@
+import heapq
+import re
+
+import numpy as np
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Times a course name is repeated in its document, so title hits outweigh overview hits
+NAME_WEIGHT = 3
+
+# Score added when an entity appears at the start of a word in the course name
+PHRASE_BOOST = 2.0
+
+# Score added when an entity equals the university or campus exactly
+EXACT_MATCH_BOOST = 1.0
+
+# Weight of the cosine similarity from the embedding index, when one is built
+SEMANTIC_WEIGHT = 5.0
+
+# Weight of how closely an option's UCAS requirement fits the user's points
+TARIFF_FIT_WEIGHT = 1.0
+
+# Points between requirement and score at which the tariff fit reaches zero
+TARIFF_FIT_RANGE = 48.0
+
+# Weight of the facts known about an option (tariff, fee, duration). Small, so
+# it mostly orders options that are otherwise equally relevant.
+COMPLETENESS_WEIGHT = 0.1
+
+TOP_K = 3
+
+STOPWORDS = {
+    "a", "an", "and", "are", "at", "be", "can", "course", "courses", "do", "for", "find",
+    "i", "in", "is", "it", "me", "my", "of", "on", "or", "please", "show", "study",
+    "the", "to", "what", "which", "with", "you", "any", "some", "about", "want", "like",
+}
+
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", (text or "").lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of documents with an inverted index of term
+    frequencies, so scoring only touches documents containing a query term.
+
+    Args:
+        documents (list): Document texts; a document's id is its position
+    """
+
+    def __init__(self, documents):
+        postings = {}
+        lengths = np.zeros(len(documents), dtype=np.float32)
+        for doc_id, text in enumerate(documents):
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+            counts = {}
+            for token in tokens:
+                counts[token] = counts.get(token, 0) + 1
+            for token, count in counts.items():
+                postings.setdefault(token, ([], []))
+                postings[token][0].append(doc_id)
+                postings[token][1].append(count)
+
+        self.n_docs = len(documents)
+        self.lengths = lengths
+        self.avg_length = float(lengths.mean()) if len(documents) else 0.0
+        self.postings = {
+            token: (np.asarray(ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+            for token, (ids, tfs) in postings.items()
+        }
+
+    def idf(self, token):
+        df = len(self.postings[token][0])
+        return float(np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5)))
+
+    def scores(self, query):
+        """Dense array of BM25 scores of every document for ``query``."""
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        if not self.avg_length:
+            return scores
+        for token in set(tokenize(query)):
+            if token not in self.postings:
+                continue
+            ids, tfs = self.postings[token]
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[ids] / self.avg_length)
+            scores[ids] += self.idf(token) * tfs * (BM25_K1 + 1) / (tfs + norm)
+        return scores
+
+
+def top_k(rows, scores, k=TOP_K, tiebreak=None):
+    """
+    Pick the ``k`` best rows with a bounded heap. Equal scores are ordered by
+    ``tiebreak`` (lowest first) when given, then by catalog order.
+
+    Returns:
+        list: ``(row_id, score)`` pairs, best first
+    """
+    rows = np.asarray(rows)
+    tiebreak = np.zeros(len(rows), dtype=np.int64) if tiebreak is None else np.asarray(tiebreak)
+    best = heapq.nlargest(k, zip(scores.tolist(), (-tiebreak).tolist(), (-rows).tolist()))
+    return [(-neg_row, score) for score, _, neg_row in best]
+
+
+def option_ordinals(catalog, rows):
+    """
+    Position of each option among its course's options (0: the first). As a
+    tiebreak it spreads equally relevant results across courses.
+    """
+    course_keys = catalog.options["course_key"].to_numpy()
+    return np.asarray(rows) - np.searchsorted(course_keys, course_keys[rows])
+
+
+def corrected_entities(resolver, key, values):
+    """
+    Spelling-corrected forms of subject, university or campus entities, where
+    they differ from what was typed ("pyschology" -> "psychology").
+    """
+    vocabulary = getattr(resolver, key)
+    corrected = []
+    for value in values:
+        fixed = [vocabulary.correct(value)] if key == "subject" else vocabulary.resolve(value)
+        corrected.extend(v for v in fixed if v and v.lower() != value.lower())
+    return corrected
+
+
+def query_text(parsed, user_query=None, resolver=None):
+    """
+    Text to rank with: the user's message plus the searchable entities. With a
+    ``resolver``, misspelled subjects and campuses are added in corrected form.
+    """
+    ents = parsed.get("entities") or {}
+    parts = [user_query or ""]
+    for key in ("subject", "campus", "location"):
+        values = _entity_list(ents, key)
+        parts.extend(values)
+        if resolver is not None and key != "location":
+            parts.extend(corrected_entities(resolver, key, values))
+    return " ".join(parts)
+
+
+def _phrase_hits(values, phrases):
+    if not phrases:
+        return np.zeros(len(values), dtype=bool)
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(p) for p in phrases) + r")", re.IGNORECASE)
+    return np.asarray([bool(pattern.search(v or "")) for v in values], dtype=bool)
+
+
+def _entity_list(ents, key):
+    value = ents.get(key)
+    values = value if isinstance(value, (list, tuple)) else [value]
+    return [str(v).strip() for v in values if v not in (None, "") and str(v).strip()]
+
+
+def score_rows(parsed, catalog, rows, user_query=None, ucas_points=None):
+    """
+    Relevance of the candidate option rows: BM25 of the course (name and
+    overview) and of the campus name, embedding similarity when the catalog
+    has an embedding index, plus boosts for exact entity matches. Entities
+    are matched as typed and as corrected by the catalog resolver.
+
+    Two signals do not depend on text, so a query without any (UCAS points
+    or study mode only) is not ranked in file order: how closely the UCAS
+    requirement fits ``ucas_points``, and how much is known about the option.
+    """
+    options = catalog.options
+    course_keys = options["course_key"].to_numpy()[rows]
+    campus_codes = options["campus"].cat.codes.to_numpy()[rows]
+    text = query_text(parsed, user_query, catalog.resolver)
+
+    scores = catalog.course_bm25.scores(text)[course_keys]
+    campus_scores = np.append(catalog.campus_bm25.scores(text), 0)  # code -1 -> no campus
+    scores = scores + campus_scores[campus_codes]
+
+    if catalog.embedding_index is not None and text.strip() and len(rows):
+        similarity = catalog.embedding_index.similarities([text])[0]
+        scores = scores + SEMANTIC_WEIGHT * similarity[course_keys]
+
+    ents = parsed.get("entities") or {}
+    subjects = _entity_list(ents, "subject")
+    subjects += corrected_entities(catalog.resolver, "subject", subjects)
+    if subjects and len(rows):
+        names = catalog.courses["name"].to_numpy()
+        unique_keys, inverse = np.unique(course_keys, return_inverse=True)
+        scores = scores + PHRASE_BOOST * _phrase_hits(names[unique_keys], subjects)[inverse]
+
+    for key, series, codes in (
+        ("university", catalog.courses["university"], None),
+        ("campus", options["campus"], campus_codes),
+    ):
+        values = _entity_list(ents, key)
+        wanted = {v.lower() for v in values + corrected_entities(catalog.resolver, key, values)}
+        if not wanted or not len(rows):
+            continue
+        if codes is None:
+            codes = series.cat.codes.to_numpy()[course_keys]
+        exact = np.append([c.lower() in wanted for c in series.cat.categories], False).astype(bool)
+        scores = scores + EXACT_MATCH_BOOST * exact[codes]
+
+    if ucas_points is not None and len(rows):
+        tariff = catalog.tariff_index
+        distance = np.abs(tariff.values[rows].astype(np.float64) - ucas_points)
+        fit = 1 - np.minimum(distance, TARIFF_FIT_RANGE) / TARIFF_FIT_RANGE
+        scores = scores + TARIFF_FIT_WEIGHT * np.where(tariff.known[rows], fit, 0.0)
+
+    known = sum(index.known[rows].astype(np.float64)
+                for index in (catalog.tariff_index, catalog.fee_index, catalog.duration_index))
+    return scores + COMPLETENESS_WEIGHT * known / 3
@@ -0,0 +1,205 @@
+"""
+Typo-tolerant resolution of free-text university, campus and subject names.
+
+Each vocabulary is tokenized once at catalog load. Misspelled tokens are
+corrected with a SymSpell-style deletion index: every vocabulary token is
+stored under all strings obtained by deleting up to two characters, so a
+lookup only generates the deletes of the query token and verifies the few
+candidates with Levenshtein distance, never scanning the vocabulary.
+"""
+import re
+
+import Levenshtein
+
+# Largest edit distance indexed; short tokens are held to a smaller one
+MAX_EDIT_DISTANCE = 2
+
+# Tokens up to this length are only corrected at edit distance 1
+SHORT_TOKEN_LENGTH = 4
+
+# Token-level abbreviations expanded before matching
+ABBREVIATIONS = {
+    "uni": "university",
+    "univ": "university",
+    "met": "metropolitan",
+    "coll": "college",
+    "st": "saint",
+    "poly": "polytechnic",
+    "maths": "mathematics",
+    "math": "mathematics",
+    "comp": "computer",
+    "sci": "science",
+    "econ": "economics",
+    "psych": "psychology",
+    "eng": "engineering",
+    "mgmt": "management",
+    "bio": "biology",
+}
+
+# Whole-name aliases for universities whose common names are not substrings
+UNIVERSITY_ALIASES = {
+    "uclan": "University of Central Lancashire",
+    "london met": "London Metropolitan University",
+    "kcl": "King's College London",
+    "kings college": "King's College London",
+    "ucl": "University College London",
+    "lse": "London School of Economics and Political Science",
+    "imperial": "Imperial College London",
+    "qmul": "Queen Mary University of London",
+    "soas": "SOAS University of London",
+    "lsbu": "London South Bank University",
+    "mmu": "Manchester Metropolitan University",
+    "ljmu": "Liverpool John Moores University",
+    "ntu": "Nottingham Trent University",
+    "oxford": "University of Oxford",
+    "cambridge": "University of Cambridge",
+}
+
+# Words that carry no identifying information in institution names
+NAME_STOPWORDS = {"of", "the", "and", "at", "in", "for", "with", "bsc", "ba", "hons", "msci", "beng"}
+
+# Words of university names too common to identify one on their own
+GENERIC_NAME_WORDS = {
+    "university", "college", "school", "institute", "london", "metropolitan", "city", "central",
+    "hope", "new", "open", "royal", "national", "south", "north", "east", "west", "bank", "trinity",
+    "saint", "st", "arts", "business",
+}
+
+# Generic words naming the kind of institution, which users often add or leave out
+INSTITUTION_WORDS = {"university", "college", "school", "institute"}
+
+
+def normalize(text):
+    text = str(text or "").lower().replace("'", "").replace("’", "")
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def tokens(text):
+    return [ABBREVIATIONS.get(t, t) for t in normalize(text).split() if t not in NAME_STOPWORDS]
+
+
+def _deletes(word, max_distance):
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        result |= frontier
+    return result
+
+
+def max_distance_for(token):
+    return 1 if len(token) <= SHORT_TOKEN_LENGTH else MAX_EDIT_DISTANCE
+
+
+class DeletionIndex:
+    """
+    SymSpell-style spelling index over a set of words.
+
+    Args:
+        words (iterable): Vocabulary
+        max_distance (int): Largest edit distance that can be looked up
+    """
+
+    def __init__(self, words, max_distance=MAX_EDIT_DISTANCE):
+        self.words = set(words)
+        self.max_distance = max_distance
+        self.deletes = {}
+        for word in self.words:
+            for delete in _deletes(word, max_distance):
+                self.deletes.setdefault(delete, set()).add(word)
+
+    def lookup(self, word, max_distance=None):
+        """Vocabulary words within ``max_distance`` edits, closest first."""
+        if word in self.words:
+            return [(word, 0)]
+        max_distance = min(self.max_distance, max_distance_for(word) if max_distance is None else max_distance)
+        candidates = set()
+        for delete in _deletes(word, max_distance):
+            candidates |= self.deletes.get(delete, set())
+        matches = [(c, Levenshtein.distance(word, c)) for c in candidates]
+        return sorted(((c, d) for c, d in matches if d <= max_distance), key=lambda m: (m[1], m[0]))
+
+
+class VocabularyResolver:
+    """
+    Resolves free text to values of one vocabulary (e.g. university names).
+
+    Args:
+        values (iterable): Canonical values
+        aliases (dict): Extra normalized alias -> canonical value
+        generic (set): Tokens too common to identify a value on their own
+    """
+
+    def __init__(self, values, aliases=None, generic=None):
+        self.values = [v for v in values if v]
+        self.generic = set(generic or ())
+        self.order = {value: i for i, value in enumerate(self.values)}
+        self.by_alias = {}
+        self.postings = {}
+        for value in self.values:
+            self.by_alias[normalize(value)] = value
+            self.by_alias[" ".join(tokens(value))] = value
+            for token in set(tokens(value)):
+                self.postings.setdefault(token, set()).add(value)
+        present = set(self.values)
+        for alias, value in (aliases or {}).items():
+            if value in present:
+                self.by_alias[normalize(alias)] = value
+        self.spelling = DeletionIndex(self.postings)
+        self.value_tokens = {value: set(tokens(value)) for value in self.values}
+
+    def correct_token(self, token):
+        matches = self.spelling.lookup(token)
+        return matches[0][0] if matches else None
+
+    def correct(self, text):
+        """``text`` with each token replaced by its closest vocabulary token."""
+        return " ".join(self.correct_token(t) or t for t in tokens(text))
+
+    def resolve(self, text):
+        """
+        Canonical values ``text`` most likely refers to, best first.
+
+        An exact or alias match wins; otherwise every token is spell-corrected
+        and the values containing the most corrected tokens are returned
+        (at least half of the tokens must match). With ``generic`` words, the
+        distinctive tokens of the text and of the value must match each other
+        instead, so "University of Leeds" resolves to nothing rather than to
+        every university in the catalog.
+        """
+        key = normalize(text)
+        if key in self.by_alias:
+            return [self.by_alias[key]]
+        query = tokens(text)
+        if " ".join(query) in self.by_alias:
+            return [self.by_alias[" ".join(query)]]
+
+        corrected = [self.correct_token(token) or token for token in query]
+        hits = {}
+        for token in corrected:
+            for value in self.postings.get(token, ()):
+                hits[value] = hits.get(value, 0) + 1
+        if self.generic:
+            hits = {v: n for v, n in hits.items() if self._distinctive_match(set(corrected), self.value_tokens[v])}
+        if not hits:
+            return []
+        best = max(hits.values())
+        if not self.generic and best * 2 < len(query):
+            return []
+        return sorted((v for v, n in hits.items() if n == best), key=self.order.get)
+
+    def _distinctive_match(self, query, value):
+        distinctive = query - self.generic
+        if distinctive:
+            return distinctive <= value and value - self.generic <= query
+        # Only generic words (e.g. "London Metropolitan"): they must name the value whole
+        return not value - self.generic and query <= value and value - INSTITUTION_WORDS <= query
+
+
+class CatalogResolver:
+    """Resolvers over the distinct university, campus and subject vocabularies."""
+
+    def __init__(self, universities, campuses, course_names):
+        self.university = VocabularyResolver(universities, UNIVERSITY_ALIASES, GENERIC_NAME_WORDS)
+        self.campus = VocabularyResolver(campuses)
+        self.subject = VocabularyResolver(course_names)
@@ -1,60 +1,126 @@
-import json
-import openai
 from config.gpt_prompt_templates import RESPONSE_SYSTEM_PROMPT
+from core.admission import LLMBusy
+from core.context_encoder import COURSE_CONTEXT_TOKENS, compact_json, encode_courses
+from core.history import RESPONSE_HISTORY_TOKENS, history_messages
+from core.course_cards import LLM_FEE_MISSING
+from core.llm import CHAT_MODEL, get_client, record_usage
+from utils.formatter import fee_text, requirement_text
 
-def generate_response(user_query, parsed, matched_df, history=[], api_key=None):
-    simplified = []
-    for _, row in matched_df.iterrows():
-        fee = next((f for f in row["fees"] if f["region"] == "England"), {})
-        
-        entry_reqs = []
-        for req in row["entry_requirements"]:
-            if req["type"] == "UCAS Tariff":
-                entry_reqs.append(f"UCAS Tariff: {req['min_entry']} points")
-            else:
-                entry_reqs.append(f"{req['type']}: {req.get('min_entry', 'N/A')}")
-        
-        simplified.append({
-            "name": row["name"],
-            "university": row["university"],
-            "study_mode": row["study_mode"],
-            "duration": row["duration"],
-            "fee": f"£{fee.get('price', 'N/A')} per {fee.get('period', 'year')}",
-            "campus": row["campus"],
-            "url": row["external_url"],
-            "entry_requirements": entry_reqs
-        })
-
-    system_prompt = f"""{RESPONSE_SYSTEM_PROMPT}
-
-Available courses for this query:
-{json.dumps(simplified, indent=2)}
+def course_summary(row):
+    """The fields of one matched course the model needs to answer (see ``Catalog.cards``)."""
+    return {
+        "name": row["name"],
+        "university": row["university"],
+        "study_mode": row["study_mode"],
+        "duration": row["duration"],
+        "fee": fee_text(row["fee_england"], row["fee_england_period"], LLM_FEE_MISSING),
+        "campus": row["campus"],
+        "url": row["external_url"],
+        "entry_requirements": [requirement_text(req["type"], req.get("min_entry")) for req in row["entry_requirements"]]
+    }
+
+def course_summaries(matched_df, cards=None):
+    """Summaries of the matched courses, looked up in the precomputed ``cards`` when given."""
+    if cards is not None:
+        return cards.llm_cards(matched_df["row_id"].tolist())
+    return [course_summary(row) for _, row in matched_df.iterrows()]
+
+def course_context(matched_df, usage=None, budget=COURSE_CONTEXT_TOKENS, cards=None):
+    """
+    The ranked courses encoded within ``budget`` tokens; the tokens and courses
+    used are added to ``usage``.
+
+    Returns:
+        tuple: ``(text, count)``; only the first ``count`` courses were included
+    """
+    text, tokens, count = encode_courses(course_summaries(matched_df, cards), budget)
+    if usage is not None:
+        usage["context_tokens"] += tokens
+        usage["context_courses"] += count
+    return text, count
+
+def build_messages(user_query, parsed, matched_df, history=[], usage=None, cards=None):
+    # Without ``matched_df`` (small talk) the prompt has no course section at all
+    system_prompt = RESPONSE_SYSTEM_PROMPT
+    if matched_df is not None:
+        courses, _ = course_context(matched_df, usage, cards=cards)
+        system_prompt += f"""
+
+Available courses for this query, best match first:
+{courses}"""
+    system_prompt += f"""
 
 Parsed user intent:
-{json.dumps(parsed, indent=2)}"""
+{compact_json(parsed)}"""
 
     messages = [{"role": "system", "content": system_prompt}]
-    
-    for turn in history:  # Use complete history
-        messages.append({"role": "user", "content": turn["user"]})
-        messages.append({"role": "assistant", "content": turn["ai"]})
-    
+
+    # Session state, summary and the recent turns that fit the response budget
+    messages += history_messages(history, RESPONSE_HISTORY_TOKENS)
+
     messages.append({"role": "user", "content": user_query})
+    return messages
+
+def stream_completion(client, messages, usage=None):
+    """Yield the text of a streamed chat completion as it arrives."""
+    stream = client.chat.completions.create(
+        model=CHAT_MODEL,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True}
+    )
+    final = None
+    for chunk in stream:
+        if chunk.usage is not None:
+            final = chunk  # the last chunk carries the token counts
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+    record_usage(usage, final)
 
+def stream_response(user_query, parsed, matched_df, history=[], api_key=None, usage=None, cards=None):
+    """Streaming variant of generate_response: returns an iterator of reply chunks."""
+    # Built now, so the context usage is known before the first chunk is read
+    messages = build_messages(user_query, parsed, matched_df, history, usage, cards)
+    return _stream_chunks(messages, api_key, usage)
+
+def _stream_chunks(messages, api_key, usage):
     try:
-        client = openai.OpenAI(api_key=api_key)
+        client = get_client(api_key)
+        empty = True
+        for text in stream_completion(client, messages, usage):
+            empty = False
+            yield text
+        if empty:
+            yield "I'm sorry, I couldn't generate a response. Please try asking your question again."
+    except LLMBusy:
+        # Overloaded: the caller reports it as such
+        raise
+    except Exception as e:
+        # Log the error and finish with a default response
+        print(f"Error in stream_response: {str(e)}")
+        yield "I'm sorry, I encountered an error while processing your request. Please try again."
+
+def generate_response(user_query, parsed, matched_df, history=[], api_key=None, usage=None, cards=None):
+    messages = build_messages(user_query, parsed, matched_df, history, usage, cards)
+
+    try:
+        client = get_client(api_key)
         response = client.chat.completions.create(
-            model="gpt-4",
+            model=CHAT_MODEL,
             messages=messages
         )
-        
+        record_usage(usage, response)
+
         # Check if response is empty
         if not response.choices or not response.choices[0].message.content:
             # Return a default response if the response is empty
             return "I'm sorry, I couldn't generate a response. Please try asking your question again."
-            
+
         return response.choices[0].message.content
+    except LLMBusy:
+        # Overloaded: the caller reports it as such
+        raise
     except Exception as e:
         # Log the error and return a default response
         print(f"Error in generate_response: {str(e)}")
-        return "I'm sorry, I encountered an error while processing your request. Please try again." 
\ No newline at end of file
+        return "I'm sorry, I encountered an error while processing your request. Please try again."
@@ -0,0 +1,120 @@
+"""
+LRU cache of query-planner results.
+
+Follow-up turns often re-run the same search ("what about part-time?" keeps
+the subject and grades of the previous turn). The planner output depends only
+on the parsed entities, the user preferences and the catalog, so the cache
+maps a canonical form of those to the matching option row ids. Entries carry
+the catalog version and are dropped as soon as a different catalog is served.
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+DEFAULT_MAX_ENTRIES = 256
+
+
+def canonical_value(value):
+    """Hashable, order- and case-insensitive form of one intent value."""
+    if isinstance(value, (list, tuple, set)):
+        values = sorted({canonical_value(v) for v in value if v not in (None, "")}, key=repr)
+        return values[0] if len(values) == 1 else tuple(values)  # ["x"] filters like "x"
+    if isinstance(value, dict):
+        return canonical_mapping(value)
+    if isinstance(value, str):
+        return " ".join(value.lower().split())
+    return value
+
+
+def canonical_mapping(mapping):
+    """Sorted ``(key, value)`` pairs of the non-empty entries of ``mapping``."""
+    items = []
+    for key, value in (mapping or {}).items():
+        value = canonical_value(value)
+        if value not in (None, "", ()):
+            items.append((key, value))
+    return tuple(sorted(items))
+
+
+def cache_key(parsed):
+    """Key of a parsed intent: its canonical entities and user preferences."""
+    return (
+        canonical_mapping(parsed.get("entities")),
+        canonical_mapping(parsed.get("user_preferences")),
+    )
+
+
+class FilterCache:
+    """
+    Bounded LRU map from canonical parsed intent to matching row ids.
+
+    Args:
+        max_entries (int): Entries kept before the least recently used is evicted
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _use_version(self, version):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+    def get(self, version, key):
+        """Cached row ids for ``key`` under catalog ``version``, or None."""
+        with self._lock:
+            self._use_version(version)
+            rows = self._entries.get(key)
+            if rows is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows
+
+    def put(self, version, key, rows):
+        rows = np.asarray(rows)
+        rows.flags.writeable = False  # shared between callers
+        with self._lock:
+            self._use_version(version)
+            self._entries[key] = rows
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return rows
+
+    def get_or_compute(self, version, key, compute):
+        rows = self.get(version, key)
+        if rows is None:
+            rows = self.put(version, key, compute())
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "catalog_version": self.version,
+        }
+
+
+filter_cache = FilterCache()
@@ -0,0 +1,250 @@
+import numpy as np
+
+EMPTY = np.empty(0, dtype=np.int64)
+
+# Set bits per byte value, for counting packed bitmaps
+POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Row sets holding more than 1/DENSE_SORT_FRACTION of the rows are sorted through a mask
+DENSE_SORT_FRACTION = 16
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def intersect(arrays):
+    """Intersect sorted, duplicate-free id arrays, smallest first."""
+    arrays = sorted(arrays, key=len)
+    result = arrays[0]
+    for other in arrays[1:]:
+        if not len(result):
+            break
+        result = np.intersect1d(result, other, assume_unique=True)
+    return result
+
+
+def sort_rows(rows, n_rows):
+    """
+    Sort distinct row ids below ``n_rows``. Dense sets are marked in a mask
+    and read back in O(n) rather than comparison-sorted.
+    """
+    if len(rows) * DENSE_SORT_FRACTION < n_rows:
+        return np.sort(rows)
+    mask = np.zeros(n_rows, dtype=bool)
+    mask[rows] = True
+    return np.flatnonzero(mask)
+
+
+def popcount(bitmap):
+    return int(POPCOUNT[bitmap].sum(dtype=np.int64))
+
+
+def bitmap_rows(bitmap, n_rows):
+    """Sorted row ids set in a packed bitmap."""
+    return np.flatnonzero(np.unpackbits(bitmap, count=n_rows))
+
+
+def bitmap_test(bitmap, rows):
+    """Boolean mask telling which of ``rows`` are set in a packed bitmap."""
+    rows = np.asarray(rows, dtype=np.int64)
+    return ((bitmap[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+
+class PostingIndex:
+    """
+    Maps value codes to the sorted row ids holding each value (CSR layout).
+
+    Args:
+        codes (np.ndarray): Value code per row, -1 for missing
+        size (int): Number of distinct values
+    """
+
+    def __init__(self, codes, size):
+        codes = np.asarray(codes)
+        valid = np.flatnonzero(codes >= 0)
+        order = np.argsort(codes[valid], kind="stable")
+        self.rows_by_value = valid[order]
+        self.offsets = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes[valid], minlength=size), out=self.offsets[1:])
+
+    def count(self, code):
+        return int(self.offsets[code + 1] - self.offsets[code])
+
+    def rows(self, code):
+        return self.rows_by_value[self.offsets[code]:self.offsets[code + 1]]
+
+    def rows_for(self, codes):
+        """Sorted union of the rows of several values."""
+        parts = [self.rows(code) for code in codes]
+        if not parts:
+            return EMPTY
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts))
+
+
+class TrigramIndex:
+    """
+    Inverted index from lowercase character trigrams to value ids, answering
+    case-insensitive substring queries by intersecting posting lists and then
+    verifying the (few) surviving candidates.
+
+    Args:
+        values (list): Distinct strings; a value's id is its position
+    """
+
+    def __init__(self, values):
+        self.values = [(value or "").lower() for value in values]
+        postings = {}
+        for value_id, text in enumerate(self.values):
+            for gram in trigrams(text):
+                postings.setdefault(gram, []).append(value_id)
+        self.postings = {gram: np.asarray(ids, dtype=np.int64) for gram, ids in postings.items()}
+
+    def search(self, query):
+        """Return the sorted ids of values containing ``query``."""
+        query = (query or "").lower()
+        if not query:
+            return np.arange(len(self.values))
+        grams = trigrams(query)
+        if not grams:
+            # Shorter than a trigram: scan the distinct values
+            return np.asarray([i for i, text in enumerate(self.values) if query in text], dtype=np.int64)
+        if any(gram not in self.postings for gram in grams):
+            return EMPTY
+        candidates = intersect([self.postings[gram] for gram in grams])
+        return np.asarray([i for i in candidates if query in self.values[i]], dtype=np.int64)
+
+
+class TextFieldIndex:
+    """
+    Substring search over one text attribute of the study options.
+
+    Each distinct string is indexed once by a TrigramIndex; a PostingIndex
+    maps the matching strings to option row ids.
+
+    Args:
+        codes (np.ndarray): Code of the string for every option row (-1 if missing)
+        values (list): The distinct strings the codes refer to
+    """
+
+    def __init__(self, codes, values):
+        self.values = list(values)
+        self.codes = {value: code for code, value in enumerate(self.values)}
+        self.trigrams = TrigramIndex(self.values)
+        self.postings = PostingIndex(codes, len(self.values))
+
+    def search(self, query):
+        """Return the sorted option row ids whose value contains ``query``."""
+        return self.postings.rows_for(self.trigrams.search(query))
+
+    def rows_for_values(self, values):
+        """Sorted option row ids holding any of the given exact values."""
+        return self.postings.rows_for([self.codes[v] for v in values if v in self.codes])
+
+
+class BitmapIndex:
+    """
+    One packed bitmap (``np.packbits`` layout) per distinct value of a
+    categorical attribute. A row may hold several values, e.g. the years of
+    entry a study option accepts.
+
+    Args:
+        rows (np.ndarray): Row id of each (row, value) pair
+        codes (np.ndarray): Value code of each pair, -1 for missing
+        values (list): The distinct values the codes refer to
+        n_rows (int): Number of rows in the table
+    """
+
+    def __init__(self, rows, codes, values, n_rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        codes = np.asarray(codes)
+        self.values = list(values)
+        self.n_rows = n_rows
+        self.bitmaps = np.zeros((len(self.values), (n_rows + 7) // 8), dtype=np.uint8)
+        for code in range(len(self.values)):
+            bits = np.zeros(n_rows, dtype=bool)
+            bits[rows[codes == code]] = True
+            self.bitmaps[code] = np.packbits(bits)
+        self.counts = np.asarray([popcount(bitmap) for bitmap in self.bitmaps], dtype=np.int64)
+
+    @classmethod
+    def from_codes(cls, codes, values):
+        """Build from a single-valued attribute: one code per row."""
+        codes = np.asarray(codes)
+        return cls(np.arange(len(codes)), codes, values, len(codes))
+
+    def codes_where(self, match):
+        """Codes of the values for which ``match(value)`` is true."""
+        return [code for code, value in enumerate(self.values) if match(value)]
+
+    def bitmap(self, codes):
+        """OR of the bitmaps of several values."""
+        result = np.zeros(self.bitmaps.shape[1], dtype=np.uint8)
+        for code in codes:
+            result |= self.bitmaps[code]
+        return result
+
+
+class RangeIndex:
+    """
+    Numeric attribute kept in sorted order, so threshold and range queries
+    are two binary searches plus a slice.
+
+    Rows whose value equals ``missing`` (or is NaN) are kept apart in
+    ``missing_rows`` rather than being treated as failing every query.
+
+    Args:
+        values (np.ndarray): Value for every option row
+        missing: Marker used for unknown values in integer columns
+    """
+
+    def __init__(self, values, missing=None):
+        values = np.asarray(values)
+        known = ~np.isnan(values) if values.dtype.kind == "f" else np.ones(len(values), dtype=bool)
+        if missing is not None:
+            known &= values != missing
+        known_rows = np.flatnonzero(known)
+        order = np.argsort(values[known_rows], kind="stable")
+        self.values = values
+        self.known = known
+        self.rows = known_rows[order]
+        self.sorted_values = values[self.rows]
+        self.missing_rows = np.flatnonzero(~known)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def _bounds(self, low, high):
+        start = 0 if low is None else np.searchsorted(self.sorted_values, low, side="left")
+        end = len(self.rows) if high is None else np.searchsorted(self.sorted_values, high, side="right")
+        return start, end
+
+    def range_rows(self, low=None, high=None, include_missing=False):
+        """Row ids with ``low <= value <= high`` in value order: a slice, no sort."""
+        start, end = self._bounds(low, high)
+        rows = self.rows[start:end]
+        if include_missing:
+            rows = np.concatenate([rows, self.missing_rows])
+        return rows
+
+    def between(self, low=None, high=None, include_missing=False):
+        """Sorted row ids with ``low <= value <= high`` (either bound optional)."""
+        return sort_rows(self.range_rows(low, high, include_missing), len(self.values))
+
+    def test(self, rows, low=None, high=None, include_missing=False):
+        """Boolean mask telling which of ``rows`` fall within the bounds."""
+        values = self.values[rows]
+        mask = self.known[rows].copy()
+        if low is not None:
+            mask &= values >= low
+        if high is not None:
+            mask &= values <= high
+        if include_missing:
+            mask |= ~self.known[rows]
+        return mask
+
+    def count_between(self, low=None, high=None):
+        start, end = self._bounds(low, high)
+        return int(end - start)
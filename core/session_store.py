@@ -0,0 +1,248 @@
+"""
+Conversation memory per session, with bounded size and eviction.
+
+Each session (a browser tab, a CLI run) has its own memory: its recent
+turns, the summary of folded turns and the last search. A session keeps at
+most ``SESSION_MAX_TURNS`` turns, oldest dropped first, and whole sessions
+are evicted once idle for ``SESSION_IDLE_TTL`` seconds or, least recently
+used first, when more than ``SESSION_MAX_SESSIONS`` are held.
+
+Two backends, chosen with ``SESSION_BACKEND``:
+
+- ``memory``: a dict in this process.
+- ``sqlite``: a table at ``SESSION_DB_PATH`` shared by every worker process.
+
+Readers get a copy of a session; changes go through ``update``, which
+applies a function to the stored memory atomically.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+SESSION_BACKENDS = ("memory", "sqlite")
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", "data/sessions.sqlite3")
+
+SESSION_MAX_TURNS = int(os.getenv("SESSION_MAX_TURNS", "20"))
+SESSION_IDLE_TTL = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+SESSION_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "1000"))
+
+
+def new_session():
+    return {
+        "turns": [],  # Recent {"user": "...", "ai": "..."} turns; older ones are folded into "summary"
+        "summary": "",
+        "last_intent": None,
+        "last_subject": None,
+        "last_ucas": None,
+        "last_courses": [],
+    }
+
+
+def trim_turns(memory, max_turns=SESSION_MAX_TURNS):
+    """Drop the oldest turns beyond ``max_turns`` (folding normally keeps well below it)."""
+    excess = len(memory["turns"]) - max_turns
+    if excess > 0:
+        del memory["turns"][:excess]
+
+
+class InMemorySessionStore:
+    """
+    Sessions in an in-process LRU.
+
+    Args:
+        max_sessions (int): Sessions kept before the least recently used is evicted
+        idle_ttl (float): Seconds of inactivity after which a session is evicted
+        max_turns (int): Turns kept per session
+    """
+
+    backend = "memory"
+
+    def __init__(self, max_sessions=SESSION_MAX_SESSIONS, idle_ttl=SESSION_IDLE_TTL, max_turns=SESSION_MAX_TURNS):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.evictions = 0
+        self._sessions = OrderedDict()  # session id -> (memory, last access, serialized bytes)
+        self._lock = threading.Lock()
+
+    def _live(self, session_id, now):
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if now - entry[1] > self.idle_ttl:
+            del self._sessions[session_id]
+            self.evictions += 1
+            return None
+        return entry[0]
+
+    def _evict(self, now):
+        while self._sessions:
+            session_id, (_, accessed, _) = next(iter(self._sessions.items()))
+            if now - accessed <= self.idle_ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+            self.evictions += 1
+
+    def get(self, session_id):
+        """A copy of the session's memory (a new, unsaved session if unknown)."""
+        now = time.time()
+        with self._lock:
+            memory = self._live(session_id, now)
+            if memory is None:
+                return new_session()
+            self._sessions[session_id] = (memory, now, self._sessions[session_id][2])
+            self._sessions.move_to_end(session_id)
+            return copy.deepcopy(memory)
+
+    def update(self, session_id, change):
+        """Apply ``change(memory)`` to the stored session; returns a copy of the result."""
+        now = time.time()
+        with self._lock:
+            memory = self._live(session_id, now) or new_session()
+            change(memory)
+            trim_turns(memory, self.max_turns)
+            self._sessions[session_id] = (memory, now, len(json.dumps(memory)))
+            self._sessions.move_to_end(session_id)
+            self._evict(now)
+            return copy.deepcopy(memory)
+
+    def delete(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            self._evict(time.time())
+            return {
+                "backend": self.backend,
+                "sessions": len(self._sessions),
+                "turns": sum(len(memory["turns"]) for memory, _, _ in self._sessions.values()),
+                "bytes": sum(size for _, _, size in self._sessions.values()),
+                "evictions": self.evictions,
+            }
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a SQLite table shared by worker processes.
+
+    Args:
+        path (str): SQLite file
+        max_sessions (int): Sessions kept before the least recently used is evicted
+        idle_ttl (float): Seconds of inactivity after which a session is evicted
+        max_turns (int): Turns kept per session
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path=SESSION_DB_PATH, max_sessions=SESSION_MAX_SESSIONS, idle_ttl=SESSION_IDLE_TTL,
+                 max_turns=SESSION_MAX_TURNS):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.max_turns = max_turns
+        self.evictions = 0
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # A connection must not cross a fork; pre-forked workers open their own
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, memory TEXT NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS sessions_accessed ON sessions (accessed)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def _evict(self, conn, now):
+        evicted = conn.execute("DELETE FROM sessions WHERE accessed < ?", (now - self.idle_ttl,)).rowcount
+        (count,) = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        if count > self.max_sessions:
+            evicted += conn.execute(
+                "DELETE FROM sessions WHERE id IN (SELECT id FROM sessions ORDER BY accessed LIMIT ?)",
+                (count - self.max_sessions,),
+            ).rowcount
+        self.evictions += evicted
+
+    def get(self, session_id):
+        """A copy of the session's memory (a new, unsaved session if unknown)."""
+        now = time.time()
+        with self._lock:
+            try:
+                conn = self._connection()
+                row = conn.execute(
+                    "SELECT memory FROM sessions WHERE id = ? AND accessed >= ?", (session_id, now - self.idle_ttl)
+                ).fetchone()
+                if row is None:
+                    return new_session()
+                conn.execute("UPDATE sessions SET accessed = ? WHERE id = ?", (now, session_id))
+                return json.loads(row[0])
+            except sqlite3.Error as e:
+                print(f"Session store read failed: {str(e)}")
+                return new_session()
+
+    def update(self, session_id, change):
+        """Apply ``change(memory)`` to the stored session; returns the result."""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front, so concurrent updates from other processes serialize
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT memory FROM sessions WHERE id = ? AND accessed >= ?", (session_id, now - self.idle_ttl)
+                ).fetchone()
+                memory = json.loads(row[0]) if row else new_session()
+                change(memory)
+                trim_turns(memory, self.max_turns)
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (id, memory, accessed) VALUES (?, ?, ?)",
+                    (session_id, json.dumps(memory), now),
+                )
+                self._evict(conn, now)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return memory
+
+    def delete(self, session_id):
+        with self._lock:
+            self._connection().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self):
+        with self._lock:
+            sessions, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(LENGTH(memory)), 0) FROM sessions WHERE accessed >= ?",
+                (time.time() - self.idle_ttl,),
+            ).fetchone()
+        return {
+            "backend": self.backend,
+            "sessions": sessions,
+            "bytes": size,
+            "evictions": self.evictions,
+        }
+
+
+def make_session_store(backend=SESSION_BACKEND, **options):
+    if backend == "sqlite":
+        return SQLiteSessionStore(**options)
+    if backend == "memory":
+        return InMemorySessionStore(**options)
+    raise ValueError(f"Unknown session backend {backend!r}; choose from {', '.join(SESSION_BACKENDS)}")
+
+
+session_store = make_session_store()
@@ -0,0 +1,268 @@
+"""
+Versioned binary snapshot of the course catalog.
+
+The snapshot is a single file:
+
+    MAGIC | header length (uint64) | JSON header | aligned data blocks
+
+Numeric columns and categorical codes are stored as fixed-width little-endian
+arrays; strings (categorical categories and free-text columns) are stored as
+string tables: an offsets array plus one UTF-8 blob. Reading memory-maps the
+file and wraps the numeric blocks with ``np.frombuffer``, so numeric columns
+and codes are never copied and processes loading the same snapshot share the
+page cache. String tables are decoded into Python strings on load, since
+pandas needs them for categories and text columns: that pass is linear in
+the size of the text, but much cheaper than parsing the JSON it replaces.
+
+Build a snapshot with:
+
+    python -m core.snapshot data/structured_dataset.json
+"""
+import hashlib
+import json
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+MAGIC = b"UCATSNAP"
+
+# Bump whenever the layout or the catalog schema changes
+SNAPSHOT_VERSION = 2
+
+SNAPSHOT_SUFFIX = ".catalog"
+
+# Data blocks are aligned so every array view is naturally aligned
+ALIGNMENT = 64
+
+
+def snapshot_path(source_path):
+    """Return the snapshot path that belongs to a JSON data file."""
+    return os.path.splitext(source_path)[0] + SNAPSHOT_SUFFIX
+
+
+def file_digest(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _encode_strings(values):
+    """Encode a sequence of str/None into (offsets, blob, nulls)."""
+    encoded = []
+    nulls = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        if value is None or (isinstance(value, float) and value != value):
+            nulls[i] = True
+            encoded.append(b"")
+        else:
+            encoded.append(str(value).encode("utf-8"))
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(e) for e in encoded], out=offsets[1:])
+    return offsets, b"".join(encoded), nulls
+
+
+def _decode_strings(offsets, blob, nulls=None):
+    text = bytes(blob)
+    values = [
+        text[start:end].decode("utf-8")
+        for start, end in zip(offsets[:-1].tolist(), offsets[1:].tolist())
+    ]
+    if nulls is not None:
+        for i in np.flatnonzero(nulls):
+            values[i] = None
+    return values
+
+
+class _Writer:
+    def __init__(self):
+        self.blocks = []
+        self.size = 0
+
+    def add(self, data):
+        data = data.tobytes() if isinstance(data, np.ndarray) else bytes(data)
+        padding = -self.size % ALIGNMENT
+        if padding:
+            self.blocks.append(b"\0" * padding)
+            self.size += padding
+        offset = self.size
+        self.blocks.append(data)
+        self.size += len(data)
+        return [offset, len(data)]
+
+    def add_strings(self, values):
+        offsets, blob, nulls = _encode_strings(values)
+        spec = {"offsets": self.add(offsets), "blob": self.add(blob)}
+        if nulls.any():
+            spec["nulls"] = self.add(nulls)
+        return spec
+
+
+def write_snapshot(tables, out_path, source_path=None):
+    """
+    Serialize catalog tables into a snapshot file.
+
+    Args:
+        tables (dict): Table name -> DataFrame
+        out_path (str): Destination snapshot path
+        source_path (str): JSON file the tables were built from
+
+    Returns:
+        dict: The snapshot header
+    """
+    writer = _Writer()
+    header_tables = {}
+    for table_name, df in tables.items():
+        columns = []
+        for name in df.columns:
+            series = df[name]
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                codes = series.cat.codes.to_numpy().astype("<i4")
+                columns.append({
+                    "name": name,
+                    "kind": "categorical",
+                    "codes": writer.add(codes),
+                    "categories": writer.add_strings(list(series.cat.categories)),
+                })
+            elif series.dtype.kind in "biuf":
+                values = series.to_numpy()
+                values = values.astype(values.dtype.newbyteorder("<"))
+                columns.append({
+                    "name": name,
+                    "kind": "numeric",
+                    "dtype": values.dtype.str,
+                    "values": writer.add(values),
+                })
+            else:
+                columns.append({
+                    "name": name,
+                    "kind": "string",
+                    "strings": writer.add_strings(series.tolist()),
+                })
+        header_tables[table_name] = {"length": len(df), "columns": columns}
+
+    content_hash = hashlib.sha256()
+    for block in writer.blocks:
+        content_hash.update(block)
+
+    header = {
+        "version": SNAPSHOT_VERSION,
+        "content_hash": content_hash.hexdigest(),
+        "tables": header_tables,
+    }
+    if source_path:
+        header["source"] = dict(source_fingerprint(source_path), sha256=file_digest(source_path))
+
+    header_bytes = json.dumps(header).encode("utf-8")
+    prefix = len(MAGIC) + 8 + len(header_bytes)
+    data_start = prefix + (-prefix % ALIGNMENT)
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header_bytes)).astype("<u8").tobytes())
+        f.write(header_bytes)
+        f.write(b"\0" * (data_start - prefix))
+        for block in writer.blocks:
+            f.write(block)
+    os.replace(tmp_path, out_path)
+    return header
+
+
+def read_header(path):
+    """Read the snapshot header and the offset its data section starts at."""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        header_len = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    prefix = len(MAGIC) + 8 + header_len
+    return header, prefix + (-prefix % ALIGNMENT)
+
+
+def is_fresh(path, source_path):
+    """
+    Check whether a snapshot exists, has the current version and matches the
+    JSON source. Size and mtime are compared first; the source is only hashed
+    when they differ (e.g. after a checkout or a touch).
+    """
+    if not os.path.exists(path) or not os.path.exists(source_path):
+        return False
+    try:
+        header, _ = read_header(path)
+    except (OSError, ValueError):
+        return False
+    if header.get("version") != SNAPSHOT_VERSION or "source" not in header:
+        return False
+    source = header["source"]
+    fingerprint = source_fingerprint(source_path)
+    if fingerprint["size"] != source["size"]:
+        return False
+    if fingerprint["mtime_ns"] == source["mtime_ns"]:
+        return True
+    return file_digest(source_path) == source["sha256"]
+
+
+def read_snapshot(path):
+    """
+    Memory-map a snapshot and rebuild its tables. Numeric columns and codes
+    are views of the mapped file; strings are decoded once, here.
+
+    Returns:
+        tuple: (dict of table name -> DataFrame, header)
+    """
+    header, data_start = read_header(path)
+    if header.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(f"Unsupported snapshot version {header.get('version')} in {path}")
+
+    mm = np.memmap(path, dtype=np.uint8, mode="r")
+
+    def block(spec, dtype=np.uint8):
+        offset, nbytes = spec
+        dtype = np.dtype(dtype)
+        return np.frombuffer(mm, dtype=dtype, count=nbytes // dtype.itemsize, offset=data_start + offset)
+
+    def strings(spec):
+        nulls = block(spec["nulls"], np.bool_) if "nulls" in spec else None
+        return _decode_strings(block(spec["offsets"], "<u8"), block(spec["blob"]), nulls)
+
+    tables = {}
+    for table_name, table in header["tables"].items():
+        data = {}
+        for column in table["columns"]:
+            if column["kind"] == "numeric":
+                data[column["name"]] = block(column["values"], column["dtype"])
+            elif column["kind"] == "categorical":
+                data[column["name"]] = pd.Categorical.from_codes(
+                    block(column["codes"], "<i4"), categories=strings(column["categories"])
+                )
+            else:
+                data[column["name"]] = np.array(strings(column["strings"]), dtype=object)
+        tables[table_name] = pd.DataFrame(data, copy=False)
+    return tables, header
+
+
+def main(argv=None):
+    from core.data_loader import compile_snapshot
+
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv:
+        argv = ["data/clean_structured_example.json"]
+    def progress(courses, bytes_read, total_bytes):
+        print(f"  {courses} courses ({bytes_read * 100 // max(total_bytes, 1)}%)")
+
+    for source_path in argv:
+        header = compile_snapshot(source_path, progress=progress)
+        print(f"Wrote {snapshot_path(source_path)} ({header['content_hash'][:12]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,20 @@ import subprocess
 
 def main():
     parser = argparse.ArgumentParser(description='Run the University Course Assistant')
-    parser.add_argument('--mode', choices=['cli', 'web'], default='cli',
-                        help='Run mode: cli (command line interface) or web (Streamlit web interface)')
+    parser.add_argument('--mode', choices=['cli', 'web', 'api'], default='cli',
+                        help='Run mode: cli (command line interface), web (Streamlit web interface) or api (JSON HTTP API)')
+    parser.add_argument('--pipeline', choices=['two-call', 'single-call'],
+                        help='Turn pipeline: two GPT-4 requests per turn, or one conversation using function calling')
+    parser.add_argument('--llm-backend', choices=['openai', 'record', 'replay'],
+                        help='LLM backend: OpenAI, OpenAI while recording a cassette, or offline replay of the cassette')
+    parser.add_argument('--host', help='api mode: interface to listen on')
+    parser.add_argument('--port', help='api mode: port to listen on')
+    parser.add_argument('--workers', help='api mode: worker processes sharing the loaded catalog')
     args = parser.parse_args()
+    if args.pipeline:
+        os.environ['PIPELINE_MODE'] = args.pipeline
+    if args.llm_backend:
+        os.environ['LLM_BACKEND'] = args.llm_backend
 
     # Get the directory of this script
     script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,6 +31,15 @@ def main():
         # Run the CLI version
         print("Starting CLI mode...")
         subprocess.run([sys.executable, "app/main.py"])
+    elif args.mode == 'api':
+        # Run the JSON API; its workers share conversation memory through SQLite
+        print("Starting API server...")
+        os.environ.setdefault('SESSION_BACKEND', 'sqlite')
+        command = [sys.executable, "app/api_server.py"]
+        for option in ('host', 'port', 'workers'):
+            if getattr(args, option):
+                command += [f"--{option}", getattr(args, option)]
+        subprocess.run(command)
     else:
         # Run the Streamlit web app
         print("Starting web interface...")
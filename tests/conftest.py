@@ -0,0 +1,68 @@
+import itertools
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core.data_loader import load_courses  # noqa: E402
+
+EXAMPLE_DATA = os.path.join(ROOT, "data", "clean_structured_example.json")
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    """The example catalog, parsed from JSON (never from a stale snapshot)."""
+    return load_courses(EXAMPLE_DATA, use_snapshot=False)
+
+
+class FakeModel:
+    """
+    Stands in for the OpenAI client registry: numbered replies, a forced
+    call gets its tool, and every request is kept in ``requests``.
+    """
+
+    def __init__(self, intent=None):
+        self.calls = itertools.count(1)
+        self.requests = []
+        self.intent = intent or {"intent": "search", "entities": {"subject": "nursing"}, "user_preferences": {}}
+
+    def client(self, api_key=None):
+        return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self.create)))
+
+    def create(self, **request):
+        self.requests.append(request)
+        n = next(self.calls)
+        usage = SimpleNamespace(prompt_tokens=10, completion_tokens=4, total_tokens=14)
+        tool_choice = request.get("tool_choice")
+        if isinstance(tool_choice, dict):
+            call = SimpleNamespace(id=f"call{n}", type="function",
+                                   function=SimpleNamespace(name=tool_choice["function"]["name"],
+                                                            arguments=json.dumps(self.intent)))
+            message = SimpleNamespace(role="assistant", content=None, tool_calls=[call])
+        else:
+            message = SimpleNamespace(role="assistant", content=f"Reply number {n} about nursing courses", tool_calls=None)
+        if request.get("stream"):
+            words = message.content.split(" ")
+            return iter(
+                [SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=w + " "))], usage=None)
+                 for w in words]
+                + [SimpleNamespace(choices=[], usage=usage)]
+            )
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")], usage=usage)
+
+
+@pytest.fixture
+def fake_llm():
+    """Serve every LLM call from a FakeModel for the duration of a test."""
+    from core import llm
+
+    previous = llm._backend
+    model = FakeModel()
+    llm.set_backend(model)
+    yield model
+    llm.set_backend(previous)
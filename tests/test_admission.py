@@ -0,0 +1,224 @@
+import gc
+import threading
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+
+from core.admission import (
+    PRIORITY_BACKGROUND,
+    PRIORITY_INTERACTIVE,
+    AdmissionController,
+    LLMBusy,
+    TokenBucket,
+    retry_after,
+)
+
+
+class APIError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+def response(prompt_tokens=10, completion_tokens=5):
+    return SimpleNamespace(usage=SimpleNamespace(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+
+
+def controller(**options):
+    options = {"rpm": 0, "tpm": 0, "max_concurrent": 4, "queue_size": 8, **options}
+    return AdmissionController(**options)
+
+
+def wait_until(condition, timeout=5.0):
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "condition not reached"
+        time.sleep(0.005)
+
+
+def test_token_bucket_refills_over_a_minute():
+    bucket = TokenBucket(60)
+    now = bucket.updated
+    assert bucket.wait_time(60, now) == 0.0
+    bucket.take(60)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == 0.0
+    # Refilling stops at capacity
+    assert bucket.wait_time(60, now + 3600) == 0.0
+    assert bucket.level == 60
+
+
+def test_token_bucket_adjusts_to_the_actual_cost():
+    bucket = TokenBucket(600)
+    now = bucket.updated
+    bucket.take(100)
+    bucket.adjust(50)
+    assert bucket.wait_time(1, now) == 0.0
+    assert bucket.level == pytest.approx(450)
+    bucket.adjust(-1000)
+    assert bucket.level == 600
+
+
+def test_disabled_bucket_never_waits():
+    bucket = TokenBucket(0)
+    bucket.take(10 ** 6)
+    assert bucket.wait_time(10 ** 6, time.monotonic()) == 0.0
+
+
+def test_exhausted_token_bucket_times_out():
+    admission = controller(tpm=60)
+    admission.admit(60, PRIORITY_INTERACTIVE, time.monotonic() + 1)
+    admission.release(60)
+    with pytest.raises(LLMBusy) as error:
+        admission.admit(60, PRIORITY_INTERACTIVE, time.monotonic() + 0.1)
+    assert error.value.retry_after > 0.1
+    assert admission.counts["timed_out"] == 1
+
+
+def test_full_queue_is_rejected():
+    admission = controller(max_concurrent=1, queue_size=1)
+    admission.admit(1, PRIORITY_INTERACTIVE, time.monotonic() + 5)
+    waiter = threading.Thread(target=admission.admit, args=(1, PRIORITY_INTERACTIVE, time.monotonic() + 5))
+    waiter.start()
+    wait_until(lambda: admission.stats()["queue_depth"] == 1)
+
+    with pytest.raises(LLMBusy):
+        admission.admit(1, PRIORITY_INTERACTIVE, time.monotonic() + 5)
+    assert admission.counts["rejected"] == 1
+
+    admission.release(1)
+    waiter.join()
+    assert admission.stats()["active"] == 1
+
+
+def test_interactive_calls_are_admitted_before_background():
+    admission = controller(max_concurrent=1)
+    admission.admit(1, PRIORITY_INTERACTIVE, time.monotonic() + 5)
+    order = []
+
+    def run(name, priority):
+        admission.admit(1, priority, time.monotonic() + 5)
+        order.append(name)
+        admission.release(1)
+
+    background = threading.Thread(target=run, args=("background", PRIORITY_BACKGROUND))
+    background.start()
+    wait_until(lambda: admission.stats()["queue_depth"] == 1)
+    interactive = threading.Thread(target=run, args=("interactive", PRIORITY_INTERACTIVE))
+    interactive.start()
+    wait_until(lambda: admission.stats()["queue_depth"] == 2)
+
+    admission.release(1)
+    background.join()
+    interactive.join()
+    assert order == ["interactive", "background"]
+    assert admission.stats()["max_queue_depth"] == 2
+
+
+def test_rate_limited_call_is_retried():
+    admission = controller()
+    errors = [APIError(429, {"retry-after-ms": "10"}), APIError(503, {"retry-after-ms": "10"})]
+
+    def create(**request):
+        if errors:
+            raise errors.pop(0)
+        return response()
+
+    assert admission.call(create, {"messages": [{"role": "user", "content": "hi"}]}) is not None
+    assert admission.counts["retries"] == 2
+    assert admission.counts["rate_limited"] == 1
+    assert admission.stats()["active"] == 0
+
+
+def test_other_errors_are_not_retried():
+    admission = controller()
+
+    def create(**request):
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        admission.call(create, {"messages": []})
+    assert admission.counts["retries"] == 0
+    assert admission.stats()["active"] == 0
+
+
+def test_persistent_rate_limit_is_busy():
+    admission = controller(max_retries=1)
+
+    def create(**request):
+        raise APIError(429, {"retry-after-ms": "1"})
+
+    with pytest.raises(LLMBusy):
+        admission.call(create, {"messages": []})
+    assert admission.counts["busy"] == 1
+    assert admission.stats()["active"] == 0
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({"retry-after": "2"}, 2.0),
+    ({"retry-after": "600"}, 60.0),
+    ({"retry-after-ms": "1500"}, 1.5),
+    ({"retry-after": "soon"}, None),
+    ({}, None),
+])
+def test_retry_after(headers, expected):
+    assert retry_after(APIError(429, headers)) == expected
+
+
+def test_retry_after_http_date():
+    seconds = retry_after(APIError(429, {"retry-after": formatdate(time.time() + 30, usegmt=True)}))
+    assert 25 <= seconds <= 30
+
+
+def test_streamed_call_holds_its_slot_until_exhausted():
+    admission = controller()
+    chunks = [SimpleNamespace(usage=None), SimpleNamespace(usage=response().usage)]
+    stream = admission.call(lambda **request: iter(chunks), {"messages": [], "stream": True})
+    assert admission.stats()["active"] == 1
+    assert list(stream) == chunks
+    assert admission.stats()["active"] == 0
+
+
+def test_abandoned_stream_releases_its_slot():
+    admission = controller()
+    closed = []
+
+    class Response:
+        def __iter__(self):
+            return iter([SimpleNamespace(usage=None)])
+
+        def close(self):
+            closed.append(True)
+
+    stream = admission.call(lambda **request: Response(), {"messages": [], "stream": True})
+    assert admission.stats()["active"] == 1
+    del stream
+    gc.collect()
+    assert admission.stats()["active"] == 0
+    assert closed == [True]
+
+
+def test_closed_stream_releases_once():
+    admission = controller()
+    stream = admission.call(lambda **request: iter([]), {"messages": [], "stream": True})
+    stream.close()
+    stream.close()
+    assert list(stream) == []
+    assert admission.stats()["active"] == 0
+
+
+def test_unreadable_stream_releases_its_slot():
+    admission = controller()
+    with pytest.raises(TypeError):
+        admission.call(lambda **request: object(), {"messages": [], "stream": True})
+    assert admission.stats()["active"] == 0
+
+
+def test_client_wraps_completions():
+    admission = controller()
+    inner = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=lambda **request: response())))
+    assert admission.client(inner).chat.completions.create(messages=[]).usage.prompt_tokens == 10
+    assert admission.counts["admitted"] == 1
@@ -0,0 +1,119 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("dotenv")
+
+from aiohttp.test_utils import TestClient, TestServer  # noqa: E402
+
+from app import api_server  # noqa: E402
+from core.admission import LLMBusy  # noqa: E402
+from core.pipeline import mark_busy, new_result  # noqa: E402
+
+
+def call(catalog, method, path, prepare=None, **kwargs):
+    """Send one request to a fresh app; ``prepare(app)`` runs once it has started."""
+    async def go():
+        async with TestClient(TestServer(api_server.create_app(catalog))) as client:
+            if prepare is not None:
+                await prepare(client.server.app)
+            response = await client.request(method, path, **kwargs)
+            return response.status, response.headers, await response.text()
+    return asyncio.run(go())
+
+
+def test_search_by_query(catalog):
+    status, _, text = call(catalog, "GET", "/search", params={"q": "psychology courses", "limit": "3"})
+    body = json.loads(text)
+    assert status == 200
+    assert body["intent"]["entities"] == {"subject": "psychology"}
+    assert len(body["courses"]) == 3
+    course = body["courses"][0]
+    assert {"row_id", "course_id", "score", "name", "university", "fee", "entry_requirements"} <= set(course)
+    assert "Psychology" in course["name"]
+
+
+def test_search_by_entities(catalog):
+    status, _, text = call(catalog, "POST", "/search", json={"entities": {"university": "Leicester"}, "limit": 100})
+    body = json.loads(text)
+    assert status == 200
+    assert body["confidence"] == 1.0
+    assert 0 < len(body["courses"]) <= api_server.SEARCH_MAX_RESULTS
+    assert all(course["university"] == "University of Leicester" for course in body["courses"])
+
+
+@pytest.mark.parametrize("method, path, kwargs, message", [
+    ("GET", "/search", {}, "q, entities or user_preferences is required"),
+    ("GET", "/search", {"params": {"q": "law", "limit": "ten"}}, "limit must be an integer"),
+    ("POST", "/search", {"data": "not json", "headers": {"Content-Type": "application/json"}},
+     "Request body must be JSON"),
+    ("POST", "/chat", {"json": ["hello"]}, "Request body must be a JSON object"),
+    ("POST", "/chat", {"json": {"message": "  "}}, "message is required"),
+    ("POST", "/chat", {"json": {"message": "x" * (api_server.MAX_MESSAGE_CHARS + 1)}},
+     f"message is longer than {api_server.MAX_MESSAGE_CHARS} characters"),
+    ("POST", "/chat", {"json": {"message": "hello", "pipeline": "three-call"}},
+     "pipeline must be one of two-call, single-call"),
+])
+def test_bad_requests(catalog, method, path, kwargs, message):
+    status, _, text = call(catalog, method, path, **kwargs)
+    assert status == 400
+    assert json.loads(text) == {"error": message}
+
+
+def test_chat_answers_and_returns_the_session(catalog, fake_llm):
+    status, _, text = call(catalog, "POST", "/chat", json={"message": "psychology courses", "session_id": "api-1"})
+    body = json.loads(text)
+    assert status == 200
+    assert body["session_id"] == "api-1"
+    assert body["reply"].startswith("Reply number")
+    assert body["intent"]["entities"] == {"subject": "psychology"}
+    assert body["courses"] and body["usage"]["calls"] == 1
+    assert body["busy"] is False
+
+
+def test_chat_streams_ndjson(catalog, fake_llm):
+    status, headers, text = call(catalog, "POST", "/chat", json={"message": "psychology courses", "stream": True})
+    lines = [json.loads(line) for line in text.splitlines()]
+    assert status == 200
+    assert headers["Content-Type"] == "application/x-ndjson"
+    assert lines[-1]["done"] is True
+    assert "".join(line["chunk"] for line in lines[:-1]) == lines[-1]["reply"]
+    assert lines[-1]["session_id"]
+
+
+def test_chat_reports_a_busy_llm(catalog, monkeypatch):
+    async def busy_turn(message, catalog, **options):
+        turn = new_result(catalog, "two-call")
+        mark_busy(turn, LLMBusy("rate limited", retry_after=2.4))
+        return turn
+
+    monkeypatch.setattr(api_server, "run_turn_async", busy_turn)
+    status, headers, text = call(catalog, "POST", "/chat", json={"message": "psychology courses"})
+    assert status == 503
+    assert headers["Retry-After"] == "2"
+    assert json.loads(text)["busy"] is True
+
+
+def test_full_queue_gets_503(catalog):
+    async def saturate(app):
+        limiter = api_server.ConcurrencyLimiter(1, max_waiting=0, timeout=0.1)
+        await limiter._semaphore.acquire()
+        app["search_limiter"] = limiter
+
+    status, headers, text = call(catalog, "GET", "/search", prepare=saturate, params={"q": "law"})
+    assert status == 503
+    assert headers["Retry-After"] == "1"
+    assert json.loads(text) == {"error": "Server busy, retry shortly"}
+
+
+def test_health_and_metrics(catalog):
+    status, _, text = call(catalog, "GET", "/health")
+    assert status == 200
+    assert json.loads(text)["study_options"] == len(catalog)
+
+    status, _, text = call(catalog, "GET", "/metrics")
+    metrics = json.loads(text)
+    assert status == 200
+    assert {"http", "turns", "searches", "intent_cache", "filter_cache", "llm_admission"} <= set(metrics)
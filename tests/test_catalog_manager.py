@@ -0,0 +1,81 @@
+import json
+import shutil
+
+import pytest
+
+from core.catalog_manager import CatalogManager
+from core.data_loader import load_courses
+
+from tests.conftest import EXAMPLE_DATA
+
+
+def load_json(path):
+    return load_courses(path, use_snapshot=False)
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "courses.json"
+    shutil.copy(EXAMPLE_DATA, path)
+    return path
+
+
+def drop_courses(path, keep):
+    with open(path) as f:
+        data = json.load(f)
+    with open(path, "w") as f:
+        json.dump([course for course in data if keep(course)], f)
+
+
+def test_reload_swaps_in_a_new_catalog(data_file):
+    manager = CatalogManager(str(data_file), loader=load_json).start(watch=False)
+    swapped = []
+    manager.subscribe(swapped.append)
+    old = manager.catalog
+
+    drop_courses(data_file, lambda course: "science" not in course["name"].lower())
+    assert manager.reload()
+
+    assert manager.catalog is not old
+    assert manager.version != old.version
+    assert len(manager.catalog) < len(old)
+    assert swapped == [manager.catalog]
+    assert manager.reload_count == 1
+    # The catalog handed out before the swap is left untouched
+    assert old.name_index.search("science").size
+
+
+def test_reload_of_unchanged_data_keeps_the_catalog(data_file):
+    manager = CatalogManager(str(data_file), loader=load_json).start(watch=False)
+    catalog = manager.catalog
+    assert not manager.reload()
+    assert manager.catalog is catalog
+
+
+def test_failed_reload_keeps_the_old_catalog(data_file):
+    manager = CatalogManager(str(data_file), loader=load_json).start(watch=False)
+    catalog = manager.catalog
+    data_file.write_text("[{")
+    assert not manager.reload()
+    assert manager.catalog is catalog
+    assert isinstance(manager.last_error, ValueError)
+
+
+def test_failing_listener_does_not_stop_the_swap(data_file):
+    manager = CatalogManager(str(data_file), loader=load_json).start(watch=False)
+    seen = []
+    manager.subscribe(lambda catalog: 1 / 0)
+    manager.subscribe(seen.append)
+    drop_courses(data_file, lambda course: course["university"] != "University of Leicester")
+    assert manager.reload()
+    assert seen == [manager.catalog]
+
+
+def test_burst_of_changes_reloads_once(data_file, monkeypatch):
+    manager = CatalogManager(str(data_file), loader=load_json, debounce=0.05)
+    reloads = []
+    monkeypatch.setattr(manager, "reload", lambda: reloads.append(1))
+    for _ in range(5):
+        manager.schedule_reload()
+    manager._timer.join()
+    assert reloads == [1]
@@ -0,0 +1,65 @@
+import json
+
+import pytest
+
+from core.context_encoder import COLUMNS, compact_json, encode_courses
+from core.history import count_tokens
+from core.pipeline import run_turn
+
+COURSES = [
+    {"name": f"Nursing {i}", "university": "University of Leicester" if i % 2 else "Liverpool Hope University",
+     "study_mode": "FULL_TIME", "duration": "3 years", "fee": "£9,250 per year", "campus": "Main Site",
+     "entry_requirements": ["UCAS Tariff: 112", "Scottish Higher: "], "url": "https://example.ac.uk/nursing"}
+    for i in range(10)
+]
+
+
+def test_rows_share_one_header_and_legend():
+    text, tokens, count = encode_courses(COURSES, budget=10_000)
+    lines = text.splitlines()
+    assert count == len(COURSES)
+    assert tokens == count_tokens(text)
+    assert "university: U1=Liverpool Hope University, U2=University of Leicester" in lines
+    assert "fee: F1=£9,250 per year" in lines
+    assert lines.count("#|" + "|".join(COLUMNS)) == 1
+    assert lines[-1] == "10|Nursing 9|U2|FULL_TIME|3 years|F1|Main Site|=#1|=#1"
+    assert "Scottish Higher" not in text
+
+
+def test_compact_encoding_is_smaller_than_json():
+    text, tokens, _ = encode_courses(COURSES, budget=10_000)
+    assert tokens < count_tokens(json.dumps(COURSES, indent=2)) / 2
+
+
+@pytest.mark.parametrize("budget", [80, 120, 170])
+def test_encoding_stops_at_the_budget(budget):
+    text, tokens, count = encode_courses(COURSES, budget=budget)
+    assert 0 < count < len(COURSES)
+    assert tokens <= budget
+    assert encode_courses(COURSES[:count + 1], budget=budget)[2] == count
+
+
+def test_nothing_fits():
+    assert encode_courses(COURSES, budget=1)[::2] == ("(no matching courses)", 0)
+    assert encode_courses([], budget=1000)[2] == 0
+
+
+def test_compact_json_drops_empty_fields():
+    assert compact_json({"intent": "search", "entities": {}, "clarification_needed": None}) == '{"intent":"search"}'
+
+
+@pytest.mark.parametrize("query", ["hello", "thanks, bye", "what can you do?"])
+def test_small_talk_sends_no_course_context(catalog, fake_llm, query):
+    result = run_turn(query, catalog, [], cache=None)
+    (request,) = fake_llm.requests
+    assert "Available courses" not in request["messages"][0]["content"]
+    assert result["usage"]["context_courses"] == result["usage"]["context_tokens"] == 0
+    assert result["matched"].empty
+
+
+def test_search_sends_course_context(catalog, fake_llm):
+    result = run_turn("psychology courses", catalog, [], cache=None)
+    prompt = fake_llm.requests[0]["messages"][0]["content"]
+    assert "Available courses" in prompt
+    assert 0 < result["usage"]["context_courses"] == len(result["matched"])
+    assert all(name in prompt for name in result["matched"]["name"])
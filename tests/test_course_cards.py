@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.context_encoder import encode_courses
+from core.course_cards import LLM_FEE_MISSING, CourseCards, region_fees
+from core.response_generator import course_summaries
+from utils.formatter import FEE_NOT_AVAILABLE, fee_text, format_course_details, format_course_list, requirement_text
+
+
+@pytest.fixture(scope="module")
+def frame(catalog):
+    return catalog.select(range(len(catalog)))
+
+
+@pytest.mark.parametrize("price, period, expected", [
+    (9250.0, "Year 1", "£9,250 per Year 1"),
+    (9250, None, "£9,250 per year"),
+    (1_250_000.0, "year", "£1,250,000 per year"),
+    (1234.5, "Module", "£1,234.50 per Module"),
+    (99.99, "Module", "£99.99 per Module"),
+    (0.0, "year", "£0 per year"),
+    (None, "year", FEE_NOT_AVAILABLE),
+    (np.nan, "year", FEE_NOT_AVAILABLE),
+])
+def test_fee_text(price, period, expected):
+    assert fee_text(price, period) == expected
+
+
+def test_fee_text_custom_missing():
+    assert fee_text(float("nan"), None, LLM_FEE_MISSING) == LLM_FEE_MISSING
+
+
+@pytest.mark.parametrize("req_type, min_entry, expected", [
+    ("UCAS Tariff", "112", "UCAS Tariff: 112 points"),
+    ("A level", "BBC", "A level: BBC"),
+    ("Access to HE Diploma", None, "Access to HE Diploma: N/A"),
+])
+def test_requirement_text(req_type, min_entry, expected):
+    assert requirement_text(req_type, min_entry) == expected
+
+
+def test_region_fees_takes_the_last_priced_row():
+    fees = pd.DataFrame({
+        "option_key": [0, 0, 1, 1, 2],
+        "region": ["England", "England", "England", "Wales", "Wales"],
+        "price": [1000.0, 2000.0, np.nan, 3000.0, 4000.0],
+        "period": ["year", "Year 1", "year", "year", "year"],
+    })
+    prices, periods = region_fees(fees, "England", 3)
+    assert prices[0] == 2000.0 and periods[0] == "Year 1"
+    assert np.isnan(prices[1:]).all()
+    assert list(periods[1:]) == [None, None]
+
+
+def test_llm_cards_match_row_by_row_summaries(catalog, frame):
+    # Compared as sent to the model, where missing values are "-" whether None or NaN
+    from_cards = encode_courses(course_summaries(frame, catalog.cards), budget=1_000_000)
+    assert from_cards == encode_courses(course_summaries(frame), budget=1_000_000)
+
+
+def test_markdown_cards_match_row_by_row_formatting(catalog, frame):
+    courses = frame.to_dict("records")
+    assert list(catalog.cards.markdown) == [format_course_details(course) for course in courses]
+    assert format_course_list(courses, catalog.cards) == format_course_list(courses)
+
+
+def test_cards_quote_the_fee_region(catalog):
+    cards = CourseCards.build(catalog, "International")
+    international = region_fees(catalog.fees, "International", len(catalog))[0]
+    row = int(np.flatnonzero(~np.isnan(international))[0])
+    assert len(cards) == len(catalog)
+    assert cards.llm[row]["fee"] == fee_text(international[row], cards.llm[row]["fee"].split(" per ", 1)[1])
+    assert cards.llm[row]["fee"] in cards.markdown[row]
+    missing = int(np.flatnonzero(np.isnan(international))[0])
+    assert cards.llm[missing]["fee"] == LLM_FEE_MISSING
+    assert FEE_NOT_AVAILABLE in cards.markdown[missing]
+
+
+def test_empty_course_list():
+    assert format_course_list([]) == "No courses found matching your criteria."
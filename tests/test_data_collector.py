@@ -0,0 +1,143 @@
+import asyncio
+import json
+import os
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("dotenv")
+pytest.importorskip("tqdm")
+
+from utils.data_collector import (  # noqa: E402
+    CrawlJournal, EducationDataCollector, ResponseCache, listing_digest, request_key,
+)
+
+
+class FakeResponse:
+    def __init__(self, status, body):
+        self.status = status
+        self.body = body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def json(self):
+        return self.body
+
+
+class FakeAPI:
+    """One university with the given course listings; ``failing`` course slugs get a 500."""
+
+    def __init__(self, listings, failing=()):
+        self.listings = listings
+        self.failing = set(failing)
+        self.posts = []
+
+    def post(self, url, json):
+        variables = json["variables"]
+        if "product" in variables:
+            self.posts.append("universities")
+            body = {"data": {"universities": {"data": [{"slug": "uni", "name": "Uni"}], "has_more_pages": False}}}
+        elif "slug" in variables:
+            self.posts.append("courses")
+            listings = [dict(listing) for listing in self.listings]
+            body = {"data": {"universityCourses": {"courses": {"data": listings, "has_more_pages": False}}}}
+        else:
+            slug = variables["courseSlug"]
+            self.posts.append(slug)
+            if slug in self.failing:
+                return FakeResponse(500, None)
+            body = {"data": {"course": {"slug": slug, "name": slug.title(), "options": []}}}
+        return FakeResponse(200, body)
+
+
+def listing(slug, year=2025):
+    return {"slug": slug, "name": slug.title(), "year": year, "location": "Town", "study_mode": "FULL_TIME",
+            "min_ucas_tariff": 96, "max_ucas_tariff": 120}
+
+
+def crawl(tmp_path, api, refresh=False):
+    async def run():
+        collector = EducationDataCollector(
+            refresh=refresh, cache_dir=str(tmp_path / "cache"), journal_path=str(tmp_path / "journal.jsonl")
+        )
+        collector.session = api
+        collector.semaphore = asyncio.Semaphore(4)
+        try:
+            await collector.fetch_all_data()
+        finally:
+            collector.journal.close()
+        return collector
+    return asyncio.run(run())
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    # save_data writes under ./data
+    monkeypatch.chdir(tmp_path)
+
+
+def test_failed_crawl_resumes_from_the_journal(tmp_path):
+    first = crawl(tmp_path, FakeAPI([listing("law"), listing("music")], failing={"music"}))
+    assert first.failures == 1
+    assert CrawlJournal(str(tmp_path / "journal.jsonl")).resumable("full")
+
+    api = FakeAPI([listing("law"), listing("music")])
+    resumed = crawl(tmp_path, api)
+    assert api.posts == ["music"]
+    assert resumed.stats == {"cached": 3, "fetched": 1}
+    assert set(resumed.course_details) == {"law", "music"}
+    with open(tmp_path / "data" / "structured_dataset.json") as f:
+        assert {course["slug"] for course in json.load(f)} == {"law", "music"}
+
+    # The crawl is now finished, so the next one fetches everything again
+    assert not CrawlJournal(str(tmp_path / "journal.jsonl")).resumable("full")
+    api = FakeAPI([listing("law"), listing("music")])
+    crawl(tmp_path, api)
+    assert sorted(api.posts) == ["courses", "law", "music", "universities"]
+
+
+def test_refresh_refetches_only_changed_listings(tmp_path):
+    crawl(tmp_path, FakeAPI([listing("law"), listing("music")]))
+
+    api = FakeAPI([listing("law"), listing("music", year=2026), listing("history")])
+    refreshed = crawl(tmp_path, api, refresh=True)
+    assert sorted(api.posts) == ["courses", "history", "music", "universities"]
+    assert refreshed.stats["cached"] == 1
+    assert set(refreshed.course_details) == {"law", "music", "history"}
+
+
+def test_response_cache_stores_identical_bodies_once(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache"))
+    body = {"data": {"course": None}}
+    cache.put(request_key("query a", {"x": 1}), body)
+    cache.put(request_key("query   a", {"x": 2}), body)
+    assert cache.get(request_key("query a", {"x": 1})) == body
+    assert cache.get(request_key("query a", {"x": 2})) == body
+    assert cache.get(request_key("query b", {})) is None
+    objects = [name for _, _, names in os.walk(tmp_path / "cache" / "objects") for name in names]
+    assert len(objects) == 1
+
+
+def test_journal_survives_a_torn_line_and_compacts(tmp_path):
+    path = str(tmp_path / "journal.jsonl")
+    journal = CrawlJournal(path)
+    journal.start("full")
+    journal.record_request("a")
+    journal.record(listing("law"))
+    journal.finish()
+    journal.start("full")
+    journal.record_request("b")
+    journal.close()
+    with open(path, "a") as f:
+        f.write('{"request": "c"')  # cut short by a crash
+
+    reopened = CrawlJournal(path)
+    assert reopened.resumable("full") and not reopened.resumable("refresh")
+    assert reopened.requests == {"b"}
+    assert reopened.courses == {"law": listing_digest(listing("law"))}
+    with open(path) as f:
+        assert len(f.readlines()) == 3
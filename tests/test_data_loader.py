@@ -0,0 +1,96 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.catalog_manager import CatalogManager
+from core.data_loader import build_catalog, iter_json_array, stream_courses
+
+from tests.conftest import EXAMPLE_DATA
+
+
+class CountingReader(io.StringIO):
+    def __init__(self, text):
+        super().__init__(text)
+        self.reads = 0
+
+    def read(self, size=-1):
+        self.reads += 1
+        return super().read(size)
+
+
+def parse(text, read_size=7):
+    return list(iter_json_array(io.StringIO(text), read_size=read_size))
+
+
+@pytest.mark.parametrize("value", [
+    [],
+    [1, 22, 333, -4.5e3, True, False, None],
+    ["a", "with ] and } inside", 'escaped \\" quote', "back\\\\slash\\\\", "unicode é ✓"],
+    [{"a": [1, {"b": "]"}]}, [[], {}], {"nested": {"deep": [1, [2, [3]]]}}],
+])
+@pytest.mark.parametrize("read_size", [1, 3, 7, 1 << 16])
+def test_iter_json_array_matches_json(value, read_size):
+    text = json.dumps(value, indent=2)
+    assert parse(text, read_size) == value
+
+
+def test_iter_json_array_splits_numbers_across_reads():
+    assert parse("[123456789, 987654321]", read_size=4) == [123456789, 987654321]
+
+
+@pytest.mark.parametrize("text", ["[1,,2]", "[,1]", "[1,]", "[1 2]", "[1, 2", '["open', "{}", "", "[{]"])
+def test_iter_json_array_rejects_malformed_input(text):
+    with pytest.raises(ValueError):
+        parse(text)
+
+
+def test_large_element_is_read_in_growing_chunks():
+    element = {"overview": "x" * 1_000_000, "items": list(range(1000))}
+    f = CountingReader(json.dumps([element, element]))
+    assert list(iter_json_array(f, read_size=64)) == [element, element]
+    assert f.reads < 64
+
+
+def test_stream_courses_matches_build_catalog():
+    with open(EXAMPLE_DATA) as f:
+        expected = build_catalog(json.load(f)).tables()
+    streamed = stream_courses(EXAMPLE_DATA, chunk_size=7).tables()
+    for name, df in expected.items():
+        pd.testing.assert_frame_equal(streamed[name], df)
+
+
+def test_stream_courses_reports_progress():
+    reports = []
+    catalog = stream_courses(EXAMPLE_DATA, progress=lambda *report: reports.append(report), progress_every=40)
+    courses = len(catalog.courses)
+    assert [report[0] for report in reports] == [40, 80, courses]
+    assert reports[-1][1] == reports[-1][2]
+
+
+def test_memory_ceiling_aborts_the_load():
+    with pytest.raises(MemoryError):
+        stream_courses(EXAMPLE_DATA, max_memory_mb=0.01)
+
+
+def test_catalog_manager_passes_the_memory_ceiling(monkeypatch):
+    calls = []
+
+    def loader(path, **options):
+        calls.append(options)
+        return stream_courses(path, **options)
+
+    CatalogManager(EXAMPLE_DATA, loader=loader, max_memory_mb=64).start(watch=False)
+    CatalogManager(EXAMPLE_DATA, loader=loader, max_memory_mb=None).start(watch=False)
+    assert calls == [{"max_memory_mb": 64}, {}]
+    with pytest.raises(MemoryError):
+        CatalogManager(EXAMPLE_DATA, loader=loader, max_memory_mb=0.01).start(watch=False)
+
+
+def test_missing_values_use_markers(catalog):
+    options = catalog.options
+    assert options["ucas_min"].dtype == np.int32
+    assert (options["ucas_min"] == -1).any()
+    assert options["fee_england"].isna().any()
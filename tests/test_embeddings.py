@@ -0,0 +1,89 @@
+import shutil
+
+import numpy as np
+import pytest
+
+from core import embeddings
+from core.course_filter import filter_courses
+from core.data_loader import load_courses
+
+from tests.conftest import EXAMPLE_DATA
+
+pytest.importorskip("sklearn")
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "courses.json"
+    shutil.copy(EXAMPLE_DATA, path)
+    return str(path)
+
+
+def build(data_file, int8=False):
+    catalog = load_courses(data_file, use_snapshot=False)
+    embeddings.build_embedding_index(catalog, embeddings.embeddings_path(data_file), int8=int8)
+    return load_courses(data_file, use_snapshot=False)
+
+
+def test_hashing_encoder_relates_shared_stems():
+    encoder = embeddings.HashingEncoder(dim=256).fit(["Robotics BEng", "Nursing (Adult) BSc", "Music BA"])
+    vectors = encoder.encode(["robots", "Robotics BEng", "Nursing (Adult) BSc", ""])
+    assert vectors.shape == (4, 256)
+    assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+    assert not vectors[3].any()
+    assert vectors[0] @ vectors[1] > vectors[0] @ vectors[2]
+
+
+def test_hashing_encoder_round_trips_its_params():
+    encoder = embeddings.HashingEncoder(dim=64).fit(["Mathematics", "Physics"])
+    restored = embeddings.get_encoder("hashing", **encoder.params())
+    texts = ["maths", "physics degree"]
+    assert np.allclose(restored.encode(texts), encoder.encode(texts), atol=1e-3)
+
+
+def test_int8_quantization_round_trip():
+    matrix = np.random.default_rng(0).normal(size=(50, 32)).astype(np.float32)
+    matrix[3] = 0
+    quantized, scales = embeddings.quantize(matrix)
+    assert quantized.dtype == np.int8
+    restored = quantized.astype(np.float32) * scales[:, None]
+    assert np.abs(restored - matrix).max() <= scales.max() / 2 + 1e-6
+    assert not restored[3].any()
+
+
+def test_int8_index_scores_like_float32(data_file):
+    queries = ["psychologist", "music industry"]
+    exact = build(data_file).embedding_index.similarities(queries)
+    index = build(data_file, int8=True).embedding_index
+    assert index.matrix.dtype == np.int8
+    assert np.allclose(index.similarities(queries), exact, atol=0.02)
+    assert [k for k, _ in index.search(queries, k=3)[0]] == np.argsort(-exact[0], kind="stable")[:3].tolist()
+
+
+def test_stale_embeddings_are_ignored(data_file):
+    build(data_file)
+    with open(data_file) as f:
+        text = f.read()
+    with open(data_file, "w") as f:
+        f.write(text.replace("Psychology", "Psychological Science", 1))
+    assert load_courses(data_file, use_snapshot=False).embedding_index is None
+
+
+def test_subject_without_text_match_falls_back_to_embeddings(data_file):
+    parsed = {"intent": "search", "entities": {"subject": "musician"}, "user_preferences": {}}
+    assert filter_courses(parsed, load_courses(data_file, use_snapshot=False), cache=None).empty
+
+    result = filter_courses(parsed, build(data_file), cache=None)
+    assert not result.empty
+    assert result["name"].str.contains("Music").all()
+
+
+def test_model_is_rejected_for_the_hashing_encoder(data_file, capsys):
+    with pytest.raises(SystemExit):
+        embeddings.main([data_file, "--encoder", "hashing", "--model", "all-MiniLM-L6-v2"])
+    assert "--model" in capsys.readouterr().err
+
+
+def test_main_writes_the_index(data_file):
+    embeddings.main([data_file, "--int8"])
+    assert load_courses(data_file, use_snapshot=False).embedding_index.matrix.dtype == np.int8
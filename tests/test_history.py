@@ -0,0 +1,77 @@
+import pytest
+
+from core import history as history_module
+from core.history import (
+    HISTORY_KEEP_TURNS, MESSAGE_OVERHEAD_TOKENS, History, compact_state, count_tokens, fold_old_turns,
+    history_messages,
+)
+
+
+def turns(n, words=20):
+    return [{"user": f"question {i} " + "word " * words, "ai": f"answer {i} " + "word " * words} for i in range(n)]
+
+
+def cost(messages):
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+
+
+@pytest.mark.parametrize("budget", [0, 50, 120, 300, 10_000])
+def test_history_fits_the_token_budget(budget):
+    messages = history_messages(History(turns(HISTORY_KEEP_TURNS)), budget)
+    assert cost(messages) <= budget
+    kept = len(messages) // 2
+    # The newest turns are kept, replayed oldest first
+    expected = turns(HISTORY_KEEP_TURNS)[HISTORY_KEEP_TURNS - kept:]
+    assert messages == [m for t in expected for m in ({"role": "user", "content": t["user"]},
+                                                      {"role": "assistant", "content": t["ai"]})]
+
+
+def test_history_keeps_only_the_verbatim_window():
+    messages = history_messages(History(turns(HISTORY_KEEP_TURNS + 4, words=1)), 10_000)
+    assert len(messages) == 2 * HISTORY_KEEP_TURNS
+    assert messages[0]["content"].startswith("question 4 ")
+
+
+def test_state_and_summary_come_first_and_count_against_the_budget():
+    memory = {"last_subject": "law", "last_ucas": 120, "last_courses": list(range(20))}
+    history = History(turns(3), summary="The student wants law in London.", state=compact_state(memory))
+    messages = history_messages(history, 10_000)
+    assert messages[0]["role"] == "system"
+    assert '"subject":"law"' in messages[0]["content"]
+    assert "law in London" in messages[0]["content"]
+    assert len(compact_state(memory)["shortlisted_course_ids"]) == history_module.STATE_MAX_COURSES
+
+    budget = cost(messages[:1]) + 1
+    assert history_messages(history, budget) == messages[:1]
+
+
+def test_count_tokens_without_tiktoken(monkeypatch):
+    monkeypatch.setattr(history_module, "_encoding", False)
+    assert count_tokens("") == 0
+    assert count_tokens("abcdefgh") == 2
+    assert count_tokens(None) == 0
+
+
+def test_fold_old_turns_summarizes_the_oldest(fake_llm):
+    memory = {"turns": turns(HISTORY_KEEP_TURNS + 2), "summary": ""}
+    assert fold_old_turns(memory)
+    assert memory["summary"].startswith("Reply number 1")
+    assert len(memory["turns"]) == HISTORY_KEEP_TURNS
+    assert memory["turns"][0]["user"].startswith("question 2 ")
+    assert "question 1 " in fake_llm.requests[0]["messages"][-1]["content"]
+
+
+def test_fold_waits_for_a_full_batch(fake_llm):
+    memory = {"turns": turns(HISTORY_KEEP_TURNS + 1), "summary": ""}
+    assert not fold_old_turns(memory)
+    assert fake_llm.requests == []
+
+
+def test_failed_fold_keeps_the_turns(fake_llm, monkeypatch):
+    def broken(**request):
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(fake_llm, "create", broken)
+    memory = {"turns": turns(HISTORY_KEEP_TURNS + 2), "summary": "before"}
+    assert not fold_old_turns(memory)
+    assert (len(memory["turns"]), memory["summary"]) == (HISTORY_KEEP_TURNS + 2, "before")
@@ -0,0 +1,88 @@
+import copy
+import importlib
+
+from config import gpt_prompt_templates
+from core import intent_cache as intent_cache_module
+from core import intent_parser
+from core.intent_cache import IntentCache, cache_key as intent_key
+
+
+def test_intent_cache_round_trip_through_disk(tmp_path):
+    path = str(tmp_path / "intents.sqlite3")
+    parsed = {"intent": "search", "entities": {"subject": "law"}, "user_preferences": {}}
+    key = intent_key("law courses in London")
+    IntentCache(path).put(key, parsed)
+
+    cache = IntentCache(path)
+    assert cache.get(key) == parsed
+    assert cache.get(key) == parsed
+    assert (cache.disk_hits, cache.memory_hits) == (1, 1)
+
+
+def test_intent_cache_returns_copies():
+    cache = IntentCache(path=None)
+    cache.put("key", {"entities": {"subject": "law"}})
+    cache.get("key")["entities"]["subject"] = "changed"
+    assert cache.get("key") == {"entities": {"subject": "law"}}
+
+
+def test_intent_cache_expires_after_ttl(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(intent_cache_module.time, "time", lambda: now[0])
+    cache = IntentCache(str(tmp_path / "intents.sqlite3"), ttl=60)
+    cache.put("key", {"intent": "search"})
+    now[0] += 61
+    assert cache.get("key") is None
+    assert cache.misses == 1
+
+
+def test_intent_cache_trims_disk_to_max_entries(tmp_path):
+    cache = IntentCache(str(tmp_path / "intents.sqlite3"), disk_entries=2)
+    for i in range(4):
+        cache.put(f"key{i}", {"n": i})
+    (rows,) = cache._connection().execute("SELECT COUNT(*) FROM intent_cache").fetchone()
+    assert rows == 2
+
+
+def test_intent_key_depends_on_history_prompt_and_model(monkeypatch):
+    history = [{"user": "nursing courses", "ai": "Here are some nursing courses"}]
+    assert intent_key("What about part-time?") == intent_key("  what about  PART-TIME? ")
+    assert intent_key("What about part-time?") != intent_key("What about part-time?", history)
+    assert intent_key("hello", model="gpt-4") != intent_key("hello", model="gpt-4o")
+    before = intent_key("hello")
+    monkeypatch.setattr(intent_cache_module, "PROMPT_DIGEST", "changed")
+    assert intent_key("hello") != before
+
+
+def test_intent_key_does_not_depend_on_the_catalog(catalog, monkeypatch):
+    # Parses are made from the message and conversation alone, so a catalog
+    # reload keeps them; catalog-dependent results live in the FilterCache.
+    before = intent_key("nursing at Leicester")
+    monkeypatch.setattr(catalog, "version", "reloaded")
+    assert intent_key("nursing at Leicester") == before
+
+
+def test_prompt_digest_covers_the_intent_tool_schema(monkeypatch):
+    before = intent_cache_module.PROMPT_DIGEST
+    tool = copy.deepcopy(gpt_prompt_templates.INTENT_TOOL)
+    tool["function"]["description"] += " (changed)"
+    monkeypatch.setattr(gpt_prompt_templates, "INTENT_TOOL", tool)
+    try:
+        assert importlib.reload(intent_cache_module).PROMPT_DIGEST != before
+    finally:
+        monkeypatch.undo()
+        importlib.reload(intent_cache_module)
+    assert intent_cache_module.PROMPT_DIGEST == before
+
+
+def test_parse_intent_keys_the_cache_on_the_chat_model(monkeypatch):
+    parsed = {"intent": "search", "entities": {"subject": "law"}, "user_preferences": {}}
+    cache = IntentCache(path=None)
+    cache.put(intent_key("law please", model="another-model"), parsed)
+
+    def no_llm(api_key=None):
+        raise AssertionError("the LLM should not be called")
+
+    monkeypatch.setattr(intent_parser, "get_client", no_llm)
+    monkeypatch.setattr(intent_parser, "CHAT_MODEL", "another-model")
+    assert intent_parser.parse_intent("law please", cache=cache, classifier=None) == parsed
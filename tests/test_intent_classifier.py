@@ -0,0 +1,84 @@
+import pytest
+
+from core.intent_classifier import DEFAULT_THRESHOLD, IntentClassifier, extract_preferences, normalize_query
+
+HISTORY = [{"user": "nursing courses at Leicester", "ai": "Here are some nursing courses at Leicester"}]
+
+# Messages the local parser should answer, with the parse the LLM would give
+LOCAL = [
+    ("hello", "greeting", {}, {}),
+    ("thanks, bye!", "farewell", {}, {}),
+    ("what can you do?", "help", {}, {}),
+    ("psychology", "search", {"subject": "psychology"}, {}),
+    ("show me maths courses", "search", {"subject": "mathematics"}, {}),
+    ("part time law", "search", {"subject": "law", "study_mode": "PART_TIME"}, {}),
+    ("computer science courses in London", "search", {"subject": "computer science", "location": "London"}, {}),
+    ("comp sci at Liverpool Hope", "search",
+     {"subject": "computer science", "university": "Liverpool Hope University"}, {}),
+    ("nursing courses at Leicester", "search", {"subject": "nursing", "university": "University of Leicester"}, {}),
+    ("full time physiotherapy at UCLan", "search",
+     {"subject": "physiotherapy", "study_mode": "FULL_TIME", "university": "University of Central Lancashire"}, {}),
+    ("criminal law", "search", {"subject": "criminal law"}, {}),
+    ("geology starting in September", "search", {"subject": "geology", "start_date": "September"}, {}),
+    ("engineering with 120 UCAS points", "requirements", {"subject": "engineering"}, {"ucas_points": 120}),
+    ("sport psychology with fees under £9,000", "fees", {"subject": "sport psychology"}, {"max_fee": 9000}),
+    ("how much are the fees for physics at Leicester", "fees",
+     {"subject": "physics", "university": "University of Leicester"}, {}),
+    ("3 year history courses", "search", {"subject": "history", "duration": "3 years"}, {}),
+]
+
+# Messages that need the LLM: off-topic, vague, comparisons and follow-ups
+LLM = [
+    ("tell me a joke", None),
+    ("what is the weather like in London", None),
+    ("can you recommend something creative", None),
+    ("I want to study something with animals", None),
+    ("what's the best uni for me", None),
+    ("english literature at leicester", None),
+    ("compare nursing at Leicester and UCLan", None),
+    ("is it hard to get a job after music", None),
+    ("what about part-time?", HISTORY),
+    ("how much does it cost?", HISTORY),
+]
+
+
+@pytest.fixture(scope="module")
+def classifier():
+    return IntentClassifier(threshold=DEFAULT_THRESHOLD)
+
+
+@pytest.mark.parametrize("query, intent, entities, preferences", LOCAL)
+def test_confident_messages_are_parsed_locally(classifier, catalog, query, intent, entities, preferences):
+    parsed = classifier.classify(query, catalog)
+    assert parsed is not None, classifier.parse(query, catalog)
+    assert parsed["intent"] == intent
+    assert parsed["entities"] == entities
+    assert parsed["user_preferences"] == preferences
+
+
+@pytest.mark.parametrize("query, history", LLM)
+def test_uncertain_messages_go_to_the_llm(classifier, catalog, query, history):
+    parsed, confidence = classifier.parse(query, catalog, history)
+    assert confidence < DEFAULT_THRESHOLD, parsed
+
+
+def test_threshold_separates_the_labelled_set(catalog):
+    classifier = IntentClassifier(threshold=0.0)
+    local = [classifier.parse(query, catalog)[1] for query, *_ in LOCAL]
+    llm = [classifier.parse(query, catalog, history)[1] for query, history in LLM]
+    assert max(llm) < DEFAULT_THRESHOLD <= min(local)
+
+
+def test_stats_count_local_and_llm_turns(catalog):
+    classifier = IntentClassifier()
+    classifier.classify("psychology", catalog)
+    classifier.classify("tell me a joke", catalog)
+    stats = classifier.stats()
+    assert (stats["turns"], stats["local"], stats["llm"], stats["bypass_rate"]) == (2, 1, 1, 0.5)
+
+
+def test_extract_preferences_marks_removed_spans():
+    entities, preferences, rest = extract_preferences(normalize_query("Part-time nursing, 112 UCAS points"))
+    assert entities == {"study_mode": ["PART_TIME"]}
+    assert preferences == {"ucas_points": 112}
+    assert rest.split() == ["|", "nursing", "|"]
@@ -0,0 +1,126 @@
+import pytest
+
+from core import llm
+from core.llm_backends import (
+    STUB_REPLY,
+    CassetteMiss,
+    RecordingBackend,
+    ReplayBackend,
+    make_backend,
+    request_key,
+)
+from core.pipeline import run_turn
+
+from tests.conftest import FakeModel
+
+QUESTION = {"model": "gpt-4", "messages": [{"role": "user", "content": "Which nursing courses are there?"}]}
+
+
+def replay(path, **options):
+    return ReplayBackend(str(path), latency=0, tokens_per_second=0, **options)
+
+
+def ask(backend, **extra):
+    return backend.client().chat.completions.create(**QUESTION, **extra)
+
+
+def stream_text(stream):
+    return "".join(chunk.choices[0].delta.content for chunk in stream if chunk.choices)
+
+
+@pytest.fixture
+def cassette(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    recorder = RecordingBackend(FakeModel(), str(path))
+    ask(recorder)
+    ask(recorder)
+    assert recorder.recorded == 2
+    return path
+
+
+def test_request_key_ignores_streaming_and_key_order():
+    stream = {"stream": True, "stream_options": {"include_usage": True}, "messages": QUESTION["messages"], "model": "gpt-4"}
+    assert request_key(stream) == request_key(QUESTION)
+    assert request_key(QUESTION) != request_key({**QUESTION, "model": "gpt-4o"})
+
+
+def test_replay_serves_recordings_in_order_then_repeats_the_last(cassette):
+    backend = replay(cassette)
+    replies = [ask(backend).choices[0].message.content for _ in range(3)]
+    assert replies == [
+        "Reply number 1 about nursing courses",
+        "Reply number 2 about nursing courses",
+        "Reply number 2 about nursing courses",
+    ]
+    assert ask(backend).usage.completion_tokens == 4
+    assert backend.stats()["hits"] == 4
+
+
+def test_replay_is_deterministic_across_backends(cassette):
+    runs = [[ask(replay(cassette)).choices[0].message.content for _ in range(3)] for _ in range(2)]
+    assert runs[0] == runs[1]
+
+
+def test_non_streamed_recording_replays_as_a_stream(cassette):
+    backend = replay(cassette)
+    assert stream_text(ask(backend, stream=True)) == "Reply number 1 about nursing courses"
+
+
+def test_streamed_recording_replays_both_ways(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    recorded = stream_text(ask(RecordingBackend(FakeModel(), str(path)), stream=True))
+    assert stream_text(ask(replay(path), stream=True)) == recorded
+    assert ask(replay(path)).choices[0].message.content == recorded
+
+
+def test_unfinished_stream_is_not_recorded(tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    recorder = RecordingBackend(FakeModel(), str(path))
+    next(iter(ask(recorder, stream=True)))
+    assert recorder.recorded == 0
+
+
+def test_unknown_request_gets_a_stub(cassette):
+    backend = replay(cassette)
+    response = backend.client().chat.completions.create(model="gpt-4", messages=[{"role": "user", "content": "other"}])
+    assert response.choices[0].message.content == STUB_REPLY
+    assert backend.stats()["misses"] == 1
+
+
+def test_strict_replay_raises_on_unknown_request(cassette):
+    with pytest.raises(CassetteMiss):
+        replay(cassette, strict=True).client().chat.completions.create(model="gpt-4", messages=[])
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_backend("anthropic", openai_backend=FakeModel())
+
+
+@pytest.fixture
+def backend():
+    previous = llm._backend
+    yield llm.set_backend
+    llm.set_backend(previous)
+
+
+def test_recorded_turns_replay_identically(catalog, backend, tmp_path):
+    path = tmp_path / "cassette.jsonl"
+    queries = ["I want to compare nursing courses and their entry requirements", "Which of those are part-time?"]
+
+    def session():
+        history, replies = [], []
+        for query in queries:
+            result = run_turn(query, catalog, list(history), mode="two-call", cache=None)
+            replies.append((result["parsed"], result["reply"], result["matched"]["row_id"].tolist()))
+            history.append({"user": query, "ai": result["reply"]})
+        return replies
+
+    recorder = RecordingBackend(FakeModel(), str(path))
+    backend(recorder)
+    recorded = session()
+    assert recorder.recorded == 4  # an intent parse and a reply per turn
+    backend(replay(path, strict=True))
+    assert session() == recorded
+    backend(replay(path, strict=True))
+    assert session() == recorded
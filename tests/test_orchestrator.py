@@ -0,0 +1,66 @@
+import asyncio
+
+import pytest
+
+from core import orchestrator, pipeline
+from core.session_store import InMemorySessionStore
+
+FOLLOW_UP = "tell me more about those"
+
+
+@pytest.fixture
+def store():
+    store = InMemorySessionStore()
+
+    def remember(memory):
+        memory["turns"].append({"user": "psychology courses", "ai": "Here are some psychology courses"})
+        memory["last_subject"] = "psychology"
+    store.update("s", remember)
+    return store
+
+
+@pytest.fixture
+def searches(monkeypatch):
+    """Intents the pipeline had to filter for itself, i.e. without a usable prefetch."""
+    calls = []
+    filter_courses = pipeline.filter_courses
+
+    def spy(parsed, catalog, **options):
+        calls.append(parsed)
+        return filter_courses(parsed, catalog, **options)
+
+    monkeypatch.setattr(pipeline, "filter_courses", spy)
+    return calls
+
+
+def run(catalog, store):
+    return asyncio.run(orchestrator.run_turn_async(FOLLOW_UP, catalog, cache=None, session_id="s", store=store))
+
+
+def test_speculative_intent_from_memory():
+    assert orchestrator.speculative_intent({"last_subject": None, "last_ucas": None}) is None
+    assert orchestrator.speculative_intent({"last_subject": "law", "last_ucas": 120}) == {
+        "intent": "search", "entities": {"subject": "law"}, "user_preferences": {"ucas_points": 120},
+    }
+
+
+def test_prefetch_is_used_when_the_parse_matches_the_guess(catalog, store, searches, fake_llm):
+    fake_llm.intent = {"intent": "search", "entities": {"subject": "Psychology "}, "user_preferences": {}}
+    hits = orchestrator.speculation_stats["hits"]
+    result = run(catalog, store)
+
+    assert searches == []
+    assert orchestrator.speculation_stats["hits"] == hits + 1
+    assert result["timings"]["saved"] > 0
+    assert len(result["matched"]) and result["matched"]["name"].str.contains("Psychology").all()
+
+
+def test_prefetch_is_discarded_when_the_parse_differs(catalog, store, searches, fake_llm):
+    fake_llm.intent = {"intent": "search", "entities": {"subject": "nursing"}, "user_preferences": {}}
+    misses = orchestrator.speculation_stats["misses"]
+    result = run(catalog, store)
+
+    assert [parsed["entities"] for parsed in searches] == [{"subject": "nursing"}]
+    assert orchestrator.speculation_stats["misses"] == misses + 1
+    assert result["timings"]["saved"] == 0
+    assert len(result["matched"]) and result["matched"]["name"].str.contains("Nursing").all()
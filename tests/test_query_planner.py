@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+
+from core.course_filter import plan_query
+from core.query_planner import BitmapPredicate, QueryPlan, RangePredicate, RowSetPredicate
+from core.search_index import BitmapIndex, RangeIndex
+
+
+@pytest.fixture(scope="module")
+def frame(catalog):
+    return catalog.select(range(len(catalog)))
+
+
+def rows_of(mask):
+    return np.flatnonzero(np.asarray(mask)).tolist()
+
+
+@pytest.mark.parametrize("mode", ["FULL_TIME", "PART_TIME", "SANDWICH"])
+def test_bitmap_index_matches_pandas(catalog, frame, mode):
+    index = catalog.study_mode_bitmap
+    rows = np.flatnonzero(np.unpackbits(index.bitmap(index.codes_where(lambda v: v == mode)), count=len(catalog)))
+    assert rows.tolist() == rows_of(frame["study_mode"] == mode)
+
+
+def test_multi_valued_bitmap_index():
+    index = BitmapIndex([0, 0, 2, 3], [0, 1, 1, -1], ["2025", "2026"], n_rows=4)
+    assert index.counts.tolist() == [1, 2]
+    assert np.unpackbits(index.bitmap([1]), count=4).tolist() == [1, 0, 1, 0]
+    assert np.unpackbits(index.bitmap([0, 1]), count=4).tolist() == [1, 0, 1, 0]
+
+
+def test_plan_starts_from_the_most_selective_predicate():
+    n_rows = 100
+    bitmap = np.packbits(np.arange(n_rows) % 2 == 0)
+    plan = QueryPlan([
+        BitmapPredicate("even", bitmap, n_rows),
+        RangePredicate("range", RangeIndex(np.arange(n_rows)), 10, 19),
+        RowSetPredicate("few", np.array([12, 13, 14, 50])),
+    ], n_rows)
+    assert [predicate.name for predicate in plan.steps] == ["few", "range", "even"]
+    assert plan.execute().tolist() == [12, 14]
+
+
+def test_plan_sorts_rows_from_an_unordered_first_step():
+    values = np.array([5, 1, 4, 2, 3])
+    plan = QueryPlan([RangePredicate("range", RangeIndex(values), 2, 5)], len(values))
+    assert plan.execute().tolist() == [0, 2, 3, 4]
+
+
+def test_empty_predicate_short_circuits():
+    plan = QueryPlan([RowSetPredicate("none", np.array([], dtype=np.int64)),
+                      RangePredicate("all", RangeIndex(np.arange(10)))], 10)
+    assert plan.execute().tolist() == []
+
+
+PLANNER_CASES = [
+    ({"university": "Leicester"}, {}, lambda f: f["university"].str.contains("leicester", case=False)),
+    ({"subject": "science"}, {}, lambda f: f["name"].str.contains("science", case=False)),
+    ({"study_mode": "full time"}, {}, lambda f: f["study_mode"] == "FULL_TIME"),
+    ({}, {"ucas_points": 112}, lambda f: (f["ucas_min"] != -1) & (f["ucas_min"] <= 112)),
+    (
+        {},
+        {"min_tariff": 80, "max_tariff": 120, "include_unknown_tariff": True},
+        lambda f: f["ucas_min"].between(80, 120) | (f["ucas_min"] == -1),
+    ),
+    ({}, {"max_fee": 9250}, lambda f: f["fee_england"] <= 9250),
+    ({"duration": "3 years"}, {}, lambda f: f["duration_months"] == 36),
+    ({}, {"max_duration": "4 years"}, lambda f: (f["duration_months"] != -1) & (f["duration_months"] <= 48)),
+    (
+        {"subject": "science", "study_mode": "FULL_TIME"},
+        {"ucas_points": 128, "max_duration": 4},
+        lambda f: (
+            f["name"].str.contains("science", case=False)
+            & (f["study_mode"] == "FULL_TIME")
+            & (f["ucas_min"] != -1) & (f["ucas_min"] <= 128)
+            & (f["duration_months"] != -1) & (f["duration_months"] <= 48)
+        ),
+    ),
+    (
+        {"university": ["Leicester", "Liverpool Hope"]},
+        {"min_fee": 9000},
+        lambda f: f["university"].str.contains("leicester|liverpool hope", case=False) & (f["fee_england"] >= 9000),
+    ),
+]
+
+
+@pytest.mark.parametrize("entities, preferences, expected", PLANNER_CASES)
+def test_query_plan_matches_pandas_filter(catalog, frame, entities, preferences, expected):
+    parsed = {"intent": "search", "entities": entities, "user_preferences": preferences}
+    mask = expected(frame)
+    assert mask.any()
+    assert plan_query(parsed, catalog).execute().tolist() == rows_of(mask)
+
+
+def test_query_plan_without_predicates_returns_every_row(catalog):
+    parsed = {"intent": "search", "entities": {}, "user_preferences": {}}
+    assert plan_query(parsed, catalog).execute().tolist() == list(range(len(catalog)))
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from core.course_filter import filter_courses
+from core.ranking import BM25Index, corrected_entities, option_ordinals, score_rows, top_k
+
+
+def search(catalog, entities=None, preferences=None, user_query=None, k=5):
+    parsed = {"intent": "search", "entities": entities or {}, "user_preferences": preferences or {}}
+    return filter_courses(parsed, catalog, k=k, user_query=user_query, cache=None)
+
+
+def test_bm25_prefers_documents_with_rarer_terms():
+    index = BM25Index(["nursing adult", "nursing child", "computer science", "nursing nursing"])
+    scores = index.scores("adult nursing")
+    assert scores.argmax() == 0
+    assert scores[2] == 0
+    assert not index.scores("astronomy").any()
+
+
+def test_top_k_orders_by_score_then_tiebreak_then_row():
+    rows = np.array([3, 5, 7, 9])
+    scores = np.array([1.0, 2.0, 1.0, 1.0])
+    assert top_k(rows, scores, k=3) == [(5, 2.0), (3, 1.0), (7, 1.0)]
+    assert top_k(rows, scores, k=3, tiebreak=[1, 0, 1, 0]) == [(5, 2.0), (9, 1.0), (3, 1.0)]
+
+
+def test_option_ordinals_count_options_within_each_course(catalog):
+    rows = np.arange(len(catalog))
+    ordinals = option_ordinals(catalog, rows)
+    first = np.flatnonzero(ordinals == 0)
+    assert catalog.options["course_key"].to_numpy()[first].tolist() == list(range(len(catalog.courses)))
+
+
+def test_corrected_entities_only_returns_changes(catalog):
+    assert corrected_entities(catalog.resolver, "subject", ["pyschology"]) == ["psychology"]
+    assert corrected_entities(catalog.resolver, "subject", ["psychology"]) == []
+
+
+@pytest.mark.parametrize("subject", ["psychology", "pyschology"])
+def test_misspelled_subject_ranks_like_the_correct_one(catalog, subject):
+    result = search(catalog, {"subject": subject}, user_query=f"{subject} courses")
+    assert (result["score"] > 0).all()
+    assert result["name"].str.contains("psychology", case=False).all()
+
+
+def test_ucas_points_alone_ranks_by_tariff_fit(catalog):
+    result = search(catalog, preferences={"ucas_points": 96}, k=10)
+    assert (result["score"] > 0).all()
+    assert (result["ucas_min"] == 96).iloc[:3].all()
+    distances = (result["ucas_min"] - 96).abs()
+    assert distances.tolist() == sorted(distances.tolist())
+
+
+def test_query_without_text_prefers_known_facts_and_distinct_courses(catalog):
+    result = search(catalog, {"study_mode": "part time"}, k=10)
+    assert (result["study_mode"] == "PART_TIME").all()
+    assert (result["score"] > 0).all()
+    assert result["name"].is_unique
+
+    rows = np.arange(len(catalog))
+    scores = score_rows({"entities": {}}, catalog, rows)
+    unknown = ~catalog.tariff_index.known
+    assert unknown.any()
+    assert scores[unknown].max() < scores[~unknown].max()
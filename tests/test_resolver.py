@@ -0,0 +1,59 @@
+import pytest
+
+from core.course_filter import filter_courses
+from core.resolver import DeletionIndex, VocabularyResolver
+
+
+def search(**entities):
+    return {"intent": "search", "entities": entities, "user_preferences": {}}
+
+
+@pytest.mark.parametrize("text", [
+    "University of Leeds",
+    "Leeds University",
+    "University of Manchester",
+    "Oxford University",
+    "Manchester Metropolitan University",
+    "University",
+    "Hope University",
+])
+def test_universities_missing_from_catalog_resolve_to_nothing(catalog, text):
+    assert catalog.resolver.university.resolve(text) == []
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("University of Leicester", "University of Leicester"),
+    ("Leicester", "University of Leicester"),
+    ("Univeristy of Leicster", "University of Leicester"),
+    ("Leicester Uni", "University of Leicester"),
+    ("uclan", "University of Central Lancashire"),
+    ("Central Lancashire", "University of Central Lancashire"),
+    ("london met", "London Metropolitan University"),
+    ("London Metropolitan", "London Metropolitan University"),
+    ("Liverpool Hope", "Liverpool Hope University"),
+])
+def test_universities_resolve_by_distinctive_words(catalog, text, expected):
+    assert catalog.resolver.university.resolve(text) == [expected]
+
+
+def test_unknown_university_filters_to_no_courses(catalog):
+    assert filter_courses(search(university="University of Leeds"), catalog, cache=None).empty
+
+
+def test_misspelled_university_filters_to_its_courses(catalog):
+    matched = filter_courses(search(university="Univ of Leicster"), catalog, cache=None)
+    assert not matched.empty
+    assert set(matched["university"]) == {"University of Leicester"}
+
+
+def test_subjects_keep_partial_matching():
+    resolver = VocabularyResolver(["Computer Science BSc (Hons)", "Business Management BA (Hons)"])
+    assert resolver.resolve("comp sci") == ["Computer Science BSc (Hons)"]
+    assert resolver.resolve("business") == ["Business Management BA (Hons)"]
+
+
+def test_deletion_index_corrects_within_distance():
+    index = DeletionIndex(["psychology", "law", "nursing"])
+    assert index.lookup("pyschology")[0] == ("psychology", 2)
+    assert index.lookup("nursign")[0][0] == "nursing"
+    assert index.lookup("lwa") == []  # short words are held to one edit
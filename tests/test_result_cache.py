@@ -0,0 +1,87 @@
+import json
+import shutil
+
+import pytest
+
+from core.catalog_manager import CatalogManager
+from core.course_filter import filter_courses
+from core.data_loader import load_courses
+from core.result_cache import FilterCache, cache_key
+
+from tests.conftest import EXAMPLE_DATA
+
+SEARCH = {"intent": "search", "entities": {"subject": "science"}, "user_preferences": {"ucas_points": 120}}
+
+
+def test_filter_cache_hits_within_a_version():
+    cache = FilterCache()
+    cache.put("v1", "key", [1, 2, 3])
+    assert cache.get("v1", "key").tolist() == [1, 2, 3]
+    assert cache.stats()["hits"] == 1
+
+
+def test_filter_cache_drops_entries_on_version_change():
+    cache = FilterCache()
+    cache.put("v1", "a", [1])
+    cache.put("v1", "b", [2])
+    assert cache.get("v2", "a") is None
+    assert len(cache) == 0
+    assert cache.stats()["catalog_version"] == "v2"
+    # Going back does not resurrect the old entries
+    assert cache.get("v1", "b") is None
+
+
+def test_filter_cache_evicts_least_recently_used():
+    cache = FilterCache(max_entries=2)
+    cache.put("v", "a", [1])
+    cache.put("v", "b", [2])
+    cache.get("v", "a")
+    cache.put("v", "c", [3])
+    assert cache.get("v", "b") is None
+    assert cache.get("v", "a") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_filter_cache_key_is_canonical():
+    a = {"entities": {"subject": "Nursing", "university": ["Leicester"]}, "user_preferences": {"ucas_points": 120}}
+    b = {"entities": {"university": "leicester ", "subject": "nursing", "campus": None}, "user_preferences": {"ucas_points": 120}}
+    assert cache_key(a) == cache_key(b)
+
+
+def test_filter_cache_rows_are_read_only():
+    rows = FilterCache().put("v", "key", [1, 2])
+    with pytest.raises(ValueError):
+        rows[0] = 5
+
+
+def test_filter_courses_recomputes_for_a_new_catalog_version(catalog, monkeypatch):
+    cache = FilterCache()
+    first = filter_courses(SEARCH, catalog, cache=cache)
+    filter_courses(SEARCH, catalog, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    monkeypatch.setattr(catalog, "version", "reloaded")
+    again = filter_courses(SEARCH, catalog, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 2)
+    assert cache.version == "reloaded"
+    assert again["row_id"].tolist() == first["row_id"].tolist()
+
+
+def test_catalog_reload_invalidates_filter_results(tmp_path):
+    path = tmp_path / "courses.json"
+    shutil.copy(EXAMPLE_DATA, path)
+    manager = CatalogManager(str(path), loader=lambda p: load_courses(p, use_snapshot=False)).start(watch=False)
+    cache = FilterCache()
+    before = filter_courses(SEARCH, manager.catalog, cache=cache)
+    assert len(before)
+
+    # Drop every science course from the data file and reload
+    with open(path) as f:
+        data = json.load(f)
+    data = [course for course in data if "science" not in course["name"].lower()]
+    with open(path, "w") as f:
+        json.dump(data, f)
+    assert manager.reload()
+
+    assert cache.get(manager.version, cache_key(SEARCH)) is None
+    assert not len(filter_courses(SEARCH, manager.catalog, cache=cache))
@@ -0,0 +1,101 @@
+import numpy as np
+import pytest
+
+from core.course_filter import tariff_bounds
+from core.search_index import PostingIndex, RangeIndex, TrigramIndex, intersect, sort_rows
+
+
+@pytest.fixture(scope="module")
+def frame(catalog):
+    return catalog.select(range(len(catalog)))
+
+
+def rows_of(mask):
+    return np.flatnonzero(np.asarray(mask)).tolist()
+
+
+@pytest.mark.parametrize("query", ["science", "Maths", "nurs", "(hons)", "ba", "zz", "x"])
+def test_trigram_index_matches_substring_search(query):
+    values = ["Mathematics BSc", "Nursing (Adult)", "Computer Science", "Banking", "Maths with Science", "BA (Hons)"]
+    expected = [i for i, value in enumerate(values) if query.lower() in value.lower()]
+    assert sorted(TrigramIndex(values).search(query)) == expected
+
+
+@pytest.mark.parametrize("column, index, query", [
+    ("name", "name_index", "science"),
+    ("name", "name_index", "BSc (Hons)"),
+    ("university", "university_index", "leicester"),
+    ("university", "university_index", "University of"),
+    ("campus", "campus_index", "main"),
+])
+def test_text_field_index_matches_pandas(catalog, frame, column, index, query):
+    expected = rows_of(frame[column].str.contains(query, case=False, regex=False))
+    assert getattr(catalog, index).search(query).tolist() == expected
+
+
+def test_text_field_index_exact_values(catalog, frame):
+    rows = catalog.university_index.rows_for_values(["University of Leicester", "Not a university"])
+    assert rows.tolist() == rows_of(frame["university"] == "University of Leicester")
+
+
+def test_posting_index():
+    postings = PostingIndex(np.array([1, -1, 0, 1, 2, 1]), 3)
+    assert postings.rows(1).tolist() == [0, 3, 5]
+    assert postings.count(0) == 1
+    assert postings.rows_for([0, 2]).tolist() == [2, 4]
+
+
+def test_intersect():
+    assert intersect([np.array([1, 3, 5, 7]), np.array([3, 7, 9]), np.array([0, 3, 7])]).tolist() == [3, 7]
+    assert intersect([np.array([1, 2]), np.array([], dtype=np.int64)]).tolist() == []
+
+
+@pytest.mark.parametrize("low, high, include_missing", [
+    (None, 100, False), (64, None, False), (64, 112, False), (64, 112, True), (200, None, False), (None, None, True),
+])
+def test_tariff_range_index_matches_pandas(catalog, frame, low, high, include_missing):
+    values = frame["ucas_min"]
+    known = values != -1
+    mask = known & (values >= (low if low is not None else -np.inf)) & (values <= (high if high is not None else np.inf))
+    if include_missing:
+        mask |= ~known
+    expected = rows_of(mask)
+    index = catalog.tariff_index
+    assert index.between(low, high, include_missing).tolist() == expected
+    assert sorted(index.range_rows(low, high, include_missing).tolist()) == expected
+    assert rows_of(index.test(np.arange(len(catalog)), low, high, include_missing)) == expected
+
+
+def test_fee_range_index_keeps_nan_apart(catalog, frame):
+    index = catalog.fee_index
+    assert index.missing_rows.tolist() == rows_of(frame["fee_england"].isna())
+    assert index.between(high=9250).tolist() == rows_of(frame["fee_england"] <= 9250)
+    assert index.count_between(9000, 10000) == int(frame["fee_england"].between(9000, 10000).sum())
+
+
+def test_range_index_on_random_values():
+    rng = np.random.default_rng(0)
+    values = rng.integers(-1, 50, size=1000)
+    index = RangeIndex(values, missing=-1)
+    for low, high in [(None, 10), (10, 20), (49, None), (25, 25)]:
+        mask = (values != -1) & (values >= (low or 0)) & (values <= (high if high is not None else 50))
+        assert index.between(low, high).tolist() == rows_of(mask)
+        assert index.range_rows(low, high).tolist() == sorted(index.range_rows(low, high).tolist(),
+                                                                 key=lambda row: values[row])
+
+
+@pytest.mark.parametrize("size", [5, 600])
+def test_sort_rows_for_sparse_and_dense_sets(size):
+    rows = np.random.default_rng(1).permutation(1000)[:size]
+    assert sort_rows(rows, 1000).tolist() == sorted(rows.tolist())
+
+
+@pytest.mark.parametrize("preferences, expected", [
+    ({}, None),
+    ({"ucas_points": 112}, (None, 112, False)),
+    ({"ucas_points": "112 points", "ucas_margin": 8}, (104, 120, False)),
+    ({"min_tariff": 80, "max_tariff": 120, "include_unknown_tariff": True}, (80, 120, True)),
+    ({"ucas_points": 100, "max_tariff": 120}, (None, 100, False)),
+])
+def test_tariff_bounds(preferences, expected):
+    assert tariff_bounds(preferences) == expected
@@ -0,0 +1,117 @@
+import pytest
+
+from core import session_store as session_store_module
+from core.session_store import make_session_store, new_session
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(session_store_module.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**options):
+        if request.param == "sqlite":
+            options["path"] = str(tmp_path / "sessions.sqlite3")
+        return make_session_store(request.param, **options)
+    return make
+
+
+def add_turn(text):
+    return lambda memory: memory["turns"].append({"user": text, "ai": "ok"})
+
+
+def test_unknown_session_is_new(make_store):
+    assert make_store().get("nobody") == new_session()
+
+
+def test_sessions_are_kept_apart(make_store):
+    store = make_store()
+    store.update("a", add_turn("nursing"))
+    store.update("b", add_turn("law"))
+    assert [turn["user"] for turn in store.get("a")["turns"]] == ["nursing"]
+    assert [turn["user"] for turn in store.get("b")["turns"]] == ["law"]
+
+
+def test_readers_get_a_copy(make_store):
+    store = make_store()
+    store.update("a", add_turn("nursing"))
+    store.get("a")["turns"].clear()
+    assert len(store.get("a")["turns"]) == 1
+
+
+def test_turns_are_trimmed_to_max_turns(make_store):
+    store = make_store(max_turns=3)
+    for i in range(5):
+        store.update("a", add_turn(str(i)))
+    assert [turn["user"] for turn in store.get("a")["turns"]] == ["2", "3", "4"]
+
+
+def test_least_recently_used_session_is_evicted(make_store, clock):
+    store = make_store(max_sessions=2)
+    store.update("a", add_turn("a"))
+    clock[0] += 1
+    store.update("b", add_turn("b"))
+    clock[0] += 1
+    store.get("a")  # touch "a" so "b" is the least recently used
+    clock[0] += 1
+    store.update("c", add_turn("c"))
+
+    assert store.get("b") == new_session()
+    assert store.get("a")["turns"] and store.get("c")["turns"]
+    assert store.stats()["sessions"] == 2
+    assert store.stats()["evictions"] == 1
+
+
+def test_idle_sessions_expire(make_store, clock):
+    store = make_store(idle_ttl=60)
+    store.update("a", add_turn("a"))
+    clock[0] += 30
+    store.update("b", add_turn("b"))
+    clock[0] += 31
+    assert store.get("a") == new_session()
+    assert store.get("b")["turns"]
+    assert store.stats()["sessions"] == 1
+
+
+def test_update_after_expiry_starts_a_new_session(make_store, clock):
+    store = make_store(idle_ttl=60)
+    store.update("a", add_turn("old"))
+    clock[0] += 61
+    memory = store.update("a", add_turn("new"))
+    assert [turn["user"] for turn in memory["turns"]] == ["new"]
+
+
+def test_delete(make_store):
+    store = make_store()
+    store.update("a", add_turn("a"))
+    store.delete("a")
+    assert store.get("a") == new_session()
+    assert store.stats()["sessions"] == 0
+
+
+def test_sqlite_failed_update_is_rolled_back(tmp_path):
+    store = make_session_store("sqlite", path=str(tmp_path / "sessions.sqlite3"))
+    store.update("a", add_turn("a"))
+
+    def fail(memory):
+        memory["turns"].clear()
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        store.update("a", fail)
+    assert len(store.get("a")["turns"]) == 1
+
+
+def test_sqlite_sessions_are_shared_between_stores(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    make_session_store("sqlite", path=path).update("a", add_turn("shared"))
+    assert make_session_store("sqlite", path=path).get("a")["turns"][0]["user"] == "shared"
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        make_session_store("redis")
@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core import snapshot
+from core.course_filter import filter_courses
+from core.data_loader import compile_snapshot, load_courses, stream_courses
+
+from tests.conftest import EXAMPLE_DATA
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "courses.json"
+    shutil.copy(EXAMPLE_DATA, path)
+    return str(path)
+
+
+def test_snapshot_tables_match_json(data_file):
+    expected = stream_courses(data_file).tables()
+    compile_snapshot(data_file)
+    tables, header = snapshot.read_snapshot(snapshot.snapshot_path(data_file))
+
+    assert header["version"] == snapshot.SNAPSHOT_VERSION
+    assert set(tables) == set(expected)
+    for name, df in expected.items():
+        pd.testing.assert_frame_equal(tables[name], df, check_dtype=False)
+
+
+def test_numeric_columns_are_not_copied(data_file):
+    compile_snapshot(data_file)
+    tables, _ = snapshot.read_snapshot(snapshot.snapshot_path(data_file))
+    options = tables["options"]
+    assert not options["ucas_min"].to_numpy().flags.owndata
+    assert not options["study_mode"].cat.codes.to_numpy().flags.owndata
+
+
+def test_load_courses_uses_fresh_snapshot(data_file):
+    from_json = load_courses(data_file, use_snapshot=False)
+    compile_snapshot(data_file)
+    assert snapshot.is_fresh(snapshot.snapshot_path(data_file), data_file)
+    from_snapshot = load_courses(data_file)
+
+    assert from_snapshot.version == from_json.version
+    assert len(from_snapshot) == len(from_json)
+    parsed = {"intent": "search", "entities": {"subject": "science"}, "user_preferences": {"ucas_points": 120}}
+    a = filter_courses(parsed, from_json, cache=None)
+    b = filter_courses(parsed, from_snapshot, cache=None)
+    assert a["row_id"].tolist() == b["row_id"].tolist()
+    assert np.allclose(a["score"], b["score"])
+
+
+def test_changed_source_makes_snapshot_stale(data_file):
+    compile_snapshot(data_file)
+    with open(data_file, "a") as f:
+        f.write("\n")
+    assert not snapshot.is_fresh(snapshot.snapshot_path(data_file), data_file)
+
+
+def test_snapshot_with_other_version_is_stale(data_file, monkeypatch):
+    compile_snapshot(data_file)
+    monkeypatch.setattr(snapshot, "SNAPSHOT_VERSION", snapshot.SNAPSHOT_VERSION + 1)
+    assert not snapshot.is_fresh(snapshot.snapshot_path(data_file), data_file)
+
+
+def test_snapshot_rejects_other_files(tmp_path):
+    path = tmp_path / "not_a_snapshot.catalog"
+    path.write_bytes(b"{}")
+    with pytest.raises(ValueError):
+        snapshot.read_header(str(path))
+    assert not os.path.exists(str(path) + ".tmp")
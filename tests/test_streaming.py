@@ -0,0 +1,54 @@
+import itertools
+
+from core.llm import new_usage
+from core.pipeline import run_turn
+from core.response_generator import stream_completion
+
+
+def test_stream_completion_yields_text_and_records_usage(fake_llm):
+    usage = new_usage()
+    chunks = list(stream_completion(fake_llm.client(), [{"role": "user", "content": "hi"}], usage))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "Reply number 1 about nursing courses "
+    assert (usage["calls"], usage["prompt_tokens"], usage["completion_tokens"]) == (1, 10, 4)
+    assert fake_llm.requests[0]["stream_options"] == {"include_usage": True}
+
+
+def test_streamed_chunks_join_to_the_final_reply(catalog, fake_llm):
+    result = run_turn("psychology courses at Leicester", catalog, [], mode="two-call", cache=None, stream=True)
+    assert "timings" not in result  # nothing is final before the stream is read
+    chunks = list(result["chunks"])
+
+    assert len(chunks) > 1
+    assert "".join(chunks) == result["reply"]
+    assert result["reply"].startswith("Reply number")
+    assert result["timings"]["first_token"] <= result["timings"]["total"] == result["seconds"]
+    assert result["usage"]["completion_tokens"] == 4
+    assert result["usage"]["context_courses"] == len(result["matched"]) > 0
+
+
+def test_streamed_and_plain_turns_agree(catalog, fake_llm):
+    streamed = run_turn("psychology courses at Leicester", catalog, [], cache=None, stream=True)
+    "".join(streamed["chunks"])
+    fake_llm.calls = itertools.count(1)
+    plain = run_turn("psychology courses at Leicester", catalog, [], cache=None)
+    assert streamed["reply"].strip() == plain["reply"]
+    assert streamed["matched"]["row_id"].tolist() == plain["matched"]["row_id"].tolist()
+
+
+def test_single_call_reply_without_search_is_streamed_whole(catalog, fake_llm):
+    result = run_turn("tell me a joke", catalog, [], mode="single-call", stream=True)
+    assert list(result["chunks"]) == [result["reply"]]
+    assert result["usage"]["calls"] == 1
+
+
+def test_stream_failing_before_any_text_ends_with_the_error_reply(catalog, fake_llm, monkeypatch):
+    def broken(**request):
+        yield from ()
+        raise ConnectionError("connection reset")
+
+    monkeypatch.setattr(fake_llm, "create", broken)
+    result = run_turn("psychology courses at Leicester", catalog, [], cache=None, stream=True)
+    assert list(result["chunks"]) == [result["reply"]]
+    assert result["reply"].startswith("I'm sorry")
+    assert "timings" in result
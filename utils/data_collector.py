@@ -1,6 +1,32 @@
+"""
+Crawls universities, their course listings and course details from the
+UniversityCompare GraphQL API.
+
+The crawl is checkpointed so that a failure part-way loses nothing:
+
+- Every successful GraphQL response is written to a content-addressed cache
+  under ``CRAWL_CACHE_DIR``: bodies are stored once under the hash of their
+  content, and each request (query and variables) points at its body.
+- A progress journal (``CRAWL_JOURNAL``, JSON lines) marks when a crawl
+  starts and finishes, and records each request it completed and each
+  course whose details were fetched, with a digest of the listing they
+  were fetched for.
+
+The journal decides what is fetched. A run after a finished crawl starts a
+new one and fetches everything again; a run after a crash (or a crawl with
+failed requests) resumes it, serving the requests it already completed
+from the cache. With ``--refresh`` university and course listings are
+fetched again, and course details only for courses whose listing changed
+(a different year, tariff range, study mode...) or that are new.
+
+    python utils/data_collector.py            # full crawl, or resume one
+    python utils/data_collector.py --refresh  # incremental update
+"""
 import os
 import json
 import asyncio
+import argparse
+import hashlib
 import aiohttp
 from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
@@ -25,14 +51,167 @@ MAX_RETRIES = 3
 # Retry delay in seconds
 RETRY_DELAY = 1
 
+# Content-addressed cache of GraphQL responses
+CRAWL_CACHE_DIR = os.getenv("CRAWL_CACHE_DIR", "data/crawl_cache")
+
+# Progress journal: course details fetched, with the listing they were fetched for
+CRAWL_JOURNAL = os.getenv("CRAWL_JOURNAL", "data/crawl_journal.jsonl")
+
+# Listing fields that, when changed, mean a course's details must be refetched
+# ("year" is the listing's academic year)
+LISTING_FIELDS = ("name", "year", "location", "study_mode", "min_ucas_tariff", "max_ucas_tariff")
+
+
+def _digest(data) -> str:
+    return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def request_key(query: str, variables: Dict[str, Any]) -> str:
+    """Cache key of a GraphQL request (whitespace in the query does not matter)"""
+    return _digest({"query": " ".join(query.split()), "variables": variables})
+
+
+def listing_digest(course: Dict[str, Any]) -> str:
+    """Digest of the listing fields a course's details depend on"""
+    listing = {field: course.get(field) for field in LISTING_FIELDS}
+    listing["university"] = course.get("university_slug")
+    return _digest(listing)
+
+
+def _write_atomic(path: str, text: str):
+    # Written beside the target and renamed, so a crash never leaves half a file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class ResponseCache:
+    """
+    GraphQL responses on disk. Bodies live in ``objects/`` named by the hash
+    of their content, so identical responses (empty pages, unchanged courses)
+    are stored once; ``requests/`` maps each request key to its body's hash.
+    """
+
+    def __init__(self, directory: str = CRAWL_CACHE_DIR):
+        self.directory = directory
+
+    def _object_path(self, content_hash: str) -> str:
+        return os.path.join(self.directory, "objects", content_hash[:2], f"{content_hash}.json")
+
+    def _request_path(self, key: str) -> str:
+        return os.path.join(self.directory, "requests", key[:2], key)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._request_path(key)) as f:
+                content_hash = f.read().strip()
+            with open(self._object_path(content_hash)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, data: Dict[str, Any]):
+        body = json.dumps(data, sort_keys=True)
+        content_hash = hashlib.sha256(body.encode("utf-8")).hexdigest()
+        if not os.path.exists(self._object_path(content_hash)):
+            _write_atomic(self._object_path(content_hash), body)
+        _write_atomic(self._request_path(key), content_hash)
+
+
+class CrawlJournal:
+    """
+    Append-only progress journal. Lines are one of:
+
+    - ``{"run": id, "mode": ..., "started": t}``: a crawl started
+    - ``{"request": key}``: a response of that crawl is in the cache
+    - ``{"course": slug, "listing": digest}``: details fetched for a listing
+    - ``{"run": id, "finished": t}``: the crawl completed without failures
+
+    Only an unfinished crawl's requests are served from the cache again;
+    course digests carry over between crawls for ``--refresh``.
+    """
+
+    def __init__(self, path: str = CRAWL_JOURNAL):
+        self.path = path
+        self.run = None  # start entry of the unfinished crawl, if any
+        self.requests = set()  # request keys that crawl completed
+        self.courses = {}  # course slug -> listing digest its details were fetched for
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # a line cut short by a crash
+                    if "started" in entry:
+                        self.run, self.requests = entry, set()
+                    elif "finished" in entry:
+                        self.run, self.requests = None, set()
+                    elif "request" in entry:
+                        self.requests.add(entry["request"])
+                    else:
+                        self.courses[entry["course"]] = entry["listing"]
+            # Drop finished crawls and keep only the latest entry per course
+            lines = [self.run] if self.run else []
+            lines += [{"request": key} for key in self.requests]
+            lines += [{"course": slug, "listing": digest} for slug, digest in self.courses.items()]
+            _write_atomic(path, "".join(json.dumps(line) + "\n" for line in lines))
+        self._file = None
+
+    def _append(self, entry: Dict[str, Any]):
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a")
+        self._file.write(json.dumps(entry) + "\n")
+        self._file.flush()
+
+    def resumable(self, mode: str) -> bool:
+        """True if an unfinished crawl in ``mode`` can be resumed"""
+        return self.run is not None and self.run.get("mode") == mode
+
+    def start(self, mode: str):
+        self.run = {"run": f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}", "mode": mode, "started": time.time()}
+        self.requests = set()
+        self._append(self.run)
+
+    def finish(self):
+        self._append({"run": self.run["run"], "finished": time.time()})
+        self.run, self.requests = None, set()
+
+    def record_request(self, key: str):
+        if key not in self.requests:
+            self._append({"request": key})
+            self.requests.add(key)
+
+    def is_current(self, course: Dict[str, Any]) -> bool:
+        return self.courses.get(course["slug"]) == listing_digest(course)
+
+    def record(self, course: Dict[str, Any]):
+        digest = listing_digest(course)
+        if self.courses.get(course["slug"]) != digest:
+            self._append({"course": course["slug"], "listing": digest})
+            self.courses[course["slug"]] = digest
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
 class EducationDataCollector:
-    def __init__(self):
+    def __init__(self, refresh: bool = False, cache_dir: str = CRAWL_CACHE_DIR, journal_path: str = CRAWL_JOURNAL):
         self.session = None
         self.universities = []
         self.courses = []
         self.course_details = {}
         self.semaphore = None
         self.retry_semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        self.refresh = refresh
+        self.cache = ResponseCache(cache_dir)
+        self.journal = CrawlJournal(journal_path)
+        self.stats = {"cached": 0, "fetched": 0}
+        self.failures = 0
         
     async def __aenter__(self):
         """Async context manager entry"""
@@ -44,10 +223,49 @@ class EducationDataCollector:
         """Async context manager exit"""
         if self.session:
             await self.session.close()
+        self.journal.close()
+
+    async def graphql(self, query: str, variables: Dict[str, Any], label: str,
+                      reuse: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Run a GraphQL query; None for an error response. The cached response is
+        used if this crawl already completed the request, or if ``reuse``.
+        """
+        key = request_key(query, variables)
+        if reuse or key in self.journal.requests:
+            data = self.cache.get(key)
+            if data is not None:
+                self.stats["cached"] += 1
+                self.journal.record_request(key)
+                return data
+
+        async with self.semaphore:
+            async with self.session.post(
+                GRAPHQL_API,
+                json={"query": query, "variables": variables}
+            ) as response:
+                if response.status != 200:
+                    print(f"Error fetching {label}: {response.status}")
+                    return None
+                data = await response.json()
+
+        self.stats["fetched"] += 1
+        if "errors" in data:
+            print(f"GraphQL errors for {label}: {data['errors']}")
+            return None
+        # Only good responses are cached, so failures are retried on the next run
+        self.cache.put(key, data)
+        self.journal.record_request(key)
+        return data
             
     async def fetch_all_data(self):
         """Fetch all universities, courses, and course details using parallelism"""
-        print("Starting data collection...")
+        mode = "refresh" if self.refresh else "full"
+        if self.journal.resumable(mode):
+            print(f"Resuming unfinished {mode} crawl ({len(self.journal.requests)} requests already done)...")
+        else:
+            self.journal.start(mode)
+            print("Starting data collection..." + (" (refreshing listings)" if self.refresh else ""))
         start_time = time.time()
         
         # Fetch all universities
@@ -65,24 +283,34 @@ class EducationDataCollector:
             await task
             
         print(f"Fetched {len(self.courses)} courses")
-        
+        if self.refresh:
+            current = sum(self.journal.is_current(course) for course in self.courses)
+            print(f"Details of {current} courses are already up to date")
+
         # Fetch detailed information for courses in batches
+        # In refresh mode up-to-date details come from the cache and only changed listings are refetched
         print("Fetching detailed course information...")
         for i in range(0, len(self.courses), BATCH_SIZE):
             batch = self.courses[i:i + BATCH_SIZE]
             tasks = []
             for course in batch:
-                tasks.append(self.fetch_course_details_with_retry(course["slug"]))
+                tasks.append(self.fetch_course_details_with_retry(course))
             
             # Process batch in parallel
             await asyncio.gather(*tasks)
             print(f"Processed batch {i//BATCH_SIZE + 1}/{(len(self.courses) + BATCH_SIZE - 1)//BATCH_SIZE}")
             
-        print(f"Fetched details for {len(self.course_details)} courses")
+        print(f"Fetched details for {len(self.course_details)} courses "
+              f"({self.stats['fetched']} requests sent, {self.stats['cached']} served from cache)")
         
         # Save the collected data
         await self.save_data()
-        
+
+        if self.failures:
+            print(f"{self.failures} requests failed; run again to retry them")
+        else:
+            self.journal.finish()
+
         end_time = time.time()
         print(f"Data collection completed in {end_time - start_time:.2f} seconds!")
         
@@ -164,36 +392,27 @@ class EducationDataCollector:
             }
             
             try:
-                async with self.semaphore:
-                    async with self.session.post(
-                        GRAPHQL_API,
-                        json={"query": query, "variables": variables}
-                    ) as response:
-                        if response.status != 200:
-                            print(f"Error fetching universities: {response.status}")
-                            break
-                            
-                        data = await response.json()
-                        
-                        if "errors" in data:
-                            print(f"GraphQL errors: {data['errors']}")
-                            break
-                            
-                        if "data" in data and "universities" in data["data"]:
-                            universities_data = data["data"]["universities"]
-                            
-                            # Add universities to our list
-                            self.universities.extend(universities_data["data"])
-                            
-                            # Check if there are more pages
-                            has_more_pages = universities_data["has_more_pages"]
-                            page += 1
-                        else:
-                            print("Unexpected response format")
-                            break
+                data = await self.graphql(query, variables, "universities")
+                if data is None:
+                    self.failures += 1
+                    break
+                    
+                if "data" in data and "universities" in data["data"]:
+                    universities_data = data["data"]["universities"]
+                    
+                    # Add universities to our list
+                    self.universities.extend(universities_data["data"])
+                    
+                    # Check if there are more pages
+                    has_more_pages = universities_data["has_more_pages"]
+                    page += 1
+                else:
+                    print("Unexpected response format")
+                    break
                         
             except Exception as e:
                 print(f"Error fetching universities: {e}")
+                self.failures += 1
                 break
                 
     async def fetch_university_courses(self, university_slug: str):
@@ -279,65 +498,63 @@ class EducationDataCollector:
             }
             
             try:
-                async with self.semaphore:
-                    async with self.session.post(
-                        GRAPHQL_API,
-                        json={"query": query, "variables": variables}
-                    ) as response:
-                        if response.status != 200:
-                            print(f"Error fetching courses for {university_slug}: {response.status}")
-                            break
-                            
-                        data = await response.json()
+                data = await self.graphql(query, variables, f"courses for {university_slug}")
+                if data is None:
+                    self.failures += 1
+                    break
+                    
+                if "data" in data and "universityCourses" in data["data"]:
+                    courses_data = data["data"]["universityCourses"]
+                    
+                    # Add courses to our list
+                    if courses_data.get("courses", {}).get("data"):
+                        for course in courses_data["courses"]["data"]:
+                            # Add university information to the course
+                            course["university_slug"] = university_slug
+                            course["university_name"] = next(
+                                (u["name"] for u in self.universities if u["slug"] == university_slug),
+                                None
+                            )
+                            university_courses.append(course)
                         
-                        if "errors" in data:
-                            print(f"GraphQL errors for {university_slug}: {data['errors']}")
-                            break
-                            
-                        if "data" in data and "universityCourses" in data["data"]:
-                            courses_data = data["data"]["universityCourses"]
-                            
-                            # Add courses to our list
-                            if courses_data.get("courses", {}).get("data"):
-                                for course in courses_data["courses"]["data"]:
-                                    # Add university information to the course
-                                    course["university_slug"] = university_slug
-                                    course["university_name"] = next(
-                                        (u["name"] for u in self.universities if u["slug"] == university_slug),
-                                        None
-                                    )
-                                    university_courses.append(course)
-                                
-                                # Check if there are more pages
-                                has_more_pages = courses_data["courses"]["has_more_pages"]
-                                page += 1
-                            else:
-                                has_more_pages = False
-                        else:
-                            print(f"Unexpected response format for {university_slug}")
-                            break
+                        # Check if there are more pages
+                        has_more_pages = courses_data["courses"]["has_more_pages"]
+                        page += 1
+                    else:
+                        has_more_pages = False
+                else:
+                    print(f"Unexpected response format for {university_slug}")
+                    break
                         
             except Exception as e:
                 print(f"Error fetching courses for {university_slug}: {e}")
+                self.failures += 1
                 break
         
         # Add all courses for this university to the main courses list
         self.courses.extend(university_courses)
                 
-    async def fetch_course_details_with_retry(self, course_slug: str):
+    async def fetch_course_details_with_retry(self, course: Dict[str, Any]):
         """Fetch course details with retry logic"""
+        # Refresh only refetches details whose listing changed since they were fetched
+        reuse = self.refresh and self.journal.is_current(course)
         for attempt in range(MAX_RETRIES):
             try:
                 async with self.retry_semaphore:
-                    return await self.fetch_course_details(course_slug)
+                    if await self.fetch_course_details(course["slug"], reuse=reuse):
+                        self.journal.record(course)
+                    else:
+                        self.failures += 1
+                    return
             except Exception as e:
                 if attempt == MAX_RETRIES - 1:
-                    print(f"Failed to fetch course details for {course_slug} after {MAX_RETRIES} attempts: {e}")
+                    print(f"Failed to fetch course details for {course['slug']} after {MAX_RETRIES} attempts: {e}")
+                    self.failures += 1
                     return None
                 await asyncio.sleep(RETRY_DELAY * (attempt + 1))  # Exponential backoff
         
-    async def fetch_course_details(self, course_slug: str):
-        """Fetch detailed information for a course"""
+    async def fetch_course_details(self, course_slug: str, reuse: bool = False) -> bool:
+        """Fetch detailed information for a course; False if the API returned an error"""
         query = """
         query getCourse($courseSlug: String!) {
           course(slug: $courseSlug) {
@@ -394,24 +611,14 @@ class EducationDataCollector:
         }
         
         try:
-            async with self.semaphore:
-                async with self.session.post(
-                    GRAPHQL_API,
-                    json={"query": query, "variables": variables}
-                ) as response:
-                    if response.status != 200:
-                        print(f"Error fetching course details for {course_slug}: {response.status}")
-                        return
-                        
-                    data = await response.json()
-                    
-                    if "errors" in data:
-                        print(f"GraphQL errors for {course_slug}: {data['errors']}")
-                        return
-                        
-                    if "data" in data and "course" in data["data"] and data["data"]["course"]:
-                        course_details = data["data"]["course"]
-                        self.course_details[course_slug] = course_details
+            data = await self.graphql(query, variables, f"course details for {course_slug}", reuse=reuse)
+            if data is None:
+                return False
+                
+            if "data" in data and "course" in data["data"] and data["data"]["course"]:
+                course_details = data["data"]["course"]
+                self.course_details[course_slug] = course_details
+            return True
                     
         except Exception as e:
             print(f"Error fetching course details for {course_slug}: {e}")
@@ -516,9 +723,13 @@ class EducationDataCollector:
             
         return structured_data
 
-async def main():
-    async with EducationDataCollector() as collector:
+async def main(refresh: bool = False):
+    async with EducationDataCollector(refresh=refresh) as collector:
         await collector.fetch_all_data()
 
 if __name__ == "__main__":
-    asyncio.run(main()) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Collect course data from the UniversityCompare API")
+    parser.add_argument("--refresh", action="store_true",
+                        help="Refetch listings, and details of courses whose listing changed")
+    args = parser.parse_args()
+    asyncio.run(main(args.refresh)) 
\ No newline at end of file
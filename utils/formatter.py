@@ -1,43 +1,88 @@
-def format_course_details(course):
+FEE_NOT_AVAILABLE = "Fee information not available"
+
+def fee_text(price, period, missing=FEE_NOT_AVAILABLE):
     """
-    Format course details in a readable way.
+    Format one fee, e.g. "£9,250 per Year 1" or "£1,234.50 per module".
     
     Args:
-        course (dict): Course information
+        price (float): Fee amount, None or NaN when unknown
+        period (str): Charging period; "year" when missing
+        missing (str): Text returned for an unknown fee
         
     Returns:
-        str: Formatted course details
+        str: Formatted fee
     """
-    fee = next((f for f in course["fees"] if f["region"] == "England"), {})
-    fee_str = f"£{fee.get('price', 'N/A')} per {fee.get('period', 'year')}" if fee else "Fee information not available"
+    if price is None or price != price:  # missing or NaN
+        return missing
+    amount = f"{price:,.0f}" if float(price).is_integer() else f"{price:,.2f}"
+    return f"£{amount} per {period or 'year'}"
+
+def requirement_text(req_type, min_entry):
+    """
+    Format one entry requirement, e.g. "UCAS Tariff: 112 points".
     
-    # Format entry requirements
-    entry_reqs = []
-    for req in course["entry_requirements"]:
-        if req["type"] == "UCAS Tariff":
-            entry_reqs.append(f"UCAS Tariff: {req['min_entry']} points")
-        else:
-            entry_reqs.append(f"{req['type']}: {req.get('min_entry', 'N/A')}")
+    Args:
+        req_type (str): Qualification name
+        min_entry (str): Minimum grade or points
+        
+    Returns:
+        str: Formatted requirement
+    """
+    if req_type == "UCAS Tariff":
+        return f"UCAS Tariff: {min_entry} points"
+    return f"{req_type}: {'N/A' if min_entry is None else min_entry}"
+
+def _known(value):
+    # Missing categorical fields come back as None or NaN
+    return value is not None and value == value and value != ""
+
+def course_markdown(name, university, study_mode, duration, campus, fee_str, entry_reqs, url):
+    """
+    Render one study option as a markdown card.
     
+    Returns:
+        str: Formatted course details
+    """
     entry_reqs_str = "\n  - ".join(entry_reqs) if entry_reqs else "Not specified"
     
     return f"""
-**{course['name']}** at {course['university']}
-- Study Mode: {course['study_mode']}
-- Duration: {course['duration']}
-- Campus: {course['campus']}
+**{name}** at {university}
+- Study Mode: {study_mode}
+- Duration: {duration if _known(duration) else "Not specified"}
+- Campus: {campus if _known(campus) else "Not specified"}
 - Fees: {fee_str}
 - Entry Requirements:
   - {entry_reqs_str}
-- [Learn more]({course['external_url']})
+- [Learn more]({url})
 """
 
-def format_course_list(courses):
+def format_course_details(course):
+    """
+    Format course details in a readable way.
+    
+    Args:
+        course (dict): Course information
+        
+    Returns:
+        str: Formatted course details
+    """
+    fee_str = fee_text(course.get("fee_england"), course.get("fee_england_period"))
+    
+    # Format entry requirements
+    entry_reqs = [requirement_text(req["type"], req.get("min_entry")) for req in course["entry_requirements"]]
+    
+    return course_markdown(
+        course["name"], course["university"], course["study_mode"], course["duration"],
+        course["campus"], fee_str, entry_reqs, course["external_url"]
+    )
+
+def format_course_list(courses, cards=None):
     """
     Format a list of courses in a readable way.
     
     Args:
         courses (list): List of course dictionaries
+        cards (CourseCards): Precomputed cards; courses with a ``row_id`` are looked up there
         
     Returns:
         str: Formatted course list
@@ -47,6 +92,9 @@ def format_course_list(courses):
     
     result = "Here are the courses that match your criteria:\n\n"
     for course in courses:
-        result += format_course_details(course) + "\n"
+        if cards is not None and course.get("row_id") is not None:
+            result += cards.markdown[course["row_id"]] + "\n"
+        else:
+            result += format_course_details(course) + "\n"
     
     return result 
\ No newline at end of file